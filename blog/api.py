@@ -0,0 +1,282 @@
+"""
+Read-only JSON API for blog posts.
+
+Posts are read with values() so no model instances are built, the author's username is
+fetched through a join in the same query, and clients can ask for only the fields they
+need with ?fields=title,date_posted. Lists use cursor pagination over the
+(date_posted, id) index, so every page costs the same regardless of its depth, and
+responses carry an ETag so unchanged pages are answered with 304 Not Modified.
+Posts moved to the ArchivedPost table are older than every live post, so they follow
+the live ones in the list, and the detail endpoint falls back to them.
+
+The ETag is computed from the ids, versions and dates of the posts on the page, so a
+conditional request is answered from a query reading only those columns, before the
+content is loaded or anything is serialized.
+"""
+
+import base64
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, Value
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_safe
+
+from .models import ArchivedPost, Post
+
+
+# Public field name -> lookup passed to values().
+API_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'content': 'content',
+    'date_posted': 'date_posted',
+    'author': 'author__username',
+    'url': 'id',
+}
+DEFAULT_FIELDS = ['id', 'title', 'date_posted', 'author', 'url']
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def _error(message, status=400):
+    """Return a JSON error response."""
+    return JsonResponse({'error': message}, status=status)
+
+
+def _parse_fields(request):
+    """
+    Return the fields requested with ?fields=, or None if one of them is unknown.
+
+    Parameters:
+    - request: HttpRequest object
+
+    Returns:
+    - List of public field names, or None
+    """
+    raw = request.GET.get('fields')
+    if not raw:
+        return DEFAULT_FIELDS
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    if not fields or any(field not in API_FIELDS for field in fields):
+        return None
+    return fields
+
+
+def _serialize(rows, fields):
+    """
+    Turn values() rows into dictionaries holding the public field names.
+
+    Parameters:
+    - rows: Iterable of dictionaries returned by values()
+    - fields: List of public field names
+
+    Returns:
+    - List of dictionaries
+    """
+    url_prefix, url_suffix = reverse('post-detail', kwargs={'pk': 0}).rsplit('0', 1)
+    items = []
+    for row in rows:
+        item = {}
+        for field in fields:
+            if field == 'url':
+                item['url'] = f"{url_prefix}{row['id']}{url_suffix}"
+            else:
+                item[field] = row[API_FIELDS[field]]
+        items.append(item)
+    return items
+
+
+def _encode_cursor(row):
+    """Encode the sort key of the last row of a page as an opaque cursor."""
+    raw = f"{row['date_posted'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """Decode a cursor into a (date_posted, id) tuple, or None if it is invalid."""
+    try:
+        date_posted, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        date_posted = parse_datetime(date_posted)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if date_posted is None:
+        return None
+    return date_posted, pk
+
+
+def _validator_lookups(fields):
+    """
+    Return the lookups the ETag of a response is computed from.
+
+    Every change to the title or content increments the version of a post, and the
+    date and author's username are the other fields a response can show.
+
+    Parameters:
+    - fields: List of public field names
+
+    Returns:
+    - List of lookups passed to values_list()
+    """
+    lookups = ['id', 'version', 'date_posted']
+    if 'author' in fields:
+        lookups.append('author__username')
+    return lookups
+
+
+def _sources():
+    """
+    Return the querysets posts are read from, in list order.
+
+    Archived posts cannot be edited and have no version; they report version 0.
+
+    Returns:
+    - List of the published posts and the archived posts
+    """
+    return [Post.objects.published(), ArchivedPost.objects.annotate(version=Value(0))]
+
+
+def _read(querysets, read, count):
+    """
+    Return the first rows of a sequence of querysets, reading each only if needed.
+
+    Parameters:
+    - querysets: Ordered querysets, each older than the previous one.
+    - read: Callable turning a queryset into a values() or values_list() queryset.
+    - count: The number of rows wanted.
+
+    Returns:
+    - List of rows
+    """
+    rows = []
+    for queryset in querysets:
+        rows += read(queryset)[:count - len(rows)]
+        if len(rows) >= count:
+            break
+    return rows
+
+
+def _etag(fields, keys, *extra):
+    """
+    Return the ETag of a response showing the given fields of the posts with the given keys.
+
+    Parameters:
+    - fields: List of public field names
+    - keys: List of tuples holding the values of _validator_lookups(fields) for each post
+    - extra: Other values the response depends on
+
+    Returns:
+    - str: A quoted ETag
+    """
+    raw = json.dumps([fields, keys, *extra], cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    return '"%s"' % hashlib.md5(raw, usedforsecurity=False).hexdigest()
+
+
+def _not_modified(request, etag):
+    """Return a 304 response if the client holds the response with this ETag, else None."""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
+
+
+def _json(payload, etag):
+    """Serialize payload into a response carrying the given ETag."""
+    body = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+@require_safe
+def post_list_api(request):
+    """
+    API view returning a page of posts, newest first.
+
+    Query parameters:
+    - fields: Comma-separated list of fields to return.
+    - limit: Number of posts per page (at most MAX_LIMIT).
+    - cursor: The next_cursor value of the previous page.
+
+    Parameters:
+    - request: HttpRequest object
+
+    Returns:
+    - HttpResponse object with a JSON body
+    """
+    fields = _parse_fields(request)
+    if fields is None:
+        return _error(f"Unknown field. Allowed fields: {', '.join(API_FIELDS)}.")
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return _error("limit must be an integer.")
+
+    querysets = [queryset.order_by('-date_posted', '-id') for queryset in _sources()]
+    cursor = request.GET.get('cursor')
+    if cursor:
+        position = _decode_cursor(cursor)
+        if position is None:
+            return _error("Invalid cursor.")
+        date_posted, pk = position
+        after = Q(date_posted__lt=date_posted) | Q(date_posted=date_posted, id__lt=pk)
+        querysets = [queryset.filter(after) for queryset in querysets]
+
+    validator = _validator_lookups(fields)
+
+    def page_etag(keys):
+        return _etag(fields, keys[:limit], len(keys) > limit)
+
+    if request.META.get('HTTP_IF_NONE_MATCH'):
+        keys = _read(querysets, lambda queryset: queryset.values_list(*validator), limit + 1)
+        response = _not_modified(request, page_etag(keys))
+        if response is not None:
+            return response
+
+    lookups = {API_FIELDS[field] for field in fields} | set(validator)
+    rows = _read(querysets, lambda queryset: queryset.values(*lookups), limit + 1)
+    etag = page_etag([tuple(row[lookup] for lookup in validator) for row in rows])
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+
+    return _json({'results': _serialize(rows, fields), 'next_cursor': next_cursor}, etag)
+
+
+@require_safe
+def post_detail_api(request, pk):
+    """
+    API view returning a single post.
+
+    Parameters:
+    - request: HttpRequest object
+    - pk: Primary key of the post
+
+    Returns:
+    - HttpResponse object with a JSON body
+    """
+    fields = _parse_fields(request)
+    if fields is None:
+        return _error(f"Unknown field. Allowed fields: {', '.join(API_FIELDS)}.")
+    querysets = [queryset.filter(pk=pk) for queryset in _sources()]
+    validator = _validator_lookups(fields)
+
+    if request.META.get('HTTP_IF_NONE_MATCH'):
+        keys = _read(querysets, lambda queryset: queryset.values_list(*validator), 1)
+        if not keys:
+            return _error("Not found.", status=404)
+        response = _not_modified(request, _etag(fields, keys))
+        if response is not None:
+            return response
+
+    lookups = {API_FIELDS[field] for field in fields} | set(validator)
+    rows = _read(querysets, lambda queryset: queryset.values(*lookups), 1)
+    if not rows:
+        return _error("Not found.", status=404)
+    row = rows[0]
+    etag = _etag(fields, [tuple(row[lookup] for lookup in validator)])
+    return _json(_serialize([row], fields)[0], etag)
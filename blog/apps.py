@@ -5,9 +5,14 @@ class BlogConfig(AppConfig):
     """
     Configuration class for the 'blog' app.
 
+    Signal handlers are registered when the app is ready.
+
     Attributes:
         default_auto_field (str): The default auto-generated field for models.
         name (str): The name of the app.
     """
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        import blog.signals
@@ -0,0 +1,154 @@
+"""
+Write-coalescing view counters for blog posts.
+
+Each worker process keeps a ViewCounterBuffer that aggregates post views in memory.
+The buffer is flushed to the PostViewCount table in batched UPDATEs at most once every
+VIEW_COUNT_FLUSH_INTERVAL seconds (by the request that notices the interval has passed)
+and once more when the process exits, so reading a post never takes SQLite's write
+lock by itself.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+
+from .models import ArchivedPost, Post, PostViewCount
+
+
+logger = logging.getLogger(__name__)
+
+# Keep IN (...) lists well below SQLite's limit on query parameters.
+FLUSH_CHUNK_SIZE = 500
+
+
+def _chunks(items, size):
+    """Yield successive slices of items of at most size elements."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def write_view_counts(counts):
+    """
+    Add buffered view counts to the PostViewCount table in one transaction.
+
+    Posts are grouped by their increment, so a flush issues one UPDATE per distinct
+    increment (per chunk) rather than one per post. Views of archived posts are added
+    to ArchivedPost.views; views of posts deleted since they were viewed are dropped.
+
+    Parameters:
+    - counts: Mapping of post primary key to the number of new views.
+    """
+    with transaction.atomic():
+        live = set()
+        for pks in _chunks(list(counts), FLUSH_CHUNK_SIZE):
+            live.update(Post.objects.filter(pk__in=pks).values_list('pk', flat=True))
+        PostViewCount.objects.bulk_create(
+            [PostViewCount(post_id=pk) for pk in live], ignore_conflicts=True, batch_size=FLUSH_CHUNK_SIZE)
+
+        by_increment = defaultdict(lambda: ([], []))
+        for pk, increment in counts.items():
+            by_increment[increment][pk not in live].append(pk)
+        for increment, (live_pks, other_pks) in by_increment.items():
+            for chunk in _chunks(live_pks, FLUSH_CHUNK_SIZE):
+                PostViewCount.objects.filter(post_id__in=chunk).update(views=F('views') + increment)
+            for chunk in _chunks(other_pks, FLUSH_CHUNK_SIZE):
+                ArchivedPost.objects.filter(pk__in=chunk).update(views=F('views') + increment)
+
+
+class ViewCounterBuffer:
+    """
+    Thread-safe, per-process buffer of post views.
+
+    Attributes:
+    - counts: Counter of views not yet written, keyed by post primary key.
+    - last_flush: Monotonic time of the last flush.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._database = None
+
+    def increment(self, pk):
+        """
+        Count one view of a post and flush the buffer if the flush interval has passed.
+
+        Parameters:
+        - pk: Primary key of the viewed post.
+        """
+        with self._lock:
+            self.counts[pk] += 1
+            self._database = connection.settings_dict['NAME']
+            due = time.monotonic() - self.last_flush >= getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 10)
+        if due:
+            self.flush()
+
+    def pending(self, pk):
+        """
+        Return the views of a post that have not been written yet.
+
+        Parameters:
+        - pk: Primary key of the post.
+
+        Returns:
+        - int
+        """
+        with self._lock:
+            return self.counts.get(pk, 0)
+
+    def flush(self):
+        """
+        Write all buffered views to the database.
+
+        Only one thread flushes at a time; if the write fails, the counts are put back
+        into the buffer and retried at the next flush.
+
+        Returns:
+        - int: The number of posts whose counters were updated.
+        """
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self._lock:
+                counts, self.counts = self.counts, Counter()
+                self.last_flush = time.monotonic()
+            if not counts:
+                return 0
+            try:
+                write_view_counts(counts)
+            except DatabaseError:
+                logger.exception("Could not flush %d post view counters", len(counts))
+                with self._lock:
+                    self.counts.update(counts)
+                return 0
+            return len(counts)
+        finally:
+            self._flush_lock.release()
+
+    def clear(self):
+        """Drop all buffered views without writing them."""
+        with self._lock:
+            self.counts.clear()
+
+    def flush_on_exit(self):
+        """
+        Flush the buffer when the process exits.
+
+        The counts are dropped if the process is no longer connected to the database
+        they were counted against (as happens after the test runner destroys its test
+        database).
+        """
+        if self._database is not None and self._database == connection.settings_dict['NAME']:
+            self.flush()
+
+
+view_counter = ViewCounterBuffer()
+atexit.register(view_counter.flush_on_exit)
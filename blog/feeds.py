@@ -0,0 +1,167 @@
+"""
+Atom feeds for the Blog app.
+
+The site-wide feed and the per-author feeds are rendered once and stored in the cache
+as finished bytes. Saving or deleting a Post bumps the generation of the affected
+feeds (see blog/signals.py), so a feed is only regenerated after its content actually
+changed. Feeds only list published posts; blog.scheduler bumps the generations when a
+scheduled post is published. Cached feeds are served with ETag and Last-Modified
+headers, so polling clients that already have the latest version get an empty 304
+response.
+"""
+
+import hashlib
+import time
+
+from django.contrib.auth.models import User
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .timeline import post_timeline
+
+
+FEED_SIZE = 20
+FEED_CACHE_TIMEOUT = 60 * 60 * 24  # Superseded generations are left to expire.
+
+
+class LatestPostsFeed(Feed):
+    """
+    Atom feed of the latest posts on the site.
+
+    Attributes:
+    - feed_type: The feed generator class (Atom 1.0).
+    - title: The title of the feed.
+    - link: The page the feed describes.
+    - subtitle: A short description of the feed.
+    """
+    feed_type = Atom1Feed
+    title = "BMS Django Blog Website Thing"
+    link = reverse_lazy('blog-home')
+    subtitle = "Latest posts"
+
+    def items(self):
+        """Return the newest live or archived posts, with their authors fetched in the same query."""
+        return post_timeline()[:FEED_SIZE]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.html
+
+    def item_author_name(self, item):
+        return item.author.username
+
+    def item_pubdate(self, item):
+        return item.date_posted
+
+
+class UserPostsFeed(LatestPostsFeed):
+    """
+    Atom feed of the latest posts by a single author.
+    """
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f"Posts by {obj.username}"
+
+    def link(self, obj):
+        return reverse('user-posts', args=[obj.username])
+
+    def items(self, obj):
+        return post_timeline(author=obj)[:FEED_SIZE]
+
+
+def _generation_key(name):
+    """Return the cache key holding the current generation of a feed."""
+    return f"blog:feed-generation:{name}"
+
+
+def invalidate_feed(name):
+    """
+    Mark a cached feed as stale so that it is rendered again on the next request.
+
+    Parameters:
+    - name: 'site' for the site-wide feed or 'user:<username>' for an author's feed.
+    """
+    try:
+        cache.incr(_generation_key(name))
+    except ValueError:
+        cache.set(_generation_key(name), time.time_ns(), timeout=None)
+
+
+def _serve_cached_feed(request, name, feed, *args):
+    """
+    Serve a feed from the cache, rendering and storing it first if it is stale.
+
+    The generation is read before rendering, so a post saved while the feed is being
+    rendered makes the stored copy unreachable instead of serving stale content.
+
+    Parameters:
+    - request: HttpRequest object
+    - name: The cache name of the feed.
+    - feed: The Feed instance used to render it.
+    - args: Extra arguments passed to the feed.
+
+    Returns:
+    - HttpResponse object
+    """
+    generation = cache.get_or_set(_generation_key(name), time.time_ns, timeout=None)
+    entry_key = f"blog:feed:{name}:{generation}"
+    entry = cache.get(entry_key)
+    if entry is None:
+        rendered = feed(request, *args)
+        body = rendered.content
+        entry = {
+            'body': body,
+            'content_type': rendered['Content-Type'],
+            'etag': '"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest(),
+            'last_modified': parse_http_date_safe(rendered.get('Last-Modified', '')),
+        }
+        cache.set(entry_key, entry, timeout=FEED_CACHE_TIMEOUT)
+
+    response = get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'])
+    if response is None:
+        response = HttpResponse(entry['body'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    if entry['last_modified']:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
+
+
+@require_safe
+def site_feed(request):
+    """
+    View serving the site-wide Atom feed.
+
+    Parameters:
+    - request: HttpRequest object
+
+    Returns:
+    - HttpResponse object
+    """
+    return _serve_cached_feed(request, 'site', LatestPostsFeed())
+
+
+@require_safe
+def user_feed(request, username):
+    """
+    View serving the Atom feed of a single author.
+
+    Parameters:
+    - request: HttpRequest object
+    - username: The username of the author.
+
+    Returns:
+    - HttpResponse object
+    """
+    return _serve_cached_feed(request, f"user:{username}", UserPostsFeed(), username)
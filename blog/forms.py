@@ -0,0 +1,56 @@
+"""
+Forms for the blog app.
+
+Classes:
+    PostCreateForm: Form for writing a post, published now or at a later date.
+    PostUpdateForm: Form for editing a post, carrying the version the edit started from.
+"""
+
+from django import forms
+from django.utils import timezone
+from .models import Post
+
+
+class PostCreateForm(forms.ModelForm):
+    """
+    Form for writing a post.
+
+    The publication date defaults to now. A date in the future schedules the post;
+    one in the past publishes it now, so posts cannot be backdated.
+    """
+
+    class Meta:
+        model = Post
+        fields = ['title', 'content', 'date_posted']
+        labels = {'date_posted': "Publish at"}
+        help_texts = {'date_posted': "Leave as is to publish now, or pick a later date to schedule the post."}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['date_posted'].required = False
+
+    def clean_date_posted(self):
+        """Return the publication date, no earlier than now."""
+        now = timezone.now()
+        date_posted = self.cleaned_data.get('date_posted')
+        return date_posted if date_posted is not None and date_posted > now else now
+
+
+class PostUpdateForm(forms.ModelForm):
+    """
+    Form for editing the title and content of a post.
+
+    The hidden version field holds the version of the post when the form was rendered.
+    PostUpdateView only saves the edit if the post still has that version, so an edit
+    made from a stale form does not overwrite changes saved since.
+    """
+    version = forms.IntegerField(widget=forms.HiddenInput, min_value=1)
+
+    class Meta:
+        model = Post
+        fields = ['title', 'content']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.fields['version'].initial = self.instance.version
@@ -0,0 +1,151 @@
+"""
+Batch maintenance jobs for the Post table.
+
+Both jobs work in small batches, each in its own short transaction, so SQLite's write
+lock is released between batches and readers are never blocked for long.
+
+Functions:
+    run_in_batches: Selects and processes batches of posts until none are left.
+    purge_deleted_posts: Removes soft-deleted posts for good.
+    archive_old_posts: Moves old posts from the Post table to the ArchivedPost table.
+    rerender_posts: Renders the content of posts again after a renderer upgrade.
+"""
+
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ArchivedPost, Post
+from .rendering import RENDERER_VERSION, render_many
+from .signals import archiving_posts, batched_post_signals, invalidate_posts_on_commit
+
+
+def run_in_batches(select_batch, process_batch, batch_size, pause):
+    """
+    Repeatedly select and process batches of post ids until none are left.
+
+    Parameters:
+    - select_batch: Callable returning a list of at most batch_size post ids.
+    - process_batch: Callable handling a list of post ids inside a transaction.
+    - batch_size: The maximum number of posts per batch.
+    - pause: Seconds to sleep between batches so other writers can get the lock.
+
+    Yields:
+    - int: The number of posts handled by each batch.
+    """
+    while True:
+        with transaction.atomic(), batched_post_signals():
+            pks = select_batch(batch_size)
+            if pks:
+                process_batch(pks)
+        if not pks:
+            return
+        yield len(pks)
+        if len(pks) < batch_size:
+            return
+        if pause:
+            time.sleep(pause)
+
+
+def purge_deleted_posts(older_than=timedelta(days=30), batch_size=200, pause=0.1):
+    """
+    Delete soft-deleted posts whose deletion is older than older_than.
+
+    Parameters:
+    - older_than: How long soft-deleted posts are kept before being purged.
+    - batch_size: The maximum number of posts removed per transaction.
+    - pause: Seconds to sleep between batches.
+
+    Yields:
+    - int: The number of posts purged by each batch.
+    """
+    cutoff = timezone.now() - older_than
+
+    def select_batch(size):
+        return list(Post.all_objects.deleted().filter(deleted_at__lt=cutoff)
+                    .order_by('deleted_at').values_list('pk', flat=True)[:size])
+
+    def process_batch(pks):
+        Post.all_objects.filter(pk__in=pks).delete()
+
+    return run_in_batches(select_batch, process_batch, batch_size, pause)
+
+
+def archive_old_posts(older_than=timedelta(days=365), batch_size=200, pause=0.1):
+    """
+    Move live posts dated before now - older_than into the ArchivedPost table.
+
+    The posts keep their archive month and their view count.
+
+    Parameters:
+    - older_than: The age after which a post is considered cold.
+    - batch_size: The maximum number of posts moved per transaction.
+    - pause: Seconds to sleep between batches.
+
+    Yields:
+    - int: The number of posts archived by each batch.
+    """
+    cutoff = timezone.now() - older_than
+    fields = ['id', 'title', 'content', 'content_html', 'content_hash', 'renderer_version',
+              'date_posted', 'author_id']
+
+    def select_batch(size):
+        return list(Post.objects.filter(date_posted__lt=cutoff)
+                    .order_by('date_posted').values_list('pk', flat=True)[:size])
+
+    def process_batch(pks):
+        rows = Post.objects.filter(pk__in=pks).values(*fields, views=Coalesce('view_count__views', 0))
+        ArchivedPost.objects.bulk_create([ArchivedPost(**row) for row in rows], ignore_conflicts=True)
+        with archiving_posts():
+            Post.all_objects.filter(pk__in=pks).delete()
+
+    return run_in_batches(select_batch, process_batch, batch_size, pause)
+
+
+def rerender_posts(model=Post, everything=False, render=render_many, batch_size=200, pause=0):
+    """
+    Store freshly rendered HTML for posts rendered by another renderer version.
+
+    Posts are walked in primary key order, soft-deleted ones included. The rendered
+    columns are written with bulk_update, so no post signals are sent; the cached pages
+    and feeds are invalidated after every batch instead.
+
+    Parameters:
+    - model: Post or ArchivedPost.
+    - everything: Whether to render every post, not only those of another renderer
+      version. Use it after changing content with queryset.update().
+    - render: Callable taking a list of (pk, content) tuples and returning a list of
+      (pk, html, content hash) tuples, e.g. one that spreads the work over processes.
+    - batch_size: The maximum number of posts rendered and written per transaction.
+    - pause: Seconds to sleep between batches.
+
+    Yields:
+    - int: The number of posts rendered by each batch.
+    """
+    manager = model._base_manager
+    queryset = manager.all() if everything else manager.exclude(renderer_version=RENDERER_VERSION)
+    last_pk = None
+
+    def select_batch(size):
+        nonlocal last_pk
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        pks = list(batch.order_by('pk').values_list('pk', flat=True)[:size])
+        if pks:
+            last_pk = pks[-1]
+        return pks
+
+    def process_batch(pks):
+        items = list(manager.filter(pk__in=pks).values_list('pk', 'content'))
+        manager.bulk_update(
+            [model(pk=pk, content_html=html, content_hash=digest, renderer_version=RENDERER_VERSION)
+             for pk, html, digest in render(items)],
+            ['content_html', 'content_hash', 'renderer_version'],
+        )
+        authors = manager.filter(pk__in=pks).values_list('author_id', flat=True).distinct()
+        invalidate_posts_on_commit(User.objects.filter(pk__in=authors).values_list('username', flat=True))
+
+    return run_in_batches(select_batch, process_batch, batch_size, pause)
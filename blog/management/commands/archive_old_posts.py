@@ -0,0 +1,32 @@
+"""
+Management command that moves old posts into the archive table in small batches.
+
+Usage:
+    python manage.py archive_old_posts --days 365 --batch-size 200
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from blog.maintenance import archive_old_posts
+
+
+class Command(BaseCommand):
+    help = "Move posts older than a given age from the Post table to the ArchivedPost table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=365,
+                            help="Archive posts dated more than this many days ago.")
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="Number of posts moved per transaction.")
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help="Seconds to wait between batches.")
+
+    def handle(self, *args, **options):
+        total = 0
+        for archived in archive_old_posts(timedelta(days=options['days']),
+                                          options['batch_size'], options['pause']):
+            total += archived
+            self.stdout.write(f"Archived {total} post(s)...")
+        self.stdout.write(f"Done, archived {total} post(s).")
@@ -0,0 +1,74 @@
+"""
+Management command that measures the CPU cost of compressing pages.
+
+The same page is requested repeatedly through the full middleware stack by an
+anonymous client, in three configurations:
+
+- plain: no compression and no page cache.
+- gzip: GZipMiddleware compresses every response; the page is rendered every time.
+- cached: the page cache serves bytes that were rendered and compressed once.
+
+The CPU time per request and the size of the response body are reported, along with
+the one-off cost of compressing the page for the cache.
+
+Usage:
+    python manage.py benchmark_compression
+    python manage.py benchmark_compression --path /blog/user/alice --requests 500
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from bms_django_website.pagecache import compress, invalidate_page_cache
+
+
+GZIP_MIDDLEWARE = 'django.middleware.gzip.GZipMiddleware'
+PAGE_CACHE_MIDDLEWARE = 'bms_django_website.pagecache.PageCacheMiddleware'
+
+
+class Command(BaseCommand):
+    help = "Compare the CPU time per request of uncompressed, gzipped and precompressed cached pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/blog/', help="Page to request.")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per configuration.")
+        parser.add_argument('--accept-encoding', default='gzip, deflate, br',
+                            help="Accept-Encoding header sent by the client.")
+        parser.add_argument('--host', default='localhost', help="Host header of the requests.")
+
+    def handle(self, *args, **options):
+        without_compression = [name for name in settings.MIDDLEWARE
+                               if name not in (GZIP_MIDDLEWARE, PAGE_CACHE_MIDDLEWARE)]
+        configurations = [
+            ('plain', without_compression),
+            ('gzip', [name for name in settings.MIDDLEWARE if name != PAGE_CACHE_MIDDLEWARE]),
+            ('cached', settings.MIDDLEWARE),
+        ]
+
+        self.stdout.write(f"{'configuration':<14} {'CPU ms/request':>15} {'bytes':>10} {'encoding':>10}")
+        for name, middleware in configurations:
+            with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=[options['host']]):
+                client = Client(HTTP_HOST=options['host'],
+                                HTTP_ACCEPT_ENCODING=options['accept_encoding'])
+                invalidate_page_cache()
+                response = client.get(options['path'])
+                if response.status_code != 200:
+                    raise CommandError(f"{options['path']} answered {response.status_code}.")
+                start = time.process_time()
+                for _ in range(options['requests']):
+                    response = client.get(options['path'])
+                elapsed = time.process_time() - start
+            self.stdout.write(f"{name:<14} {elapsed * 1000 / options['requests']:>15.3f} "
+                              f"{len(response.content):>10} {response.get('Content-Encoding', 'identity'):>10}")
+
+        with override_settings(MIDDLEWARE=without_compression, ALLOWED_HOSTS=[options['host']]):
+            body = Client(HTTP_HOST=options['host']).get(options['path']).content
+        start = time.process_time()
+        encodings = compress(body)
+        elapsed = time.process_time() - start
+        sizes = ', '.join(f"{coding} {len(data)}" for coding, data in encodings.items())
+        self.stdout.write(f"Compressing the page once for the cache took {elapsed * 1000:.2f} ms CPU ({sizes} bytes).")
@@ -0,0 +1,46 @@
+"""
+Management command that writes a static snapshot of the public pages of the blog.
+
+Only the pages whose posts or templates changed since the last build are rendered,
+by a pool of worker processes. The snapshot can be served by a static file server as
+a read-only fallback; see the README for an nginx configuration.
+
+Usage:
+    python manage.py build_static_site
+    python manage.py build_static_site --workers 8 --output /srv/blog-snapshot
+    python manage.py build_static_site --full
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog.static_site import build_static_site
+
+
+class Command(BaseCommand):
+    help = "Render the home, user, post detail and about pages to static HTML files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(settings.STATIC_SITE_ROOT),
+                            help="Directory the snapshot is written to.")
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Number of rendering processes, 0 to render in this process.")
+        parser.add_argument('--full', action='store_true',
+                            help="Render every page, ignoring the manifest of the last build.")
+        parser.add_argument('--host',
+                            help="Host header of the render requests, by default the first ALLOWED_HOSTS entry.")
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+
+        def progress(done, total):
+            if done == total or done % 500 < 50:
+                self.stdout.write(f"Rendered {done}/{total} page(s)...")
+
+        counts = build_static_site(options['output'], workers=options['workers'], full=options['full'],
+                                   host=options['host'], progress=progress)
+        self.stdout.write(
+            f"Done in {time.monotonic() - start:.1f}s: {counts['rendered']} rendered, "
+            f"{counts['unchanged']} unchanged, {counts['removed']} removed, {counts['failed']} failed.")
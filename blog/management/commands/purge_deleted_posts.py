@@ -0,0 +1,32 @@
+"""
+Management command that removes soft-deleted posts in small batches.
+
+Usage:
+    python manage.py purge_deleted_posts --days 30 --batch-size 200
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from blog.maintenance import purge_deleted_posts
+
+
+class Command(BaseCommand):
+    help = "Delete soft-deleted posts for good, a small batch per transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=30,
+                            help="Only purge posts deleted more than this many days ago.")
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="Number of posts deleted per transaction.")
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help="Seconds to wait between batches.")
+
+    def handle(self, *args, **options):
+        total = 0
+        for purged in purge_deleted_posts(timedelta(days=options['days']),
+                                          options['batch_size'], options['pause']):
+            total += purged
+            self.stdout.write(f"Purged {total} post(s)...")
+        self.stdout.write(f"Done, purged {total} post(s).")
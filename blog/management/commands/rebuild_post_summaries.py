@@ -0,0 +1,21 @@
+"""
+Management command that rebuilds the precomputed post summaries from scratch.
+
+The summaries are normally kept up to date incrementally by signal handlers; this
+command is for the first deployment, after bulk imports or after raw SQL changes.
+
+Usage:
+    python manage.py rebuild_post_summaries
+"""
+
+from django.core.management.base import BaseCommand
+
+from blog.summaries import rebuild_archive_months
+
+
+class Command(BaseCommand):
+    help = "Rebuild the month archive summary table from the Post table."
+
+    def handle(self, *args, **options):
+        months = rebuild_archive_months()
+        self.stdout.write(f"Rebuilt the archive with {months} month(s).")
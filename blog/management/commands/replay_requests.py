@@ -0,0 +1,91 @@
+"""
+Management command that replays a captured request log and reports latency per route.
+
+Logs are written by bms_django_website.requestlog.RequestLogMiddleware when
+REQUEST_LOG_PATH is set. Only GET and HEAD requests are replayed unless --methods says
+otherwise; request bodies are not captured, so replayed writes carry no data.
+
+Usage:
+    python manage.py replay_requests requests.log
+    python manage.py replay_requests requests.log --speed 10 --concurrency 8 --output after.json
+    python manage.py replay_requests requests.log --base-url http://127.0.0.1:8000 \\
+        --baseline before.json --fail-on-regression
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bms_django_website.replay import (
+    HttpTarget, InProcessTarget, build_report, compare_reports, load_requests, replay,
+)
+
+
+class Command(BaseCommand):
+    help = "Replay a JSONL request log and report the latency of every route."
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', help="JSONL file with one request per line.")
+        parser.add_argument('--base-url',
+                            help="Send the requests to this running server instead of the test client.")
+        parser.add_argument('--host', default='localhost',
+                            help="Host header used with the test client.")
+        parser.add_argument('--speed', type=float, default=0,
+                            help="1 for the original pace, 10 for ten times faster, 0 for no pauses.")
+        parser.add_argument('--concurrency', type=int, default=1, help="Number of threads sending requests.")
+        parser.add_argument('--methods', default='GET,HEAD',
+                            help="Comma-separated HTTP methods to replay.")
+        parser.add_argument('--limit', type=int, help="Replay at most this many requests.")
+        parser.add_argument('--output', help="Write the report as JSON to this file.")
+        parser.add_argument('--baseline', help="Compare with a JSON report written by an earlier run.")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Relative p95 slowdown reported as a regression.")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Exit with an error if a route regressed.")
+
+    def handle(self, *args, **options):
+        methods = tuple(method.strip().upper() for method in options['methods'].split(',') if method.strip())
+        try:
+            requests, skipped = load_requests(options['log'], methods)
+        except OSError as error:
+            raise CommandError(f"Cannot read {options['log']}: {error}")
+        if options['limit'] is not None:
+            requests = requests[:options['limit']]
+        self.stdout.write(f"Replaying {len(requests)} request(s), skipped {skipped} line(s).")
+        if not requests:
+            return
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as report_file:
+                    baseline = json.load(report_file)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot read the baseline {options['baseline']}: {error}")
+
+        if options['base_url']:
+            target = HttpTarget(options['base_url'])
+        else:
+            target = InProcessTarget(options['host'])
+        results = replay(requests, target, options['speed'], options['concurrency'])
+        report = build_report(results)
+        regressed = compare_reports(report, baseline, options['threshold'])
+
+        self.stdout.write(f"{'route':<24} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} "
+                          f"{'p99 ms':>9} {'base p95':>9} {'change':>8}")
+        for name, summary in report.items():
+            base = f"{summary['baseline_p95_ms']:.2f}" if summary['baseline_p95_ms'] else '-'
+            change = f"{summary['change']:+.0%}" if summary['change'] is not None else '-'
+            flag = '  REGRESSED' if summary['regressed'] else ''
+            self.stdout.write(f"{name:<24} {summary['count']:>6} {summary['errors']:>6} "
+                              f"{summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} {summary['p99_ms']:>9.2f} "
+                              f"{base:>9} {change:>8}{flag}")
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as report_file:
+                json.dump(report, report_file, indent=2)
+        if regressed:
+            message = f"{len(regressed)} route(s) regressed: {', '.join(regressed)}."
+            if options['fail_on_regression']:
+                raise CommandError(message)
+            self.stdout.write(message)
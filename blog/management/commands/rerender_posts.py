@@ -0,0 +1,56 @@
+"""
+Management command that renders the Markdown content of posts again.
+
+Run it after upgrading markdown or nh3, or after changing the rendering options in
+blog/rendering.py. Only posts rendered by another renderer version are processed,
+unless --all is given. Rendering is spread over a pool of worker processes, and the
+results are written in small batches.
+
+Usage:
+    python manage.py rerender_posts
+    python manage.py rerender_posts --all --workers 8 --batch-size 500
+"""
+
+from django.core.management.base import BaseCommand
+
+from blog.maintenance import rerender_posts
+from blog.workers import worker_pool
+from blog.models import ArchivedPost, Post
+from blog.rendering import RENDERER_VERSION, render_many
+
+
+class Command(BaseCommand):
+    help = "Render post content to HTML again for posts rendered by an older renderer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Render every post, not only those of another renderer version.")
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Number of rendering processes, 0 to render in this process.")
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="Number of posts rendered and written per transaction.")
+        parser.add_argument('--pause', type=float, default=0,
+                            help="Seconds to wait between batches.")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        executor = worker_pool(workers) if workers else None
+
+        def render(items):
+            if executor is None:
+                return render_many(items)
+            chunks = [items[i::workers] for i in range(workers)]
+            return [row for rows in executor.map(render_many, chunks) for row in rows]
+
+        self.stdout.write(f"Renderer version {RENDERER_VERSION}.")
+        try:
+            for model in (Post, ArchivedPost):
+                total = 0
+                for rendered in rerender_posts(model, options['all'], render,
+                                               options['batch_size'], options['pause']):
+                    total += rendered
+                    self.stdout.write(f"Rendered {total} {model._meta.verbose_name}(s)...")
+                self.stdout.write(f"Done, rendered {total} {model._meta.verbose_name}(s).")
+        finally:
+            if executor is not None:
+                executor.shutdown()
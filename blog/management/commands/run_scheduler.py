@@ -0,0 +1,45 @@
+"""
+Management command that publishes scheduled posts as they become due.
+
+It sleeps until the next scheduled post is due, invalidates the cached feeds, pages
+and sidebar that should now show it, and goes back to sleep. Run a single instance,
+or set POST_SCHEDULER_THREAD to run the scheduler inside the web workers instead.
+
+Usage:
+    python manage.py run_scheduler
+    python manage.py run_scheduler --once --poll-interval 60   # from cron, every minute
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.scheduler import scheduler
+
+
+class Command(BaseCommand):
+    help = "Invalidate the cached feeds and pages when scheduled posts become visible."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help="Longest sleep in seconds; defaults to POST_SCHEDULER_POLL_INTERVAL.")
+        parser.add_argument('--once', action='store_true',
+                            help="Publish the posts that became due during the last poll interval and exit, "
+                                 "for running from cron every poll interval.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            interval = options['poll_interval'] or settings.POST_SCHEDULER_POLL_INTERVAL
+            now = timezone.now()
+            scheduler.published_until = now - timedelta(seconds=interval)
+            published = scheduler.run_pending(now)
+            self.stdout.write(f"Done, published {published} post(s).")
+            return
+        self.stdout.write("Waiting for scheduled posts. Press Ctrl+C to stop.")
+        try:
+            scheduler.run(options['poll_interval'],
+                          on_publish=lambda published: self.stdout.write(f"Published {published} post(s)."))
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_post_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViewCount',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='view_count', serialize=False, to='blog.post')),
+                ('views', models.PositiveBigIntegerField(db_index=True, default=0)),
+            ],
+        ),
+    ]
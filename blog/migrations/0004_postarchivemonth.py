@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:26
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def populate_archive_months(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    PostArchiveMonth = apps.get_model('blog', 'PostArchiveMonth')
+    months = (
+        Post.objects
+        .annotate(year=ExtractYear('date_posted'), month=ExtractMonth('date_posted'))
+        .values('year', 'month')
+        .annotate(post_count=Count('id'))
+        .order_by()
+    )
+    PostArchiveMonth.objects.bulk_create(PostArchiveMonth(**month) for month in months)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_postviewcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostArchiveMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('post_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='postarchivemonth',
+            constraint=models.UniqueConstraint(fields=('year', 'month'), name='unique_archive_month'),
+        ),
+        migrations.RunPython(populate_archive_months, migrations.RunPython.noop),
+    ]
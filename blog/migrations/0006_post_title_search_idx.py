@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:36
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_soft_delete_and_archivedpost'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(django.db.models.functions.comparison.Collate('title', 'NOCASE'), condition=models.Q(('deleted_at__isnull', True)), name='post_title_search_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_post_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedpost',
+            name='views',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(fields=['-date_posted', '-id'], name='archivedpost_feed_idx'),
+        ),
+    ]
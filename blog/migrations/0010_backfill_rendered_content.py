@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:40
+
+from django.db import migrations
+
+from blog.rendering import RENDERER_VERSION, render_many
+
+
+BATCH_SIZE = 500
+
+
+def render_existing_posts(apps, schema_editor):
+    # Posts written before 0007 have no stored HTML. Later renderer upgrades are
+    # picked up by `manage.py rerender_posts` instead.
+    for model_name in ('Post', 'ArchivedPost'):
+        model = apps.get_model('blog', model_name)
+        queryset = model.objects.exclude(renderer_version=RENDERER_VERSION).order_by('pk')
+        last_pk = None
+        while True:
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            items = list(batch.values_list('pk', 'content')[:BATCH_SIZE])
+            if not items:
+                break
+            model.objects.bulk_update(
+                [model(pk=pk, content_html=html, content_hash=digest, renderer_version=RENDERER_VERSION)
+                 for pk, html, digest in render_many(items)],
+                ['content_html', 'content_hash', 'renderer_version'],
+            )
+            last_pk = items[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_archivedpost_views'),
+    ]
+
+    operations = [
+        migrations.RunPython(render_existing_posts, migrations.RunPython.noop),
+    ]
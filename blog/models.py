@@ -1,29 +1,220 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F
+from django.db.models.functions import Collate
+from django.db.models.signals import post_save, pre_save
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils.safestring import mark_safe
 
+from .rendering import RENDERER_VERSION, content_hash, render_content
 
-class Post(models.Model):
+
+# The fields written when the content is rendered.
+RENDERED_FIELDS = {'content_html', 'content_hash', 'renderer_version'}
+
+
+class PostQuerySet(models.QuerySet):
+    """
+    QuerySet with shortcuts for live and soft-deleted posts.
+    """
+
+    def live(self):
+        """Return the posts that have not been deleted."""
+        return self.filter(deleted_at__isnull=True)
+
+    def deleted(self):
+        """Return the posts that were soft-deleted and are waiting to be purged."""
+        return self.filter(deleted_at__isnull=False)
+
+    def published(self, now=None):
+        """Return the posts whose publication date has passed."""
+        return self.filter(date_posted__lte=now or timezone.now())
+
+    def scheduled(self, now=None):
+        """Return the posts dated in the future, which are not shown yet."""
+        return self.filter(date_posted__gt=now or timezone.now())
+
+    def visible_to(self, user, now=None):
+        """Return the published posts, plus the scheduled posts of the given user."""
+        published = models.Q(date_posted__lte=now or timezone.now())
+        if user.is_authenticated:
+            return self.filter(published | models.Q(author_id=user.pk))
+        return self.filter(published)
+
+
+class LivePostManager(models.Manager.from_queryset(PostQuerySet)):
+    """
+    Default manager for Post that hides soft-deleted posts.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().live()
+
+
+class RenderedContentMixin:
+    """
+    Access to the HTML rendered from the Markdown content of a post.
+
+    The HTML is stored in content_html when the post is saved, together with the hash
+    of the content and the renderer version it was produced from.
+    """
+
+    def content_is_rendered(self):
+        """Return whether content_html is up to date with the content and the renderer."""
+        return (self.renderer_version == RENDERER_VERSION
+                and self.content_hash == content_hash(self.content))
+
+    def render_content(self):
+        """Render the content and store the result in the rendered fields."""
+        self.content_html = render_content(self.content)
+        self.content_hash = content_hash(self.content)
+        self.renderer_version = RENDERER_VERSION
+
+    @property
+    def html(self):
+        """
+        The sanitized HTML of the content.
+
+        The stored HTML is used if it came from the current renderer; otherwise, for
+        rows written by bulk operations or before a renderer upgrade, the content is
+        rendered on the fly. Only the renderer version is compared, so that reading the
+        HTML does not hash the content; save() checks the hash, and code changing the
+        content with update() must clear renderer_version.
+
+        Returns:
+            SafeString: The HTML of the content.
+        """
+        if self.renderer_version == RENDERER_VERSION:
+            return mark_safe(self.content_html)
+        return mark_safe(render_content(self.content))
+
+
+class Post(RenderedContentMixin, models.Model):
     """
     Model representing a blog post.
 
+    Deleting a post through the site only marks it as deleted; the row is removed later,
+    in small batches, by the purge_deleted_posts management command. Post.objects only
+    returns live posts, while Post.all_objects also returns soft-deleted ones.
+
+    The content is Markdown. Saving a post renders it to sanitized HTML, stored in
+    content_html and printed by the templates through Post.html.
+
+    date_posted is the publication date. Posts dated in the future are scheduled: only
+    their author sees them until that date, when blog.scheduler invalidates the cached
+    feeds and pages that should now show them.
+
+    Every change to the title or content increments the version. PostUpdateView saves
+    edits with save_if_version, which only writes them if the version is still the one
+    the edit started from.
+
     Attributes:
         title (str): The title of the post.
-        content (str): The content of the post.
-        date_posted (datetime): The date and time when the post was created.
+        content (str): The Markdown content of the post.
+        content_html (str): The HTML rendered from the content.
+        content_hash (str): The hash of the content content_html was rendered from.
+        renderer_version (str): The version of the renderer content_html came from.
+        date_posted (datetime): The date and time when the post is published.
         author (User): The author of the post, linked to the User model.
+        deleted_at (datetime): The date and time when the post was deleted, or None.
+        version (int): The number of times the title or content was saved.
     """
 
     title = models.CharField(max_length=100)
     content = models.TextField()
+    content_html = models.TextField(blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    renderer_version = models.CharField(max_length=40, blank=True, editable=False)
     date_posted = models.DateTimeField(default=timezone.now)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = LivePostManager()
+    all_objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Newest-first listings and cursor pagination over (date_posted, id). The
+            # published/scheduled filters are range conditions on its leading column.
+            # Partial indexes only cover live posts, so they do not grow with deleted rows.
+            models.Index(fields=['-date_posted', '-id'], name='post_feed_idx',
+                         condition=models.Q(deleted_at__isnull=True)),
+            # Per-author listings, newest first.
+            models.Index(fields=['author', '-date_posted'], name='post_author_feed_idx',
+                         condition=models.Q(deleted_at__isnull=True)),
+            # Title prefix search in the admin. Django runs istartswith as a
+            # case-insensitive LIKE on SQLite, which can only use a NOCASE index.
+            models.Index(Collate('title', 'NOCASE'), name='post_title_search_idx',
+                         condition=models.Q(deleted_at__isnull=True)),
+            # Soft-deleted posts waiting to be purged.
+            models.Index(fields=['deleted_at'], name='post_deleted_idx',
+                         condition=models.Q(deleted_at__isnull=False)),
+        ]
 
     def __str__(self):
         """String representation of the Post."""
         return self.title
 
+    def save(self, *args, **kwargs):
+        """
+        Save the post, rendering its content first if it changed since the last render.
+
+        Saving the title or content of an existing post increments its version, so that
+        edits started before this save are refused by save_if_version. The version is
+        incremented in the database, so a save from a stale copy of the post still moves
+        it forward, and it is read back afterwards.
+        """
+        update_fields = kwargs.get('update_fields')
+        if (update_fields is None or 'content' in update_fields) and not self.content_is_rendered():
+            self.render_content()
+            if update_fields is not None:
+                update_fields = kwargs['update_fields'] = set(update_fields) | RENDERED_FIELDS
+        if not self._state.adding and (update_fields is None or {'title', 'content'} & set(update_fields)):
+            self.version = F('version') + 1
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'version'}
+            super().save(*args, **kwargs)
+            self.refresh_from_db(using=kwargs.get('using'), fields=['version'])
+        else:
+            super().save(*args, **kwargs)
+
+    def save_if_version(self, version, fields):
+        """
+        Save some fields of the post if it still has the given version.
+
+        The fields are written by a single UPDATE ... WHERE version = %s, which also
+        increments the version. Of two edits started from the same version, only the
+        first one is saved, without locking the row. pre_save and post_save are sent
+        as they are by save(update_fields=fields).
+
+        Args:
+            version (int): The version the edit started from.
+            fields (iterable): The names of the fields that were edited.
+
+        Returns:
+            bool: True if the fields were saved, False if the post changed or was
+            deleted since that version.
+        """
+        fields = set(fields)
+        if 'content' in fields and not self.content_is_rendered():
+            self.render_content()
+            fields |= RENDERED_FIELDS
+        using = router.db_for_write(Post, instance=self)
+        with transaction.atomic(using=using):
+            pre_save.send(sender=Post, instance=self, raw=False, using=using, update_fields=frozenset(fields))
+            values = {name: getattr(self, name) for name in fields}
+            saved = Post.objects.using(using).filter(pk=self.pk, version=version).update(
+                version=F('version') + 1, **values)
+            if not saved:
+                return False
+            self.version = version + 1
+            fields.add('version')
+            post_save.send(sender=Post, instance=self, created=False, raw=False, using=using,
+                           update_fields=frozenset(fields))
+        return True
+
     def get_absolute_url(self):
         """
         Returns the URL to access a detail record for this post.
@@ -32,3 +223,113 @@ class Post(models.Model):
             str: The URL of the post detail view.
         """
         return reverse('post-detail', kwargs={'pk': self.pk})
+
+    def soft_delete(self):
+        """
+        Mark the post as deleted without removing its row.
+        """
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at'])
+
+
+class ArchivedPost(RenderedContentMixin, models.Model):
+    """
+    Model representing a cold post moved out of the Post table.
+
+    Old posts are moved here by the archive_old_posts management command so that the
+    hot blog_post table and its indexes stay small. Archived posts keep their id, and
+    PostDetailView still serves them at their original URL. The listings, feeds and
+    month archive show them after the live posts (see blog.timeline).
+
+    Attributes:
+        id (int): The id the post had in the Post table.
+        title (str): The title of the post.
+        content (str): The Markdown content of the post.
+        content_html (str): The HTML rendered from the content.
+        content_hash (str): The hash of the content content_html was rendered from.
+        renderer_version (str): The version of the renderer content_html came from.
+        date_posted (datetime): The date and time when the post was created.
+        author (User): The author of the post, linked to the User model.
+        archived_at (datetime): The date and time when the post was archived.
+        views (int): The number of views, carried over from PostViewCount and counted on.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=100)
+    content = models.TextField()
+    content_html = models.TextField(blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    renderer_version = models.CharField(max_length=40, blank=True, editable=False)
+    date_posted = models.DateTimeField()
+    author = models.ForeignKey(User, on_delete=models.CASCADE)
+    archived_at = models.DateTimeField(default=timezone.now)
+    views = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['author', '-date_posted'], name='archivedpost_author_idx'),
+            # The archived tail of the site-wide listings and month archives.
+            models.Index(fields=['-date_posted', '-id'], name='archivedpost_feed_idx'),
+        ]
+
+    def __str__(self):
+        """String representation of the archived post."""
+        return self.title
+
+    def get_absolute_url(self):
+        """
+        Returns the URL to access a detail record for this post.
+
+        Returns:
+            str: The URL of the post detail view.
+        """
+        return reverse('post-detail', kwargs={'pk': self.pk})
+
+
+class PostViewCount(models.Model):
+    """
+    Model holding the aggregated number of views of a post.
+
+    Views are counted in memory by blog.counters and written here in batches, so the
+    hot blog_post table is never updated when a post is read.
+
+    Attributes:
+        post (Post): The post that was viewed.
+        views (int): The number of views flushed so far.
+    """
+
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='view_count')
+    views = models.PositiveBigIntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        """String representation of the view count."""
+        return f"{self.post_id}: {self.views} views"
+
+
+class PostArchiveMonth(models.Model):
+    """
+    Model holding the number of posts published in a given month.
+
+    The rows are a materialized summary of Post.date_posted, kept up to date by the
+    signal handlers in blog/signals.py and rebuilt from scratch by the
+    rebuild_post_summaries management command.
+
+    Attributes:
+        year (int): The year.
+        month (int): The month, from 1 to 12.
+        post_count (int): The number of posts dated in that month.
+    """
+
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    post_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month'], name='unique_archive_month'),
+        ]
+        ordering = ['-year', '-month']
+
+    def __str__(self):
+        """String representation of the archive month."""
+        return f"{self.year}-{self.month:02d}: {self.post_count} posts"
@@ -0,0 +1,82 @@
+"""
+Markdown rendering of post content.
+
+Post content is written in Markdown. It is rendered to HTML and sanitized with nh3
+once, when the post is saved, and the result is stored next to the content together
+with the hash of the content and the version of the renderer it came from. Pages and
+feeds print the stored HTML; it is only rendered again when the content or the
+renderer changed (see Post.html and the rerender_posts management command).
+
+Without the optional markdown and nh3 packages, content is shown as escaped
+paragraphs, as before.
+
+Functions:
+    content_hash: Returns the hash identifying a version of the content.
+    render_content: Renders content to sanitized HTML.
+    render_many: Renders a batch of (pk, content) pairs, for use in worker processes.
+"""
+
+import hashlib
+
+from django.utils.html import linebreaks
+
+try:
+    import markdown
+    import nh3
+except ImportError:
+    markdown = nh3 = None
+
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'sane_lists', 'nl2br']
+
+# Bump the trailing number when the rendering options above change, so that
+# rerender_posts picks up every post. Upgrading markdown or nh3 changes it too.
+if markdown is not None:
+    RENDERER_VERSION = f"md{markdown.__version__}-nh3{nh3.__version__}-1"
+else:
+    RENDERER_VERSION = "plain-1"
+
+
+def content_hash(content):
+    """
+    Return the hash identifying a version of the content.
+
+    Parameters:
+    - content: The Markdown source of a post.
+
+    Returns:
+    - str: A 64-character hex digest.
+    """
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def render_content(content):
+    """
+    Render Markdown content to sanitized HTML.
+
+    Raw HTML in the source is kept only if nh3 allows it; scripts, event handler
+    attributes and javascript: links are removed.
+
+    Parameters:
+    - content: The Markdown source of a post.
+
+    Returns:
+    - str: HTML that is safe to print unescaped.
+    """
+    if markdown is None:
+        return linebreaks(content, autoescape=True)
+    html = markdown.markdown(content, extensions=MARKDOWN_EXTENSIONS, output_format='html')
+    return nh3.clean(html, link_rel='noopener noreferrer nofollow')
+
+
+def render_many(items):
+    """
+    Render a batch of posts.
+
+    Parameters:
+    - items: A list of (pk, content) tuples.
+
+    Returns:
+    - List of (pk, html, content hash) tuples
+    """
+    return [(pk, render_content(content), content_hash(content)) for pk, content in items]
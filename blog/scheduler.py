@@ -0,0 +1,163 @@
+"""
+Publication of scheduled posts.
+
+A post dated in the future is scheduled: the public queries filter it out until its
+date_posted has passed. Nothing is written when that happens, so the cached feeds,
+pages and sidebar that should now show the post are invalidated by the scheduler,
+which sleeps until the next scheduled post is due, invalidates the caches showing it,
+and goes back to sleep.
+
+The scheduler runs either in a background thread of a web worker, started by the
+first request when POST_SCHEDULER_THREAD is set, or in its own process with
+`python manage.py run_scheduler`. Saving a scheduled post wakes the thread of the
+process it was saved in; other schedulers notice it within
+POST_SCHEDULER_POLL_INTERVAL seconds.
+"""
+
+import datetime
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from bms_django_website.pagecache import invalidate_page_cache
+from .feeds import FEED_CACHE_TIMEOUT, invalidate_feed
+from .models import Post
+from .summaries import SIDEBAR_CACHE_KEY
+
+
+logger = logging.getLogger(__name__)
+
+
+def next_publication(now=None):
+    """
+    Return the date of the next scheduled post.
+
+    Parameters:
+    - now: The current time, defaults to timezone.now().
+
+    Returns:
+    - An aware datetime, or None if no post is scheduled
+    """
+    return (Post.objects.scheduled(now).order_by('date_posted')
+            .values_list('date_posted', flat=True).first())
+
+
+def publish_posts(since, until):
+    """
+    Invalidate the caches showing the posts that became visible between two times.
+
+    Parameters:
+    - since: The exclusive start of the interval.
+    - until: The inclusive end of the interval.
+
+    Returns:
+    - int: The number of posts that became visible.
+    """
+    authors = list(Post.objects.filter(date_posted__gt=since, date_posted__lte=until)
+                   .values_list('author_id', flat=True))
+    if not authors:
+        return 0
+    invalidate_page_cache()
+    cache.delete(SIDEBAR_CACHE_KEY)
+    invalidate_feed('site')
+    for username in User.objects.filter(pk__in=set(authors)).values_list('username', flat=True):
+        invalidate_feed(f"user:{username}")
+    return len(authors)
+
+
+class PublishScheduler:
+    """
+    Loop invalidating the cached feeds and pages when scheduled posts become visible.
+
+    Attributes:
+    - published_until: The time up to which posts have been published, or None
+      before the first run.
+    """
+
+    def __init__(self):
+        self.published_until = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def run_pending(self, now=None):
+        """
+        Publish the posts that became visible since the previous run.
+
+        The first run covers the lifetime of a cached feed, since posts may have
+        become visible while no scheduler was running.
+
+        Parameters:
+        - now: The current time, defaults to timezone.now().
+
+        Returns:
+        - int: The number of posts that became visible.
+        """
+        now = now or timezone.now()
+        since = self.published_until
+        if since is None:
+            since = now - datetime.timedelta(seconds=FEED_CACHE_TIMEOUT)
+        published = publish_posts(since, now)
+        self.published_until = now
+        return published
+
+    def run(self, poll_interval=None, on_publish=None):
+        """
+        Publish scheduled posts as they become due, until stop() is called.
+
+        Parameters:
+        - poll_interval: The longest sleep, in seconds, which bounds how late a post
+          scheduled by another process is published. Defaults to
+          POST_SCHEDULER_POLL_INTERVAL.
+        - on_publish: Optional callable receiving the number of posts published by a run.
+        """
+        if poll_interval is None:
+            poll_interval = settings.POST_SCHEDULER_POLL_INTERVAL
+        while not self._stop.is_set():
+            timeout = poll_interval
+            try:
+                now = timezone.now()
+                published = self.run_pending(now)
+                if published and on_publish is not None:
+                    on_publish(published)
+                due = next_publication(now)
+                if due is not None:
+                    timeout = min(timeout, (due - now).total_seconds())
+            except DatabaseError:
+                logger.exception("Could not publish scheduled posts")
+            finally:
+                close_old_connections()
+            self._wake.wait(max(timeout, 0))
+            self._wake.clear()
+
+    def start(self):
+        """Start the scheduler in a daemon thread, unless it is already running."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self.run, name='post-scheduler', daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        """Make the scheduler look for the next scheduled post again."""
+        self._wake.set()
+
+    def stop(self):
+        """Stop the scheduler after its current run."""
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+
+scheduler = PublishScheduler()
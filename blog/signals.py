@@ -0,0 +1,254 @@
+"""
+Signal handlers for the Blog app.
+
+This module keeps derived data in step with the Post table. Jobs that change many
+posts at once can wrap each batch in batched_post_signals(), so the handlers collect
+their work and apply it once per batch instead of once per row.
+
+Functions:
+    batched_post_signals: Context manager that coalesces the work of the handlers below.
+    archiving_posts: Context manager under which deleted posts keep their archive month.
+    invalidate_posts_on_commit: Marks the feeds and the cached pages as stale after the commit.
+    invalidate_post_feeds: Marks the feeds and the cached pages as stale when a post changes.
+    remember_archive_month: Records the month a post was filed under before it is saved.
+    update_archive_on_save: Moves a saved post into its archive month.
+    update_archive_on_delete: Removes a deleted post from its archive month.
+    remove_deleted_archived_post: Updates the feeds, pages and archive month of a deleted archived post.
+    wake_scheduler: Wakes the publication scheduler when a post is scheduled.
+    start_scheduler: Starts the publication scheduler thread on the first request.
+"""
+
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from bms_django_website.pagecache import invalidate_page_cache
+from .feeds import invalidate_feed
+from .models import ArchivedPost, Post
+from .scheduler import scheduler
+from .summaries import adjust_archive_month, month_of
+
+
+_batch = threading.local()
+
+
+@contextmanager
+def batched_post_signals():
+    """
+    Coalesce the work of the Post signal handlers until the block exits.
+
+    Feed invalidations are de-duplicated and archive month changes are summed, then
+    applied once when the block exits without an error. Use it inside the transaction
+    of the batch, so the summaries commit or roll back together with the rows; the
+    feeds and pages are invalidated once the transaction commits.
+    """
+    if getattr(_batch, 'active', False):
+        yield
+        return
+    _batch.active = True
+    _batch.authors = set()
+    _batch.months = Counter()
+    try:
+        yield
+        authors, months = _batch.authors, _batch.months
+    finally:
+        _batch.active = False
+    if authors:
+        invalidate_posts_on_commit(User.objects.filter(pk__in=authors).values_list('username', flat=True))
+    for (year, month), delta in months.items():
+        if delta:
+            adjust_archive_month(year, month, delta)
+
+
+@contextmanager
+def archiving_posts():
+    """
+    Keep the archive months of the posts deleted in the block.
+
+    Used by archive_old_posts: the posts it deletes live on in ArchivedPost, which the
+    month archive still counts.
+    """
+    previous = getattr(_batch, 'archiving', False)
+    _batch.archiving = True
+    try:
+        yield
+    finally:
+        _batch.archiving = previous
+
+
+def invalidate_posts_on_commit(usernames):
+    """
+    Invalidate the cached pages, the site feed and the feeds of some authors once the
+    current transaction commits, or now outside of a transaction.
+
+    Invalidating earlier would let a concurrent request cache the data from before
+    the commit again under the new generation.
+
+    Parameters:
+    - usernames: The usernames of the authors whose feeds show the changed posts.
+    """
+    usernames = list(usernames)
+
+    def invalidate():
+        invalidate_page_cache()
+        invalidate_feed('site')
+        for username in usernames:
+            invalidate_feed(f"user:{username}")
+
+    transaction.on_commit(invalidate)
+
+
+def _invalidate_feeds(post):
+    """Invalidate the feeds and pages showing a post after the commit, or at the end of the current batch."""
+    if getattr(_batch, 'active', False):
+        _batch.authors.add(post.author_id)
+    else:
+        invalidate_posts_on_commit([post.author.username])
+
+
+def _adjust(month, delta):
+    """Adjust an archive month now, or at the end of the current batch."""
+    if getattr(_batch, 'active', False):
+        _batch.months[month] += delta
+    else:
+        adjust_archive_month(*month, delta)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    """
+    Signal handler for post_save and post_delete events on Post to invalidate cached feeds and pages.
+
+    Parameters:
+    - sender: The model class.
+    - instance: The post that was saved or deleted.
+    - kwargs: Additional keyword arguments.
+    """
+    _invalidate_feeds(instance)
+
+
+def _archived_month(date_posted, deleted_at):
+    """Return the archive month a post counts towards, or None if it is deleted."""
+    return month_of(date_posted) if deleted_at is None else None
+
+
+@receiver(pre_save, sender=Post)
+def remember_archive_month(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal handler for pre_save events on Post to record the month stored in the database.
+
+    Parameters:
+    - sender: The model class.
+    - instance: The post about to be saved.
+    - update_fields: The fields being saved, or None for all fields.
+    - kwargs: Additional keyword arguments.
+    """
+    instance._archive_tracked = False
+    if instance.pk is None:
+        return
+    if update_fields is not None and not {'date_posted', 'deleted_at'} & set(update_fields):
+        return
+    stored = Post.all_objects.filter(pk=instance.pk).values_list('date_posted', 'deleted_at').first()
+    if stored is not None:
+        instance._archive_tracked = True
+        instance._archive_month = _archived_month(*stored)
+
+
+@receiver(post_save, sender=Post)
+def update_archive_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Signal handler for post_save events on Post to keep the month archive up to date.
+
+    Parameters:
+    - sender: The model class.
+    - instance: The post that was saved.
+    - created: A boolean indicating whether the post was created.
+    - update_fields: The fields that were saved, or None for all fields.
+    - kwargs: Additional keyword arguments.
+    """
+    if created:
+        previous = None
+    elif getattr(instance, '_archive_tracked', False):
+        previous = instance._archive_month
+    else:
+        return
+    current = _archived_month(instance.date_posted, instance.deleted_at)
+    if previous == current:
+        return
+    if previous is not None:
+        _adjust(previous, -1)
+    if current is not None:
+        _adjust(current, 1)
+
+
+@receiver(post_delete, sender=Post)
+def update_archive_on_delete(sender, instance, **kwargs):
+    """
+    Signal handler for post_delete events on Post to remove the post from the month archive.
+
+    Posts that were soft-deleted first have already been removed from the archive, and
+    posts moved to ArchivedPost stay in it.
+
+    Parameters:
+    - sender: The model class.
+    - instance: The post that was deleted.
+    - kwargs: Additional keyword arguments.
+    """
+    if getattr(_batch, 'archiving', False):
+        return
+    month = _archived_month(instance.date_posted, instance.deleted_at)
+    if month is not None:
+        _adjust(month, -1)
+
+
+@receiver(post_delete, sender=ArchivedPost)
+def remove_deleted_archived_post(sender, instance, **kwargs):
+    """
+    Signal handler for post_delete events on ArchivedPost to invalidate the cached feeds
+    and pages showing the post and remove it from the month archive.
+
+    Parameters:
+    - sender: The model class.
+    - instance: The archived post that was deleted.
+    - kwargs: Additional keyword arguments.
+    """
+    _invalidate_feeds(instance)
+    _adjust(month_of(instance.date_posted), -1)
+
+
+@receiver(post_save, sender=Post)
+def wake_scheduler(sender, instance, **kwargs):
+    """
+    Signal handler for post_save events on Post to wake the scheduler when a post is scheduled.
+
+    The scheduler may be sleeping until a later post, or until its next poll.
+
+    Parameters:
+    - sender: The model class.
+    - instance: The post that was saved.
+    - kwargs: Additional keyword arguments.
+    """
+    if instance.date_posted > timezone.now():
+        scheduler.wake()
+
+
+@receiver(request_started)
+def start_scheduler(sender, **kwargs):
+    """
+    Signal handler for request_started events to start the scheduler thread when it is enabled.
+
+    Parameters:
+    - sender: The handler class.
+    - kwargs: Additional keyword arguments.
+    """
+    if settings.POST_SCHEDULER_THREAD:
+        scheduler.start()
@@ -0,0 +1,329 @@
+"""
+Static snapshot of the public pages of the blog.
+
+The home page, the user pages, the post detail pages and the about page are rendered
+as an anonymous visitor would see them and written under STATIC_SITE_ROOT, one
+index.html per URL, so a static file server can keep serving reads when the
+application is down (see the README for an nginx configuration). Scheduled posts are
+left out until they are published and the snapshot is built again.
+
+Every page has a fingerprint computed from the posts it shows and from the templates.
+The fingerprints of the last build are kept in a manifest, and only pages whose
+fingerprint changed are rendered again. Rendering runs in a pool of processes.
+
+Functions:
+    output_path: Returns the file a URL is written to, relative to the output directory.
+    collect_pages: Yields every page of the snapshot with its fingerprint.
+    render_pages: Renders a list of pages and writes them to disk.
+    build_static_site: Renders the pages that changed since the last build.
+"""
+
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from .counters import view_counter
+from .workers import worker_pool
+from .models import ArchivedPost, Post
+from .rendering import RENDERER_VERSION
+from .views import PostListView, UserPostListView
+
+
+MANIFEST_NAME = '.manifest.json'
+RENDER_BATCH_SIZE = 50
+
+
+def _digest(*parts):
+    """Return a short hex digest of the string forms of parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()[:20]
+
+
+def _templates_digest():
+    """
+    Return a digest of the templates of the blog and users apps.
+
+    Editing a template changes the fingerprint of every page.
+
+    Returns:
+    - str
+    """
+    digest = hashlib.sha256()
+    for label in ('blog', 'users'):
+        root = Path(apps.get_app_config(label).path) / 'templates'
+        for path in sorted(root.rglob('*.html')):
+            digest.update(str(path.relative_to(root)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:20]
+
+
+def output_path(url):
+    """
+    Return the file a URL is written to, relative to the output directory.
+
+    '/' becomes 'index.html', '/user/alice?page=2' becomes 'user/alice/page/2/index.html'.
+    Segments made of dots, such as the page of a user named '..', are percent-encoded,
+    so they name a directory instead of moving up the tree.
+
+    Parameters:
+    - url: The URL of the page, with an optional page query parameter.
+
+    Returns:
+    - str
+
+    Raises:
+    - ValueError: If the path has an empty segment, such as '/user//'.
+    """
+    parts = urlsplit(url)
+    segments = unquote(parts.path).strip('/').split('/') if parts.path.strip('/') else []
+    page = parse_qs(parts.query).get('page')
+    if page:
+        segments += ['page', page[0]]
+    if any(not segment for segment in segments):
+        raise ValueError(f"Empty path segment in {url!r}.")
+    segments = ['%2E' * len(segment) if not segment.strip('.') else segment for segment in segments]
+    return '/'.join(segments + ['index.html'])
+
+
+def _page_file(output_dir, relative_path):
+    """
+    Return the absolute path of a page file, checking that it lies under output_dir.
+
+    Raises:
+    - ValueError: If the path leaves the output directory.
+    """
+    root = Path(output_dir).resolve()
+    path = (root / relative_path).resolve()
+    if not path.is_relative_to(root) or path == root:
+        raise ValueError(f"{relative_path!r} is outside of {output_dir}.")
+    return path
+
+
+def _list_pages(url, fingerprints, paginate_by, shows_total=False):
+    """
+    Yield the pages of a paginated list of posts.
+
+    Parameters:
+    - url: The URL of the first page.
+    - fingerprints: The fingerprints of the posts in list order.
+    - paginate_by: The number of posts per page.
+    - shows_total: Whether the pages show the total number of posts.
+
+    Yields:
+    - Tuples of (url, fingerprint)
+    """
+    num_pages = max(1, math.ceil(len(fingerprints) / paginate_by))
+    for number in range(1, num_pages + 1):
+        page = fingerprints[(number - 1) * paginate_by:number * paginate_by]
+        page_url = url if number == 1 else f'{url}?page={number}'
+        total = len(fingerprints) if shows_total else None
+        yield page_url, _digest(number, num_pages, total, *page)
+
+
+def collect_pages():
+    """
+    Yield every page of the snapshot with its fingerprint.
+
+    The fingerprint of a post covers its title, the hash of its content instead of the
+    content itself, its version, its author's avatar and the version of the Markdown
+    renderer. The renderer version stored with the post is included too, since
+    updating the content without saving the post clears it. List pages are
+    fingerprinted from the posts they show and the number of pages.
+
+    Yields:
+    - Tuples of (url, fingerprint)
+    """
+    templates = _digest(_templates_digest(), RENDERER_VERSION)
+    fields = ('id', 'title', 'content_hash', 'renderer_version', 'date_posted',
+              'author__username', 'author__profile__image')
+
+    home = []
+    by_author = {}
+    posts = Post.objects.published().order_by('-date_posted', '-id').values_list(*fields, 'version')
+    for pk, title, digest, rendered_by, date_posted, username, image, version in posts.iterator(chunk_size=2000):
+        fingerprint = _digest(templates, pk, title, digest, rendered_by, version,
+                              date_posted.isoformat(), username, image)
+        home.append(fingerprint)
+        by_author.setdefault(username, []).append(fingerprint)
+        yield reverse('post-detail', args=[pk]), fingerprint
+
+    # Archived posts are older than the live ones, so they follow them on the list pages.
+    archived = ArchivedPost.objects.order_by('-date_posted', '-id').values_list(*fields)
+    for pk, title, digest, rendered_by, date_posted, username, image in archived.iterator(chunk_size=2000):
+        fingerprint = _digest(templates, 'archived', pk, title, digest, rendered_by,
+                              date_posted.isoformat(), username, image)
+        home.append(fingerprint)
+        by_author.setdefault(username, []).append(fingerprint)
+        yield reverse('post-detail', args=[pk]), fingerprint
+
+    yield from _list_pages(reverse('blog-home'), home, PostListView.paginate_by)
+    for username in User.objects.values_list('username', flat=True).iterator(chunk_size=2000):
+        yield from _list_pages(reverse('user-posts', args=[username]),
+                               by_author.get(username, []), UserPostListView.paginate_by, shows_total=True)
+    yield reverse('blog-about'), _digest(templates, 'about')
+
+
+def _default_host():
+    """Return a host name the site accepts, for the Host header of the render requests."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def _close_connections():
+    """Close the database connections inherited from the parent process."""
+    connections.close_all()
+
+
+def render_pages(urls, output_dir, host=None):
+    """
+    Render pages as an anonymous visitor and write the successful ones to disk.
+
+    Views counted by PostDetailView while rendering are dropped.
+
+    Parameters:
+    - urls: The URLs of the pages.
+    - output_dir: The directory the pages are written to.
+    - host: The Host header of the requests; defaults to the first ALLOWED_HOSTS entry.
+
+    Returns:
+    - List of (url, status code) tuples
+    """
+    client = Client(HTTP_HOST=host or _default_host(), raise_request_exception=False)
+    results = []
+    with override_settings(VIEW_COUNT_FLUSH_INTERVAL=math.inf):
+        try:
+            for url in urls:
+                response = client.get(url)
+                if response.status_code == 200:
+                    path = _page_file(output_dir, output_path(url))
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    temporary = path.with_name(path.name + '.tmp')
+                    temporary.write_bytes(response.content)
+                    os.replace(temporary, path)
+                results.append((url, response.status_code))
+        finally:
+            view_counter.clear()
+    return results
+
+
+def _read_manifest(output_dir):
+    """Return the fingerprints recorded by the last build, keyed by output path."""
+    try:
+        with open(Path(output_dir) / MANIFEST_NAME) as manifest:
+            return json.load(manifest)['pages']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def _write_manifest(output_dir, pages):
+    """Atomically record the fingerprints of the pages written so far."""
+    path = Path(output_dir) / MANIFEST_NAME
+    temporary = path.with_name(path.name + '.tmp')
+    with open(temporary, 'w') as manifest:
+        json.dump({'version': 1, 'pages': pages}, manifest)
+    os.replace(temporary, path)
+
+
+def _remove_page(output_dir, relative_path):
+    """
+    Delete a page that no longer exists, and its directories once they are empty.
+
+    Paths of the manifest that lead outside of output_dir are ignored.
+    """
+    try:
+        path = _page_file(output_dir, relative_path)
+    except ValueError:
+        return
+    path.unlink(missing_ok=True)
+    root = Path(output_dir).resolve()
+    directory = path.parent
+    while directory != root and directory.is_dir() and not any(directory.iterdir()):
+        directory.rmdir()
+        directory = directory.parent
+
+
+def build_static_site(output_dir, workers=4, full=False, host=None, progress=None):
+    """
+    Render the pages whose fingerprint changed since the last build.
+
+    Pages that no longer exist are deleted. The manifest is written at the end, also
+    when the build is interrupted, so the next build resumes where this one stopped.
+
+    Parameters:
+    - output_dir: The directory the snapshot is written to.
+    - workers: The number of rendering processes, or 0 to render in this process.
+    - full: Whether to render every page regardless of the manifest.
+    - host: The Host header of the render requests.
+    - progress: Optional callable taking (pages done, pages to render) after every batch.
+
+    Returns:
+    - Dictionary with the numbers of 'rendered', 'unchanged', 'removed' and 'failed' pages
+    """
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    previous = {} if full else _read_manifest(output_dir)
+    current = {}
+    stale = []
+    for url, fingerprint in collect_pages():
+        relative_path = output_path(url)
+        current[relative_path] = fingerprint
+        if previous.get(relative_path) != fingerprint or not (Path(output_dir) / relative_path).exists():
+            stale.append(url)
+
+    removed = 0
+    for relative_path in set(previous) - set(current):
+        _remove_page(output_dir, relative_path)
+        removed += 1
+
+    manifest = {path: fingerprint for path, fingerprint in previous.items() if path in current}
+    batches = [stale[i:i + RENDER_BATCH_SIZE] for i in range(0, len(stale), RENDER_BATCH_SIZE)]
+    rendered = failed = 0
+
+    def record(results):
+        nonlocal rendered, failed
+        for url, status in results:
+            relative_path = output_path(url)
+            if status == 200:
+                manifest[relative_path] = current[relative_path]
+                rendered += 1
+            else:
+                manifest.pop(relative_path, None)
+                failed += 1
+        if progress:
+            progress(rendered + failed, len(stale))
+
+    try:
+        if workers and len(batches) > 1:
+            # Forked workers must not share the parent's database connections.
+            connections.close_all()
+            with worker_pool(workers, initializer=_close_connections) as executor:
+                for results in executor.map(render_pages, batches,
+                                            [output_dir] * len(batches), [host] * len(batches)):
+                    record(results)
+        else:
+            for batch in batches:
+                record(render_pages(batch, output_dir, host))
+    finally:
+        _write_manifest(output_dir, manifest)
+
+    return {
+        'rendered': rendered,
+        'unchanged': len(current) - len(stale),
+        'removed': removed,
+        'failed': failed,
+    }
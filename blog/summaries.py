@@ -0,0 +1,126 @@
+"""
+Precomputed summaries of blog posts.
+
+The month archive is read from the PostArchiveMonth table, which the signal handlers
+adjust by one row per changed post instead of grouping the whole Post table on every
+request. The rows count archived posts, and scheduled posts too; scheduled posts are
+subtracted when the archive is read, until they are published. The popular posts are
+read from the PostViewCount table filled by the view counter buffer. Both lists are
+small, so the sidebar keeps them in the cache.
+"""
+
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .models import ArchivedPost, Post, PostArchiveMonth, PostViewCount
+
+
+SIDEBAR_CACHE_KEY = 'blog:sidebar'
+SIDEBAR_CACHE_TIMEOUT = 60
+POPULAR_POSTS_SIZE = 5
+
+
+def month_of(date):
+    """
+    Return the (year, month) of a datetime in the current time zone.
+
+    Parameters:
+    - date: An aware datetime.
+
+    Returns:
+    - Tuple of two ints
+    """
+    date = timezone.localtime(date)
+    return date.year, date.month
+
+
+def adjust_archive_month(year, month, delta):
+    """
+    Add delta to the number of posts in an archive month.
+
+    Parameters:
+    - year: The year of the month.
+    - month: The month, from 1 to 12.
+    - delta: The change in the number of posts.
+    """
+    if delta > 0:
+        PostArchiveMonth.objects.bulk_create(
+            [PostArchiveMonth(year=year, month=month)], ignore_conflicts=True)
+    PostArchiveMonth.objects.filter(year=year, month=month).update(post_count=F('post_count') + delta)
+    cache.delete(SIDEBAR_CACHE_KEY)
+
+
+def rebuild_archive_months():
+    """
+    Recompute the month archive from the Post and ArchivedPost tables.
+
+    Returns:
+    - int: The number of months with posts.
+    """
+    counts = Counter()
+    for queryset in (Post.objects.all(), ArchivedPost.objects.all()):
+        months = (
+            queryset
+            .annotate(year=ExtractYear('date_posted'), month=ExtractMonth('date_posted'))
+            .values_list('year', 'month')
+            .annotate(post_count=Count('id'))
+            .order_by()
+        )
+        for year, month, post_count in months:
+            counts[year, month] += post_count
+    with transaction.atomic():
+        PostArchiveMonth.objects.all().delete()
+        created = PostArchiveMonth.objects.bulk_create(
+            PostArchiveMonth(year=year, month=month, post_count=post_count)
+            for (year, month), post_count in counts.items())
+    cache.delete(SIDEBAR_CACHE_KEY)
+    return len(created)
+
+
+def published_archive_months(now=None):
+    """
+    Return the months with published posts and the number of published posts in each.
+
+    Scheduled posts, which are counted in PostArchiveMonth, are subtracted.
+
+    Parameters:
+    - now: The current time, defaults to timezone.now().
+
+    Returns:
+    - List of dictionaries with year, month and post_count, newest first
+    """
+    scheduled = Counter(month_of(date) for date in Post.objects.scheduled(now).values_list('date_posted', flat=True))
+    months = []
+    for row in PostArchiveMonth.objects.filter(post_count__gt=0).values('year', 'month', 'post_count'):
+        row['post_count'] -= scheduled[row['year'], row['month']]
+        if row['post_count'] > 0:
+            months.append(row)
+    return months
+
+
+def get_sidebar_summaries():
+    """
+    Return the popular posts and the archive months shown in the sidebar.
+
+    Returns:
+    - Dictionary with 'popular_posts' (list of dictionaries with id, title and views)
+      and 'archive_months' (list of dictionaries with year, month and post_count).
+    """
+    summaries = cache.get(SIDEBAR_CACHE_KEY)
+    if summaries is None:
+        summaries = {
+            'popular_posts': list(
+                PostViewCount.objects
+                .filter(post__deleted_at__isnull=True, post__date_posted__lte=timezone.now())
+                .order_by('-views', '-post_id')
+                .values('views', id=F('post_id'), title=F('post__title'))[:POPULAR_POSTS_SIZE]
+            ),
+            'archive_months': published_archive_months(),
+        }
+        cache.set(SIDEBAR_CACHE_KEY, summaries, SIDEBAR_CACHE_TIMEOUT)
+    return summaries
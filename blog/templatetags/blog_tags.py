@@ -0,0 +1,24 @@
+"""
+Template tags for the Blog app.
+
+Functions:
+    blog_sidebar: Renders the popular posts and month archive sections of the sidebar.
+"""
+
+from django import template
+
+from ..summaries import get_sidebar_summaries
+
+
+register = template.Library()
+
+
+@register.inclusion_tag("blog/sidebar_summaries.html")
+def blog_sidebar():
+    """
+    Render the sidebar sections backed by the precomputed summaries.
+
+    Returns:
+    - Dictionary with the template context
+    """
+    return get_sidebar_summaries()
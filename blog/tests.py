@@ -1,22 +1,49 @@
-from django.test import TestCase
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.urls import reverse
-from .models import Post
+from bms_django_website import pagecache, ratelimit
+from bms_django_website.pagination import EstimatedCountPaginator, estimate_row_count
+from users.factories import make_users
+from .counters import view_counter, write_view_counts
+from .factories import make_posts
+from .models import ArchivedPost, Post, PostArchiveMonth, PostViewCount
+from .rendering import RENDERER_VERSION, content_hash
+from .scheduler import PublishScheduler, next_publication
+from .static_site import output_path
 
 
 class BlogTests(TestCase):
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         # Create a test user
-        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
 
         # Create a test post
-        self.post = Post.objects.create(
+        cls.post = Post.objects.create(
             title='Test Post',
             content='This is a test post content.',
-            author=self.user
+            author=cls.user
         )
 
+    def setUp(self):
+        # Cached pages and feeds outlive the test that rendered them.
+        cache.clear()
+
     def test_blog_home_view(self):
         """
         Test the blog home view.
@@ -56,7 +83,8 @@ class BlogTests(TestCase):
         """
         self.client.login(username='testuser', password='testpassword')
         response = self.client.post(reverse('post-update', args=[self.post.id]),
-                                    {'title': 'Updated Post', 'content': 'Updated Post Content'})
+                                    {'title': 'Updated Post', 'content': 'Updated Post Content',
+                                     'version': self.post.version})
         self.assertEqual(response.status_code, 302)
         self.post.refresh_from_db()
         self.assertEqual(self.post.title, 'Updated Post')
@@ -99,3 +127,890 @@ class BlogTests(TestCase):
         response = self.client.post(reverse('post-delete', args=[self.post.id]))
         self.assertEqual(response.status_code, 403)
         self.assertTrue(Post.objects.filter(title='Test Post').exists())
+
+    @override_settings(RATE_LIMITS={'post_create': (1, 60)})
+    def test_post_create_view_rate_limited(self):
+        """
+        Test that post creation is throttled.
+        """
+        ratelimit.reset()
+        self.client.login(username='testuser', password='testpassword')
+        self.client.post(reverse('post-create'), {'title': 'First', 'content': 'First Content'})
+        response = self.client.post(reverse('post-create'), {'title': 'Second', 'content': 'Second Content'})
+        ratelimit.reset()
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(Post.objects.filter(title='Second').exists())
+
+
+class PostApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        make_posts(cls.user, 5)
+
+    def test_post_list_api_sparse_fields(self):
+        """
+        Test that only the requested fields are returned.
+        """
+        response = self.client.get(reverse('api-post-list'), {'fields': 'title,author'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[0], {'title': 'Post 4', 'author': 'testuser'})
+
+    def test_post_list_api_unknown_field(self):
+        """
+        Test that unknown fields are rejected.
+        """
+        response = self.client.get(reverse('api-post-list'), {'fields': 'title,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_list_api_cursor_pagination(self):
+        """
+        Test that following next_cursor walks every post exactly once.
+        """
+        titles = []
+        params = {'fields': 'title', 'limit': 2}
+        while True:
+            data = self.client.get(reverse('api-post-list'), params).json()
+            titles += [item['title'] for item in data['results']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(titles, [f'Post {i}' for i in range(4, -1, -1)])
+
+    def test_api_includes_archived_posts(self):
+        """
+        Test that archived posts follow the live ones in the list and are served by the detail endpoint.
+        """
+        Post.objects.filter(title__in=['Post 0', 'Post 1']).update(
+            date_posted=timezone.now() - datetime.timedelta(days=400))
+        call_command('archive_old_posts', '--pause', '0', stdout=StringIO())
+        archived = ArchivedPost.objects.get(title='Post 0')
+
+        titles = []
+        params = {'fields': 'title', 'limit': 2}
+        while True:
+            data = self.client.get(reverse('api-post-list'), params).json()
+            titles += [item['title'] for item in data['results']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(titles, [f'Post {i}' for i in range(4, -1, -1)])
+
+        url = reverse('api-post-detail', args=[archived.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['title'], 'Post 0')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_post_detail_api_conditional_get(self):
+        """
+        Test that a matching If-None-Match header gets a 304 response.
+        """
+        post = Post.objects.first()
+        url = reverse('api-post-detail', args=[post.id])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['url'], reverse('post-detail', args=[post.id]))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_post_list_api_conditional_get_skips_content(self):
+        """
+        Test that an unchanged page gets a 304 from one query that does not read the
+        content, and that editing a post on the page changes the ETag.
+        """
+        url = reverse('api-post-list')
+        params = {'fields': 'title,content,author', 'limit': 2}
+        etag = self.client.get(url, params)['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"content"', queries[0]['sql'])
+
+        post = Post.objects.get(title='Post 4')
+        post.content = 'Edited'
+        post.save()
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['content'], 'Edited')
+
+
+class PostFeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.other = User.objects.create_user(username='otheruser', password='otherpassword')
+        Post.objects.create(title='Test Post', content='Test content', author=cls.user)
+        Post.objects.create(title='Other Post', content='Other content', author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_site_feed(self):
+        """
+        Test that the site feed is an Atom document listing every post.
+        """
+        response = self.client.get(reverse('blog-feed'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('application/atom+xml'))
+        self.assertContains(response, 'Test Post')
+        self.assertContains(response, 'Other Post')
+
+    def test_user_feed(self):
+        """
+        Test that an author's feed only lists that author's posts.
+        """
+        response = self.client.get(reverse('user-posts-feed', args=['testuser']))
+        self.assertContains(response, 'Test Post')
+        self.assertNotContains(response, 'Other Post')
+        response = self.client.get(reverse('user-posts-feed', args=['nobody']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_feed_is_served_from_cache(self):
+        """
+        Test that a cached feed needs no queries and answers conditional requests with 304.
+        """
+        response = self.client.get(reverse('blog-feed'))
+        with self.assertNumQueries(0):
+            cached = self.client.get(reverse('blog-feed'))
+        self.assertEqual(cached.content, response.content)
+
+        response = self.client.get(reverse('blog-feed'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_feed_regenerated_after_post_change(self):
+        """
+        Test that saving and deleting posts refreshes the cached feeds.
+        """
+        self.client.get(reverse('blog-feed'))
+        self.client.get(reverse('user-posts-feed', args=['testuser']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(title='Fresh Post', content='Fresh content', author=self.user)
+        self.assertContains(self.client.get(reverse('blog-feed')), 'Fresh Post')
+        self.assertContains(self.client.get(reverse('user-posts-feed', args=['testuser'])), 'Fresh Post')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertNotContains(self.client.get(reverse('blog-feed')), 'Fresh Post')
+
+    def test_feeds_regenerated_after_username_change(self):
+        """
+        Test that renaming an author refreshes the site feed and drops the feed cached
+        under the old name.
+        """
+        self.client.get(reverse('blog-feed'))
+        self.client.get(reverse('user-posts-feed', args=['testuser']))
+
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('profile'), {'username': 'renamed', 'email': 'renamed@example.com'})
+
+        self.assertContains(self.client.get(reverse('blog-feed')), 'renamed')
+        response = self.client.get(reverse('user-posts-feed', args=['testuser']))
+        self.assertEqual(response.status_code, 404)
+        self.assertContains(self.client.get(reverse('user-posts-feed', args=['renamed'])), 'renamed')
+
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600)
+class PostViewCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.post = Post.objects.create(title='Test Post', content='Test content', author=cls.user)
+        cls.other_post = Post.objects.create(title='Other Post', content='Other content', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        view_counter.clear()
+
+    def test_views_are_buffered_until_flush(self):
+        """
+        Test that views are kept in memory and written in one batch.
+        """
+        for _ in range(3):
+            response = self.client.get(reverse('post-detail', args=[self.post.id]))
+        self.assertContains(response, '3 views')
+        self.assertFalse(PostViewCount.objects.exists())
+
+        self.client.get(reverse('post-detail', args=[self.other_post.id]))
+        self.assertEqual(view_counter.flush(), 2)
+
+        self.assertEqual(PostViewCount.objects.get(post=self.post).views, 3)
+        self.assertEqual(PostViewCount.objects.get(post=self.other_post).views, 1)
+
+    def test_flush_adds_to_existing_counts(self):
+        """
+        Test that flushing increments the stored counters instead of overwriting them.
+        """
+        PostViewCount.objects.create(post=self.post, views=10)
+        view_counter.increment(self.post.id)
+        view_counter.increment(self.post.id)
+        with self.assertNumQueries(5):
+            view_counter.flush()
+        self.assertEqual(PostViewCount.objects.get(post=self.post).views, 12)
+
+    def test_most_viewed_view(self):
+        """
+        Test that the most viewed page lists posts by number of views.
+        """
+        PostViewCount.objects.create(post=self.post, views=5)
+        PostViewCount.objects.create(post=self.other_post, views=50)
+        response = self.client.get(reverse('post-most-viewed'))
+        self.assertEqual(response.status_code, 200)
+        titles = [view_count.post.title for view_count in response.context['view_counts']]
+        self.assertEqual(titles, ['Other Post', 'Test Post'])
+
+
+class PostSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.january = timezone.make_aware(datetime.datetime(2023, 1, 15))
+        cls.march = timezone.make_aware(datetime.datetime(2023, 3, 10))
+
+    def setUp(self):
+        cache.clear()
+
+    def archive(self):
+        return {(m.year, m.month): m.post_count for m in PostArchiveMonth.objects.filter(post_count__gt=0)}
+
+    def test_archive_updated_incrementally(self):
+        """
+        Test that creating, moving and deleting posts keeps the month archive in step.
+        """
+        first = Post.objects.create(title='First', content='First', author=self.user, date_posted=self.january)
+        Post.objects.create(title='Second', content='Second', author=self.user, date_posted=self.january)
+        self.assertEqual(self.archive(), {(2023, 1): 2})
+
+        first.date_posted = self.march
+        first.save()
+        self.assertEqual(self.archive(), {(2023, 1): 1, (2023, 3): 1})
+
+        first.title = 'Renamed'
+        first.save(update_fields=['title'])
+        first.delete()
+        self.assertEqual(self.archive(), {(2023, 1): 1})
+
+    def test_rebuild_post_summaries(self):
+        """
+        Test that the rebuild command recomputes the archive from scratch.
+        """
+        Post.objects.create(title='First', content='First', author=self.user, date_posted=self.january)
+        Post.objects.bulk_create([
+            Post(title='Imported', content='Imported', author=self.user, date_posted=self.march),
+        ])
+        PostArchiveMonth.objects.create(year=1999, month=1, post_count=7)
+
+        call_command('rebuild_post_summaries', stdout=StringIO())
+        self.assertEqual(self.archive(), {(2023, 1): 1, (2023, 3): 1})
+
+    def test_month_archive_view(self):
+        """
+        Test that the month archive only lists posts from that month.
+        """
+        Post.objects.create(title='January Post', content='Content', author=self.user, date_posted=self.january)
+        Post.objects.create(title='March Post', content='Content', author=self.user, date_posted=self.march)
+        response = self.client.get(reverse('post-archive-month', args=[2023, 1]))
+        self.assertContains(response, 'January Post')
+        self.assertNotContains(response, 'March Post')
+        self.assertEqual(self.client.get(reverse('post-archive-month', args=[2023, 13])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('post-archive-month', args=[9999, 12])).status_code, 404)
+
+    def test_sidebar_shows_popular_posts_and_archive(self):
+        """
+        Test that the sidebar lists the most viewed posts and the archive months.
+        """
+        post = Post.objects.create(title='Popular Post', content='Content', author=self.user,
+                                   date_posted=self.january)
+        PostViewCount.objects.create(post=post, views=42)
+        response = self.client.get(reverse('post-archive'))
+        self.assertContains(response, 'Popular Post')
+        self.assertContains(response, reverse('post-archive-month', args=[2023, 1]))
+
+
+class PostLifecycleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.post = Post.objects.create(title='Test Post', content='Test content', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_delete_view_soft_deletes(self):
+        """
+        Test that deleting through the site hides the post but keeps its row.
+        """
+        self.client.login(username='testuser', password='testpassword')
+        response = self.client.post(reverse('post-delete', args=[self.post.id]))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Post.objects.filter(pk=self.post.id).exists())
+        self.assertIsNotNone(Post.all_objects.get(pk=self.post.id).deleted_at)
+        self.assertFalse(PostArchiveMonth.objects.filter(post_count__gt=0).exists())
+        self.assertEqual(self.client.get(reverse('post-detail', args=[self.post.id])).status_code, 404)
+
+    def test_author_deletes_archived_post(self):
+        """
+        Test that the author can still delete a post once it is archived.
+        """
+        Post.objects.filter(pk=self.post.pk).update(date_posted=timezone.now() - datetime.timedelta(days=400))
+        call_command('rebuild_post_summaries', stdout=StringIO())
+        call_command('archive_old_posts', '--pause', '0', stdout=StringIO())
+        self.client.login(username='testuser', password='testpassword')
+        url = reverse('post-delete', args=[self.post.id])
+        self.assertContains(self.client.get(reverse('post-detail', args=[self.post.id])), url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(ArchivedPost.objects.exists())
+        self.assertFalse(PostArchiveMonth.objects.filter(post_count__gt=0).exists())
+        self.assertEqual(self.client.get(reverse('post-detail', args=[self.post.id])).status_code, 404)
+
+    def test_purge_deleted_posts(self):
+        """
+        Test that only posts soft-deleted before the cutoff are purged, in batches.
+        """
+        old = [Post.objects.create(title=f'Old {i}', content='Old', author=self.user) for i in range(3)]
+        for post in old:
+            post.soft_delete()
+        Post.all_objects.filter(pk__in=[post.pk for post in old]).update(
+            deleted_at=timezone.now() - datetime.timedelta(days=60))
+        self.post.soft_delete()
+
+        out = StringIO()
+        call_command('purge_deleted_posts', '--batch-size', '2', '--pause', '0', stdout=out)
+        self.assertIn('Done, purged 3 post(s).', out.getvalue())
+        self.assertEqual(list(Post.all_objects.values_list('pk', flat=True)), [self.post.pk])
+
+    def test_archive_old_posts(self):
+        """
+        Test that old posts are moved to the archive table and still served at their URL,
+        listed with the live posts, counted in the archive months and keep their views.
+        """
+        posted = timezone.now() - datetime.timedelta(days=400)
+        Post.objects.filter(pk=self.post.pk).update(date_posted=posted)
+        PostViewCount.objects.create(post=self.post, views=5)
+        recent = Post.objects.create(title='Recent Post', content='Recent', author=self.user)
+        call_command('rebuild_post_summaries', stdout=StringIO())
+        months = list(PostArchiveMonth.objects.filter(post_count__gt=0).values_list('year', 'month', 'post_count'))
+
+        call_command('archive_old_posts', '--pause', '0', stdout=StringIO())
+
+        self.assertEqual(list(Post.all_objects.values_list('pk', flat=True)), [recent.pk])
+        archived = ArchivedPost.objects.get()
+        self.assertEqual((archived.title, archived.views), ('Test Post', 5))
+        self.assertCountEqual(
+            PostArchiveMonth.objects.filter(post_count__gt=0).values_list('year', 'month', 'post_count'), months)
+        response = self.client.get(reverse('post-detail', args=[self.post.id]))
+        self.assertContains(response, 'Test Post')
+        for url in [reverse('blog-home'), reverse('user-posts', args=[self.user.username]),
+                    reverse('post-archive-month', args=[posted.year, posted.month])]:
+            self.assertContains(self.client.get(url), 'Test Post')
+
+        write_view_counts({self.post.pk: 2, recent.pk: 1})
+        self.assertEqual(ArchivedPost.objects.get().views, 7)
+        self.assertEqual(PostViewCount.objects.get(post=recent).views, 1)
+
+
+class PostAdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='adminpassword')
+        make_posts(cls.admin, 3, content='Content')
+        Post.objects.create(title='Deleted Post', content='Content', author=cls.admin).soft_delete()
+
+    def setUp(self):
+        self.client.login(username='admin', password='adminpassword')
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """
+        Test that authors are joined in the changelist query rather than fetched per row.
+        """
+        url = reverse('admin:blog_post_changelist')
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        make_posts(make_users(5), 5, title='More {i}', content='Content')
+        with CaptureQueriesContext(connection) as more:
+            response = self.client.get(url)
+        self.assertContains(response, 'More 4')
+        self.assertEqual(len(more), len(few))
+
+    def test_changelist_prefix_search(self):
+        """
+        Test that the search matches title prefixes, case-insensitively.
+        """
+        response = self.client.get(reverse('admin:blog_post_changelist'), {'q': '"post 1"'})
+        self.assertContains(response, 'Post 1')
+        self.assertNotContains(response, 'Post 2')
+
+    def test_estimated_count(self):
+        """
+        Test that the planner estimate is used for unfiltered listings only.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(estimate_row_count('blog_post'), 4)
+        self.assertEqual(estimate_row_count('blog_post', 'post_feed_idx'), 3)
+
+        Post.objects.create(title='Unanalyzed Post', content='Content', author=self.admin)
+        unfiltered = Post.objects.order_by('-date_posted')
+        paginator = EstimatedCountPaginator(unfiltered, 10, unfiltered=Post.objects.all(),
+                                            index='post_feed_idx', threshold=0)
+        self.assertEqual(paginator.count, 3)
+        filtered = Post.objects.filter(title__istartswith='post').order_by('-date_posted')
+        paginator = EstimatedCountPaginator(filtered, 10, unfiltered=Post.objects.all(),
+                                            index='post_feed_idx', threshold=0)
+        self.assertEqual(paginator.count, 3)
+        paginator = EstimatedCountPaginator(unfiltered, 10, unfiltered=Post.objects.all(),
+                                            index='post_feed_idx')
+        self.assertEqual(paginator.count, 4)
+
+
+class StaticSiteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.posts = make_posts(cls.user, 7, content='Content')
+
+    def setUp(self):
+        cache.clear()
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+        view_counter.clear()
+
+    def build(self):
+        out = StringIO()
+        call_command('build_static_site', '--output', self.output, '--workers', '0', stdout=out)
+        return out.getvalue()
+
+    def read(self, url):
+        with open(os.path.join(self.output, output_path(url)), encoding='utf-8') as page:
+            return page.read()
+
+    def test_build_writes_public_pages(self):
+        """
+        Test that the list, user, detail and about pages are written without counting views.
+        """
+        self.assertIn('12 rendered, 0 unchanged', self.build())
+        self.assertIn('Post 6', self.read(reverse('blog-home')))
+        self.assertIn('Post 0', self.read(reverse('blog-home') + '?page=2'))
+        self.assertIn('Posts by testuser (7)', self.read(reverse('user-posts', args=['testuser'])))
+        self.assertIn('Post 3', self.read(reverse('post-detail', args=[self.posts[3].pk])))
+        self.assertTrue(os.path.exists(os.path.join(self.output, output_path(reverse('blog-about')))))
+        self.assertFalse(PostViewCount.objects.exists())
+        self.assertEqual(view_counter.pending(self.posts[3].pk), 0)
+
+    def test_dot_usernames_stay_in_their_directory(self):
+        """
+        Test that the pages of a user named '..' do not overwrite the home page.
+        """
+        dots = User.objects.create_user(username='..', password='testpassword')
+        Post.objects.create(title='Dots Post', content='Content', author=dots)
+        self.assertEqual(output_path(reverse('user-posts', args=['..']) + '?page=2'),
+                         'blog/user/%2E%2E/page/2/index.html')
+
+        self.assertIn('14 rendered', self.build())
+        self.assertNotIn('Posts by ..', self.read(reverse('blog-home')))
+        self.assertIn('Posts by .. (1)', self.read(reverse('user-posts', args=['..'])))
+        self.assertIn('0 rendered, 14 unchanged', self.build())
+
+    def test_build_is_incremental(self):
+        """
+        Test that only the pages showing a changed post are rendered again.
+        """
+        self.build()
+        self.assertIn('0 rendered, 12 unchanged', self.build())
+
+        self.posts[6].title = 'Edited Post'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts[6].save()
+        self.assertIn('3 rendered, 9 unchanged', self.build())
+        self.assertIn('Edited Post', self.read(reverse('blog-home')))
+
+        # Updating the content without saving clears the stored renderer version.
+        Post.objects.filter(pk=self.posts[5].pk).update(content='Updated content', renderer_version='')
+        self.assertIn('3 rendered, 9 unchanged', self.build())
+        self.assertIn('Updated content', self.read(reverse('post-detail', args=[self.posts[5].pk])))
+
+        self.posts[0].soft_delete()
+        self.assertIn('1 removed', self.build())
+        self.assertFalse(os.path.exists(
+            os.path.join(self.output, output_path(reverse('post-detail', args=[self.posts[0].pk])))))
+
+
+class PageCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.post = Post.objects.create(title='Test Post', content='Test content ' * 50, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        view_counter.clear()
+        self.url = reverse('blog-home')
+
+    def test_anonymous_page_is_served_from_cache(self):
+        """
+        Test that a cached page is served precompressed without touching the database.
+        """
+        first = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(second.content), gzip.decompress(first.content))
+        self.assertIn(b'Test Post', gzip.decompress(second.content))
+        self.assertIn('Accept-Encoding', second['Vary'])
+
+        plain = self.client.get(self.url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertContains(plain, 'Test Post')
+
+        not_modified = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_cached_page_keeps_vary_cookie(self):
+        """
+        Test that cached responses vary on Cookie like rendered ones, so shared caches keep them apart.
+        """
+        with self.settings(PAGE_CACHE_ENABLED=False):
+            rendered = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        miss = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        hit = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        for response in (rendered, miss, hit):
+            vary = {value.strip().lower() for value in response['Vary'].split(',')}
+            self.assertEqual(vary, {'cookie', 'accept-encoding'})
+
+    @skipUnless(pagecache.brotli, "brotli is not installed")
+    def test_brotli_is_preferred(self):
+        """
+        Test that clients accepting Brotli get the Brotli encoding.
+        """
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn(b'Test Post', pagecache.brotli.decompress(response.content))
+
+    def test_saving_a_post_invalidates_pages(self):
+        """
+        Test that a new post shows up on the first request after its transaction commits.
+        """
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(title='Newer Post', content='Content', author=self.user)
+            self.assertNotContains(self.client.get(self.url), 'Newer Post')
+        self.assertContains(self.client.get(self.url), 'Newer Post')
+
+    def test_requests_with_cookies_and_detail_pages_bypass_cache(self):
+        """
+        Test that visitors with cookies and post detail pages are always rendered.
+        """
+        self.client.get(self.url)
+        self.client.cookies['sessionid'] = 'anything'
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertTrue(queries)
+        self.client.cookies.clear()
+
+        detail = reverse('post-detail', args=[self.post.pk])
+        self.client.get(detail)
+        response = self.client.get(detail, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(view_counter.pending(self.post.pk), 2)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class PostRenderingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_save_stores_sanitized_html(self):
+        """
+        Test that saving a post stores the rendered, sanitized HTML of its content.
+        """
+        post = Post.objects.create(title='Markdown', content='Some **bold** text\n\n<script>alert(1)</script>',
+                                   author=self.user)
+        post.refresh_from_db()
+        self.assertIn('<strong>bold</strong>', post.content_html)
+        self.assertNotIn('<script>', post.content_html)
+        self.assertEqual(post.content_hash, content_hash(post.content))
+        self.assertEqual(post.renderer_version, RENDERER_VERSION)
+
+        post.content = 'Now *emphasis*'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertIn('<em>emphasis</em>', post.content_html)
+
+        response = self.client.get(reverse('post-detail', args=[post.pk]))
+        self.assertContains(response, '<em>emphasis</em>', html=True)
+
+    def test_stale_html_is_rendered_on_the_fly(self):
+        """
+        Test that Post.html renders the content when the stored HTML is out of date.
+        """
+        post = Post.objects.create(title='Markdown', content='Old text', author=self.user)
+        Post.objects.filter(pk=post.pk).update(content='New *text*', renderer_version='')
+        post.refresh_from_db()
+        self.assertNotIn('<em>', post.content_html)
+        self.assertIn('<em>text</em>', post.html)
+
+    def test_rerender_posts(self):
+        """
+        Test that the command renders posts written without rendering, and only those.
+        """
+        Post.objects.bulk_create([
+            Post(title=f'Post {i}', content=f'Post *{i}*', author=self.user) for i in range(3)
+        ])
+        Post.objects.create(title='Rendered', content='Already rendered', author=self.user)
+
+        out = StringIO()
+        call_command('rerender_posts', '--workers', '0', '--batch-size', '2', stdout=out)
+        self.assertIn('Done, rendered 3 post(s).', out.getvalue())
+        self.assertFalse(Post.objects.exclude(renderer_version=RENDERER_VERSION).exists())
+        self.assertIn('<em>0</em>', Post.objects.get(title='Post 0').content_html)
+
+        out = StringIO()
+        call_command('rerender_posts', '--workers', '0', '--all', stdout=out)
+        self.assertIn('Done, rendered 4 post(s).', out.getvalue())
+
+
+class PostConcurrencyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.post = Post.objects.create(title='Original', content='Original content', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='testuser', password='testpassword')
+        self.url = reverse('post-update', args=[self.post.pk])
+
+    def test_form_carries_version(self):
+        """
+        Test that the update form holds the current version in a hidden field.
+        """
+        self.assertEqual(self.post.version, 1)
+        response = self.client.get(self.url)
+        self.assertContains(response, '<input type="hidden" name="version" value="1"', html=False)
+
+    def test_stale_edit_is_refused(self):
+        """
+        Test that of two edits started from the same version, the second gets a 409.
+        """
+        response = self.client.post(self.url, {'title': 'First edit', 'content': 'Original content', 'version': 1})
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(self.url, {'title': 'Second edit', 'content': 'Second content', 'version': 1})
+        self.assertEqual(response.status_code, 409)
+        self.assertContains(response, 'This post was changed while you were editing it.', status_code=409)
+        self.assertContains(response, 'name="version" value="2"', status_code=409)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'First edit')
+        self.assertEqual(self.post.content, 'Original content')
+        self.assertEqual(self.post.version, 2)
+
+        response = self.client.post(self.url, {'title': 'Second edit', 'content': 'Second content', 'version': 2})
+        self.assertEqual(response.status_code, 302)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'Second edit')
+        self.assertEqual(self.post.version, 3)
+
+    def test_only_changed_fields_are_written(self):
+        """
+        Test that an edit is one conditional UPDATE writing only the changed fields.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'title': 'New title', 'content': 'Original content', 'version': 1})
+        self.assertEqual(response.status_code, 302)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "blog_post"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"title"', updates[0])
+        self.assertNotIn('"content"', updates[0])
+        self.assertIn('"version" = 1', updates[0].split('WHERE', 1)[1])
+
+    def test_save_bumps_version(self):
+        """
+        Test that saving the title or content elsewhere, e.g. in the admin, invalidates open forms.
+        """
+        self.post.title = 'Admin edit'
+        self.post.save()
+        self.assertEqual(self.post.version, 2)
+        self.post.soft_delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 2)
+        self.assertFalse(Post.all_objects.get(pk=self.post.pk).save_if_version(2, ['title']))
+
+    def test_stale_save_still_bumps_version(self):
+        """
+        Test that saving a copy of the post loaded before another save moves the version past it.
+        """
+        stale = Post.objects.get(pk=self.post.pk)
+        self.post.title = 'First edit'
+        self.post.save()
+        stale.title = 'Second edit'
+        stale.save()
+        self.assertEqual(stale.version, 3)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).version, 3)
+        self.assertFalse(self.post.save_if_version(2, ['title']))
+
+
+class PostSchedulingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.published = Post.objects.create(title='Published post', content='Out now', author=cls.user,
+                                            date_posted=timezone.now() - datetime.timedelta(days=2))
+        cls.scheduled = Post.objects.create(title='Scheduled post', content='Coming soon', author=cls.user,
+                                            date_posted=timezone.now() + datetime.timedelta(hours=1))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_scheduled_posts_are_hidden(self):
+        """
+        Test that scheduled posts are left out of the public pages, feeds and API.
+        """
+        response = self.client.get(reverse('blog-home'))
+        self.assertContains(response, 'Published post')
+        self.assertNotContains(response, 'Scheduled post')
+        self.assertNotContains(self.client.get(reverse('blog-feed')), 'Scheduled post')
+        self.assertNotContains(self.client.get(reverse('user-posts', args=['testuser'])), 'Scheduled post')
+        self.assertEqual(self.client.get(reverse('post-detail', args=[self.scheduled.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api-post-detail', args=[self.scheduled.pk])).status_code, 404)
+        self.assertEqual(len(self.client.get(reverse('api-post-list')).json()['results']), 1)
+
+        response = self.client.get(reverse('post-archive'))
+        self.assertContains(response, '(1 post)')
+
+    def test_author_sees_own_scheduled_posts(self):
+        """
+        Test that the author can preview their scheduled posts.
+        """
+        self.client.login(username='testuser', password='testpassword')
+        self.assertContains(self.client.get(reverse('post-detail', args=[self.scheduled.pk])), 'Coming soon')
+        self.assertContains(self.client.get(reverse('user-posts', args=['testuser'])), 'Scheduled post')
+
+    def test_create_form_schedules_posts(self):
+        """
+        Test that a future publication date schedules a post and a past one publishes it now.
+        """
+        self.client.login(username='testuser', password='testpassword')
+        later = timezone.localtime() + datetime.timedelta(days=2)
+        self.client.post(reverse('post-create'), {'title': 'Later', 'content': 'Later',
+                                                  'date_posted': later.strftime('%Y-%m-%d %H:%M:%S')})
+        self.assertTrue(Post.objects.scheduled().filter(title='Later').exists())
+
+        self.client.post(reverse('post-create'), {'title': 'Backdated', 'content': 'Backdated',
+                                                  'date_posted': '2001-01-01 00:00:00'})
+        post = Post.objects.get(title='Backdated')
+        self.assertGreater(post.date_posted, timezone.now() - datetime.timedelta(minutes=1))
+
+    def test_scheduler_invalidates_cached_feeds(self):
+        """
+        Test that the scheduler invalidates the cached feed when a scheduled post becomes visible.
+        """
+        scheduler = PublishScheduler()
+        self.assertEqual(next_publication(), self.scheduled.date_posted)
+        scheduler.run_pending()
+        self.assertNotContains(self.client.get(reverse('blog-feed')), 'Scheduled post')
+
+        # The publication date passes; no row is written when that happens.
+        Post.objects.filter(pk=self.scheduled.pk).update(date_posted=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertNotContains(self.client.get(reverse('blog-feed')), 'Scheduled post')
+
+        self.assertEqual(scheduler.run_pending(), 0)
+        scheduler.published_until -= datetime.timedelta(minutes=1)
+        self.assertEqual(scheduler.run_pending(), 1)
+        self.assertContains(self.client.get(reverse('blog-feed')), 'Scheduled post')
+        self.assertIsNone(next_publication())
+
+    def test_run_scheduler_once(self):
+        """
+        Test that the command publishes the posts that became due during the last poll interval.
+        """
+        Post.objects.filter(pk=self.scheduled.pk).update(date_posted=timezone.now() - datetime.timedelta(seconds=5))
+        out = StringIO()
+        call_command('run_scheduler', '--once', '--poll-interval', '60', stdout=out)
+        self.assertIn('Done, published 1 post(s).', out.getvalue())
+
+
+class RequestReplayTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.post = Post.objects.create(title='Test Post', content='Test content', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        view_counter.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.log = os.path.join(directory, 'requests.jsonl')
+        self.report = os.path.join(directory, 'report.json')
+
+    def test_capture_and_replay(self):
+        """
+        Test that captured requests are replayed, as the same user, and reported per route.
+        """
+        with override_settings(REQUEST_LOG_PATH=self.log):
+            self.client.get(reverse('blog-home'))
+            self.client.login(username='testuser', password='testpassword')
+            self.client.get(reverse('profile'))
+            self.client.get(reverse('post-detail', args=[self.post.pk]))
+        with open(self.log, 'a') as log:
+            log.write(json.dumps({'request_id': 'user-001', 'title': 'Not a request'}) + '\n')
+
+        out = StringIO()
+        call_command('replay_requests', self.log, '--host', 'testserver', '--output', self.report, stdout=out)
+        self.assertIn('Replaying 3 request(s), skipped 1 line(s).', out.getvalue())
+        with open(self.report) as report_file:
+            report = json.load(report_file)
+        self.assertEqual(set(report), {'blog-home', 'profile', 'post-detail'})
+        self.assertEqual(report['profile']['status_changes'], 0)
+        self.assertEqual(report['profile']['errors'], 0)
+        self.assertIn('logged_p95_ms', report['blog-home'])
+
+    def test_password_reset_links_are_redacted(self):
+        """
+        Test that the uid and token of a password reset link are not written to the log.
+        """
+        with override_settings(REQUEST_LOG_PATH=self.log):
+            self.client.get(reverse('password_reset_confirm', args=['MQ', 'secret-token']) + '?next=/')
+        with open(self.log) as log:
+            line = log.read()
+        self.assertNotIn('secret-token', line)
+        self.assertNotIn('MQ', line)
+        self.assertEqual(json.loads(line)['path'], '/password-reset-confirm/<uidb64>/<token>/')
+
+    def test_regression_against_baseline(self):
+        """
+        Test that routes slower than the baseline fail the run when asked to.
+        """
+        with open(self.log, 'w') as log:
+            log.write(json.dumps({'ts': 0, 'method': 'GET', 'path': reverse('blog-home')}) + '\n')
+        with open(self.report, 'w') as report_file:
+            json.dump({'blog-home': {'p95_ms': 0.0001}}, report_file)
+
+        with self.assertRaisesMessage(CommandError, 'blog-home'):
+            call_command('replay_requests', self.log, '--host', 'testserver', '--baseline', self.report,
+                         '--fail-on-regression', stdout=StringIO())
@@ -0,0 +1,102 @@
+"""
+Listings that span the Post and ArchivedPost tables.
+
+archive_old_posts moves posts into ArchivedPost by age, so every archived post is
+older than every live one. A newest-first listing is therefore the live posts
+followed by the archived posts, and a page of it takes at most two slices of the two
+ordered querysets, each served by its date index.
+
+Classes:
+    PostTimeline: Sliceable, countable sequence of live then archived posts.
+
+Functions:
+    post_timeline: Returns the timeline of the site, an author or a date range.
+"""
+
+from .models import ArchivedPost, Post
+
+
+class PostTimeline:
+    """
+    Newest-first sequence of live posts followed by archived posts.
+
+    It supports count(), len() and slicing, which is all Paginator and the feeds need.
+    """
+
+    def __init__(self, live, archived):
+        """
+        Parameters:
+        - live: Ordered QuerySet of Post objects.
+        - archived: Ordered QuerySet of ArchivedPost objects, all older than the live ones.
+        """
+        self.live = live
+        self.archived = archived
+        self._live_count = None
+        self._count = None
+
+    def live_count(self):
+        """Return the number of live posts, counted once."""
+        if self._live_count is None:
+            self._live_count = self.live.count()
+        return self._live_count
+
+    def count(self):
+        """Return the number of posts in both tables, counted once."""
+        if self._count is None:
+            self._count = self.live_count() + self.archived.count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        """
+        Return a post, or a list of posts for a slice without a step.
+
+        Live posts are read first; the archived table is only queried when the slice
+        goes past the last live post.
+        """
+        if isinstance(index, int):
+            items = self[index:index + 1]
+            if not items:
+                raise IndexError("PostTimeline index out of range")
+            return items[0]
+        if index.step is not None or (index.start or 0) < 0 or (index.stop is not None and index.stop < 0):
+            raise ValueError("PostTimeline only supports non-negative slices without a step.")
+        start, stop = index.start or 0, index.stop
+        items = list(self.live[start:stop])
+        if stop is not None and len(items) == stop - start:
+            return items
+        # The slice reaches the end of the live posts; continue in the archive.
+        offset = 0 if items else max(start - self.live_count(), 0)
+        archived_stop = None if stop is None else offset + (stop - start - len(items))
+        return items + list(self.archived[offset:archived_stop])
+
+
+def post_timeline(user=None, author=None, start=None, end=None):
+    """
+    Return the newest-first listing of live and archived posts.
+
+    Parameters:
+    - user: The user viewing the listing, who also sees their own scheduled posts.
+    - author: Only list the posts of this user.
+    - start: Only list posts dated at or after this datetime.
+    - end: Only list posts dated before this datetime.
+
+    Returns:
+    - PostTimeline
+    """
+    live = Post.objects.visible_to(user) if user is not None else Post.objects.published()
+    archived = ArchivedPost.objects.all()
+    filters = {}
+    if author is not None:
+        filters['author'] = author
+    if start is not None:
+        filters['date_posted__gte'] = start
+    if end is not None:
+        filters['date_posted__lt'] = end
+    ordering = ('-date_posted', '-id')
+    return PostTimeline(
+        live.filter(**filters).select_related('author__profile').order_by(*ordering),
+        archived.filter(**filters).select_related('author__profile').order_by(*ordering),
+    )
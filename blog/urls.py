@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, feeds, views
 from .views import (
     PostListView,
     PostDetailView,
@@ -7,6 +7,9 @@ from .views import (
     PostUpdateView,
     PostDeleteView,
     UserPostListView,
+    MostViewedPostListView,
+    PostArchiveView,
+    PostMonthArchiveView,
 )
 
 """
@@ -14,15 +17,23 @@ URL patterns for the blog app.
 
 This module defines the URL patterns for the blog app, mapping views to specific URLs.
 The patterns include routes for listing, creating, updating, and deleting blog posts,
-as well as user-specific post lists and an about page.
+as well as user-specific post lists, monthly archives, an about page, Atom feeds
+and a read-only JSON API.
 """
 
 urlpatterns = [
     path("", PostListView.as_view(), name="blog-home"),
     path("user/<str:username>", UserPostListView.as_view(), name="user-posts"),
+    path("user/<str:username>/feed/", feeds.user_feed, name="user-posts-feed"),
+    path("feed/", feeds.site_feed, name="blog-feed"),
     path("post/<int:pk>/", PostDetailView.as_view(), name="post-detail"),
     path("post/<int:pk>/update/", PostUpdateView.as_view(), name="post-update"),
     path("post/<int:pk>/delete/", PostDeleteView.as_view(), name="post-delete"),
     path("post/new/", PostCreateView.as_view(), name="post-create"),
+    path("most-viewed/", MostViewedPostListView.as_view(), name="post-most-viewed"),
+    path("archive/", PostArchiveView.as_view(), name="post-archive"),
+    path("archive/<int:year>/<int:month>/", PostMonthArchiveView.as_view(), name="post-archive-month"),
     path("about/", views.blog_about, name="blog-about"),
+    path("api/posts/", api.post_list_api, name="api-post-list"),
+    path("api/posts/<int:pk>/", api.post_detail_api, name="api-post-detail"),
 ]
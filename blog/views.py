@@ -1,5 +1,13 @@
-from django.shortcuts import render, get_object_or_404
-from .models import Post
+import datetime
+
+from django.http import Http404
+from django.shortcuts import render, get_object_or_404, redirect
+from django.utils import timezone
+from .counters import view_counter
+from .forms import PostCreateForm, PostUpdateForm
+from .models import ArchivedPost, Post, PostViewCount
+from .summaries import published_archive_months
+from .timeline import post_timeline
 from django.contrib.auth.models import User
 from django.views.generic import (
     ListView,
@@ -10,6 +18,8 @@ from django.views.generic import (
 )
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
+from bms_django_website.ratelimit import rate_limit
 
 
 def blog_home(request):
@@ -23,7 +33,7 @@ def blog_home(request):
     - HttpResponse object
     """
     context = {
-        "posts": Post.objects.all()
+        "posts": Post.objects.published()
     }
     return render(request, "blog/home.html", context)
 
@@ -45,11 +55,22 @@ class PostListView(ListView):
     ordering = ['-date_posted']
     paginate_by = 5
 
+    def get_queryset(self):
+        """
+        Get the published posts, followed by the archived ones.
+
+        Returns:
+        - PostTimeline of Post and ArchivedPost objects
+        """
+        return post_timeline()
+
 
 class UserPostListView(ListView):
     """
     View for displaying a list of blog posts by a specific user.
 
+    Authors also see their own scheduled posts.
+
     Attributes:
     - model: The model to use for retrieving data (Post).
     - template_name: The template to render.
@@ -65,35 +86,113 @@ class UserPostListView(ListView):
 
     def get_queryset(self):
         """
-        Get the queryset of posts for a specific user.
+        Get the posts of a specific user, followed by their archived posts.
 
         Returns:
-        - QuerySet of Post objects
+        - PostTimeline of Post and ArchivedPost objects
         """
         user = get_object_or_404(User, username=self.kwargs.get('username'))
-        return Post.objects.filter(author=user).order_by('-date_posted')
+        return post_timeline(user=self.request.user, author=user)
 
 
 class PostDetailView(DetailView):
     """
     View for displaying details of a single blog post.
 
+    Every view is counted in the in-process view counter buffer, which writes the
+    counts to the database in batches. Scheduled posts are only shown to their author.
+
     Attributes:
     - model: The model to use for retrieving data (Post).
+    - template_name: The template to render, shared by live and archived posts.
     """
     model = Post
+    template_name = "blog/post_detail.html"
 
+    def get_object(self, queryset=None):
+        """
+        Get the post, falling back to the archive table for posts moved out of Post.
+
+        Returns:
+        - Post or ArchivedPost object
+        """
+        if queryset is None:
+            queryset = Post.objects.visible_to(self.request.user)
+        try:
+            return super().get_object(queryset)
+        except Http404:
+            return get_object_or_404(ArchivedPost, pk=self.kwargs.get(self.pk_url_kwarg))
+
+    def get(self, request, *args, **kwargs):
+        """
+        Render the post and count the view.
+
+        Parameters:
+        - request: HttpRequest object
 
+        Returns:
+        - HttpResponse object
+        """
+        response = super().get(request, *args, **kwargs)
+        view_counter.increment(self.object.pk)
+        return response
+
+    def get_context_data(self, **kwargs):
+        """
+        Add the number of views, including the ones not flushed yet, to the context.
+
+        Returns:
+        - Dictionary with the template context
+        """
+        context = super().get_context_data(**kwargs)
+        if isinstance(self.object, ArchivedPost):
+            stored = self.object.views
+        else:
+            stored = PostViewCount.objects.filter(post_id=self.object.pk).values_list('views', flat=True).first()
+        context['views'] = (stored or 0) + view_counter.pending(self.object.pk) + 1
+        return context
+
+
+class MostViewedPostListView(ListView):
+    """
+    View for displaying the most viewed blog posts.
+
+    The list is read from the aggregated PostViewCount table through its views index.
+
+    Attributes:
+    - template_name: The template to render.
+    - context_object_name: The variable name for the list in the template.
+    - paginate_by: Number of posts to display per page.
+    """
+    template_name = "blog/most_viewed.html"
+    context_object_name = 'view_counts'
+    paginate_by = 5
+
+    def get_queryset(self):
+        """
+        Get the view counters ordered by number of views, with their posts and authors.
+
+        Returns:
+        - QuerySet of PostViewCount objects
+        """
+        return (PostViewCount.objects.filter(post__deleted_at__isnull=True, post__date_posted__lte=timezone.now())
+                .select_related('post__author__profile').order_by('-views', '-post_id'))
+
+
+@method_decorator(rate_limit('post_create'), name='dispatch')
 class PostCreateView(LoginRequiredMixin, CreateView):
     """
     View for creating a new blog post.
 
+    Submissions are rate limited per IP and per user before any database work.
+    A publication date in the future schedules the post.
+
     Attributes:
     - model: The model to use for creating data (Post).
-    - fields: The fields to include in the form.
+    - form_class: The form, with the publication date.
     """
     model = Post
-    fields = ['title', 'content']
+    form_class = PostCreateForm
 
     def form_valid(self, form):
         """
@@ -113,16 +212,22 @@ class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     """
     View for updating an existing blog post.
 
+    Edits are saved with optimistic concurrency control: the form carries the version
+    of the post it was rendered from, and only the changed fields are written, by an
+    UPDATE that only matches the post if it still has that version. If the post was
+    changed in the meantime, the form is shown again with a 409 status, next to the
+    current post, instead of overwriting the other change.
+
     Attributes:
     - model: The model to use for updating data (Post).
-    - fields: The fields to include in the form.
+    - form_class: The form, with the hidden version field.
     """
     model = Post
-    fields = ['title', 'content']
+    form_class = PostUpdateForm
 
     def form_valid(self, form):
         """
-        Validate the form and set the author before saving.
+        Save the changed fields if the post still has the version the form was rendered from.
 
         Parameters:
         - form: The form instance to validate.
@@ -130,8 +235,30 @@ class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         Returns:
         - HttpResponse object
         """
-        form.instance.author = self.request.user
-        return super().form_valid(form)
+        changed = [name for name in form.changed_data if name != 'version']
+        if changed and not self.object.save_if_version(form.cleaned_data['version'], changed):
+            return self.form_conflict(form)
+        return redirect(self.get_success_url())
+
+    def form_conflict(self, form):
+        """
+        Show the form again, with the current post, after a conflicting edit.
+
+        The hidden version is set to the current one, so submitting the form again
+        deliberately replaces the other change.
+
+        Parameters:
+        - form: The submitted form.
+
+        Returns:
+        - HttpResponse object with a 409 status
+        """
+        current = get_object_or_404(Post, pk=self.object.pk)
+        form.data = form.data.copy()
+        form.data[form.add_prefix('version')] = current.version
+        form.add_error(None, "This post was changed while you were editing it. "
+                             "Review the current version below, then submit again to replace it.")
+        return self.render_to_response(self.get_context_data(form=form, current_post=current), status=409)
 
     def test_func(self):
         """
@@ -150,6 +277,9 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     """
     View for deleting an existing blog post.
 
+    Live posts are only soft-deleted; purge_deleted_posts removes the row later.
+    Archived posts are deleted from the archive table right away.
+
     Attributes:
     - model: The model to use for deleting data (Post).
     - success_url: The URL to redirect to after successful deletion.
@@ -157,6 +287,36 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     model = Post
     success_url = reverse_lazy('blog-home')
 
+    def get_object(self, queryset=None):
+        """
+        Get the post, falling back to the archive table for posts moved out of Post.
+
+        Returns:
+        - Post or ArchivedPost object
+        """
+        if not hasattr(self, '_post'):
+            try:
+                self._post = super().get_object(queryset)
+            except Http404:
+                self._post = get_object_or_404(ArchivedPost, pk=self.kwargs.get(self.pk_url_kwarg))
+        return self._post
+
+    def form_valid(self, form):
+        """
+        Delete the post and redirect to the success URL.
+
+        Parameters:
+        - form: The confirmation form.
+
+        Returns:
+        - HttpResponse object
+        """
+        if isinstance(self.object, ArchivedPost):
+            self.object.delete()
+        else:
+            self.object.soft_delete()
+        return redirect(self.get_success_url())
+
     def test_func(self):
         """
         Check if the current user is the author of the post.
@@ -170,6 +330,83 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return False
 
 
+class PostArchiveView(ListView):
+    """
+    View for listing the months that have posts, with the number of posts in each.
+
+    The months are read from the precomputed PostArchiveMonth table, less the
+    scheduled posts.
+
+    Attributes:
+    - template_name: The template to render.
+    - context_object_name: The variable name for the list in the template.
+    """
+    template_name = "blog/post_archive.html"
+    context_object_name = 'archive_months'
+
+    def get_queryset(self):
+        """
+        Get the months with published posts.
+
+        Returns:
+        - List of dictionaries with year, month and post_count
+        """
+        return published_archive_months()
+
+
+class PostMonthArchiveView(ListView):
+    """
+    View for displaying the blog posts of a given month.
+
+    The posts are selected with a date_posted range, which is served by the feed index.
+
+    Attributes:
+    - template_name: The template to render.
+    - context_object_name: The variable name for the list in the template.
+    - paginate_by: Number of posts to display per page.
+    """
+    template_name = "blog/post_archive_month.html"
+    context_object_name = 'posts'
+    paginate_by = 5
+
+    def get_month_range(self):
+        """
+        Get the start of the requested month and the start of the next one.
+
+        Returns:
+        - Tuple of two aware datetimes
+        """
+        year, month = self.kwargs['year'], self.kwargs['month']
+        try:
+            start = datetime.datetime(year, month, 1)
+            end = datetime.datetime(year + month // 12, month % 12 + 1, 1)
+            return timezone.make_aware(start), timezone.make_aware(end)
+        except (ValueError, OverflowError):
+            # Months outside the datetime range, or whose end is, such as 9999-12.
+            raise Http404("Invalid month.")
+
+    def get_queryset(self):
+        """
+        Get the live and archived posts dated in the requested month.
+
+        Returns:
+        - PostTimeline of Post and ArchivedPost objects
+        """
+        start, end = self.get_month_range()
+        return post_timeline(start=start, end=end)
+
+    def get_context_data(self, **kwargs):
+        """
+        Add the first day of the month to the context.
+
+        Returns:
+        - Dictionary with the template context
+        """
+        context = super().get_context_data(**kwargs)
+        context['month'] = self.get_month_range()[0]
+        return context
+
+
 def blog_about(request):
     """
     View for rendering the about page of the blog.
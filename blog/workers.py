@@ -0,0 +1,48 @@
+"""
+Process pools for the jobs that render posts or pages in parallel.
+
+This module does not import any model, so that spawned workers can load it before
+Django is set up.
+
+Functions:
+    worker_pool: Returns a process pool whose workers can use Django.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.utils.module_loading import import_string
+
+
+def _setup_worker(initializer_path):
+    """Set up Django in a spawned worker, then run the pool's initializer."""
+    django.setup()
+    if initializer_path is not None:
+        import_string(initializer_path)()
+
+
+def worker_pool(max_workers, initializer=None):
+    """
+    Return a ProcessPoolExecutor whose workers can use Django.
+
+    Workers are forked where the platform supports it, whatever the default start
+    method is (spawn on macOS and Windows, forkserver from Python 3.14), so they
+    inherit the settings and the app registry of the parent. Elsewhere they are
+    spawned and run django.setup() before anything else is imported.
+
+    Parameters:
+    - max_workers: The number of worker processes.
+    - initializer: Optional module-level function run in every worker when it starts.
+
+    Returns:
+    - ProcessPoolExecutor
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('fork'),
+                                   initializer=initializer)
+    # The initializer is passed by name: unpickling the function itself would import
+    # its module, and the models with it, before django.setup().
+    initializer_path = None if initializer is None else f'{initializer.__module__}.{initializer.__qualname__}'
+    return ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_setup_worker, initargs=(initializer_path,))
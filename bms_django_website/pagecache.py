@@ -0,0 +1,207 @@
+"""
+Cache of rendered pages, stored already compressed.
+
+Anonymous visitors without cookies all receive the same HTML, so the listed pages are
+rendered once, compressed once with gzip (and with Brotli when the optional brotli
+package is installed), and the compressed bytes are kept in the cache. Every later
+request is answered with the best encoding it accepts, without rendering or
+compressing anything. Other responses are compressed per request by GZipMiddleware.
+
+All cached pages share one generation number. Saving or deleting a post, or editing
+a profile, increments it (see blog/signals.py and users/views.py), which makes every
+cached page unreachable at once; the stale entries expire on their own.
+
+Settings:
+    PAGE_CACHE_ENABLED: Turns the page cache on or off.
+    PAGE_CACHE_TIMEOUT: Seconds a page is kept, which bounds how stale the sidebar gets.
+    PAGE_CACHE_URL_NAMES: Names of the URL patterns whose pages are cached.
+    PAGE_CACHE_GZIP_LEVEL: The gzip compression level, from 1 to 9.
+    PAGE_CACHE_BROTLI_QUALITY: The Brotli quality, from 0 to 11.
+
+Classes:
+    PageCacheMiddleware: Serves cached, precompressed pages to anonymous visitors.
+
+Functions:
+    invalidate_page_cache: Makes every cached page stale.
+    compress: Returns the encodings of a response body keyed by content coding.
+    choose_encoding: Picks the content coding for a request.
+"""
+
+import gzip
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+GENERATION_KEY = 'pagecache:generation'
+
+# Headers describing the body, which are set again for the chosen encoding. Vary is
+# kept as rendered (it names Cookie), and Accept-Encoding is added to it when serving.
+_BODY_HEADERS = {'content-length', 'content-encoding', 'etag', 'set-cookie'}
+
+_accepts_re = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def invalidate_page_cache():
+    """Make every cached page stale, so each is rendered again on its next request."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def compress(body):
+    """
+    Compress a response body with every supported content coding.
+
+    Args:
+        body: The uncompressed bytes.
+
+    Returns:
+        dict: Maps 'identity', 'gzip' and, if brotli is installed, 'br' to bytes.
+    """
+    encodings = {
+        'identity': body,
+        # mtime=0 keeps the bytes, and so the ETag, identical between renders.
+        'gzip': gzip.compress(body, compresslevel=settings.PAGE_CACHE_GZIP_LEVEL, mtime=0),
+    }
+    if brotli is not None:
+        encodings['br'] = brotli.compress(body, quality=settings.PAGE_CACHE_BROTLI_QUALITY)
+    return encodings
+
+
+def choose_encoding(accept_encoding, available):
+    """
+    Pick the smallest available content coding the client accepts.
+
+    Args:
+        accept_encoding: The value of the Accept-Encoding header.
+        available: The content codings there are bytes for.
+
+    Returns:
+        str: 'br', 'gzip' or 'identity'.
+    """
+    accepted = set()
+    for match in _accepts_re.finditer(accept_encoding or ''):
+        coding, quality = match.group(1).lower(), match.group(2)
+        try:
+            if quality is not None and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding)
+    for coding in ('br', 'gzip'):
+        if coding in available and (coding in accepted or '*' in accepted):
+            return coding
+    return 'identity'
+
+
+class PageCacheMiddleware:
+    """
+    Serve the pages listed in PAGE_CACHE_URL_NAMES to anonymous visitors from the cache.
+
+    Only GET and HEAD requests without cookies and with no query parameter other than
+    'page' are served from the cache. A rendered response is stored only if it is a
+    200 HTML response that sets no cookie and is not marked private or no-store.
+
+    Place it after GZipMiddleware, so the bytes it caches are uncompressed and the
+    responses it serves are left alone by GZipMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_cacheable_request(request):
+            return self.get_response(request)
+
+        generation = cache.get_or_set(GENERATION_KEY, time.time_ns, timeout=None)
+        key = f"pagecache:{generation}:{request.get_host()}:{request.get_full_path()}"
+        entry = cache.get(key)
+        if entry is None:
+            response = self.get_response(request)
+            if request.method != 'GET' or not self.is_cacheable_response(response):
+                return response
+            entry = self.make_entry(response)
+            cache.set(key, entry, timeout=settings.PAGE_CACHE_TIMEOUT)
+        return self.serve(request, entry)
+
+    def is_cacheable_request(self, request):
+        """Return whether the request may be answered from the cache."""
+        if not getattr(settings, 'PAGE_CACHE_ENABLED', True):
+            return False
+        if request.method not in ('GET', 'HEAD') or request.COOKIES:
+            return False
+        if set(request.GET) - {'page'}:
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.url_name in settings.PAGE_CACHE_URL_NAMES
+
+    def is_cacheable_response(self, response):
+        """Return whether a rendered response is the same for every anonymous visitor."""
+        if response.status_code != 200 or response.streaming or response.cookies:
+            return False
+        if response.has_header('Content-Encoding'):
+            return False
+        if not response.get('Content-Type', '').startswith('text/html'):
+            return False
+        cache_control = response.get('Cache-Control', '').lower()
+        return 'private' not in cache_control and 'no-store' not in cache_control
+
+    def make_entry(self, response):
+        """
+        Build the cache entry of a rendered response.
+
+        Args:
+            response: The uncompressed HttpResponse.
+
+        Returns:
+            dict: The encodings of the body, their ETags and the other headers.
+        """
+        encodings = compress(response.content)
+        digest = hashlib.md5(response.content, usedforsecurity=False).hexdigest()
+        return {
+            'encodings': encodings,
+            'etags': {coding: f'"{digest}-{coding}"' for coding in encodings},
+            'headers': [(name, value) for name, value in response.items()
+                        if name.lower() not in _BODY_HEADERS],
+        }
+
+    def serve(self, request, entry):
+        """
+        Answer a request from a cache entry, in the best encoding the client accepts.
+
+        Args:
+            request: The HttpRequest.
+            entry: A dictionary built by make_entry.
+
+        Returns:
+            HttpResponse: The page, or an empty 304 response if the client has it.
+        """
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'), entry['encodings'])
+        etag = entry['etags'][coding]
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(entry['encodings'][coding])
+            response['Content-Length'] = len(response.content)
+            if coding != 'identity':
+                response['Content-Encoding'] = coding
+        for name, value in entry['headers']:
+            response[name] = value
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
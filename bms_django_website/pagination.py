@@ -0,0 +1,117 @@
+"""
+Pagination of large tables without COUNT(*).
+
+Counting every row of a big table is a full scan on every changelist page. For
+unfiltered listings the paginator below uses the row estimate that the database
+keeps for its query planner instead, and only counts exactly when the listing is
+filtered or the table is small.
+
+SQLite only records estimates once `ANALYZE` has been run (`python manage.py dbshell`
+then `ANALYZE;`); until then the exact count is used.
+
+Classes:
+    EstimatedCountPaginator: Paginator that uses the planner estimate for unfiltered listings.
+    EstimatedCountAdminMixin: ModelAdmin mixin that paginates with EstimatedCountPaginator.
+
+Functions:
+    estimate_row_count: Returns the planner's row estimate for a table or an index.
+"""
+
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, transaction
+from django.utils.functional import cached_property
+
+
+# Below this many rows the exact count is cheap enough to be worth it.
+ESTIMATE_THRESHOLD = 10000
+
+
+def estimate_row_count(table, index=None, using='default'):
+    """
+    Return the number of rows the database estimates a table or an index holds.
+
+    The estimate of a partial index is the number of rows matching its condition.
+
+    Args:
+        table: The name of the table.
+        index: The name of an index of the table, or None for the whole table.
+        using: The database alias.
+
+    Returns:
+        int: The estimated number of rows, or None if the database has no estimate.
+    """
+    connection = connections[using]
+    try:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                if index:
+                    cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s AND idx = %s", [table, index])
+                else:
+                    cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+                rows = [int(stat.split()[0]) for stat, in cursor.fetchall()]
+                return max(rows) if rows else None
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)", [index or table])
+                row = cursor.fetchone()
+                return int(row[0]) if row and row[0] >= 0 else None
+            if connection.vendor == 'mysql':
+                cursor.execute("SELECT table_rows FROM information_schema.tables "
+                               "WHERE table_schema = DATABASE() AND table_name = %s", [table])
+                row = cursor.fetchone()
+                return int(row[0]) if row and row[0] is not None else None
+    except DatabaseError:
+        # sqlite_stat1 does not exist until ANALYZE has been run.
+        return None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the planner's row estimate for large unfiltered listings.
+
+    A listing is unfiltered when its WHERE clause is the one of the unfiltered queryset,
+    so the base filter of a custom default manager does not count as a filter. The
+    estimate may be off by a few percent, so the last page can come out short or empty.
+
+    Attributes:
+        unfiltered: The queryset of the listing before any filter or search was applied.
+        index: The index whose estimate is used, e.g. a partial index matching the base
+            filter of the default manager, or None for the whole table.
+        threshold: Below this many estimated rows the exact count is used.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True,
+                 unfiltered=None, index=None, threshold=ESTIMATE_THRESHOLD):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.unfiltered = unfiltered
+        self.index = index
+        self.threshold = threshold
+
+    @cached_property
+    def count(self):
+        """Return the estimated number of rows if it is large enough, else the exact count."""
+        queryset = self.object_list
+        if self.unfiltered is not None and queryset.query.where == self.unfiltered.query.where:
+            estimate = estimate_row_count(queryset.model._meta.db_table, self.index, queryset.db)
+            if estimate is not None and estimate >= self.threshold:
+                return estimate
+        return super().count
+
+
+class EstimatedCountAdminMixin:
+    """
+    ModelAdmin mixin for tables too large to count on every changelist page.
+
+    The changelist is paginated with EstimatedCountPaginator, and the second count of
+    the unfiltered table shown next to search results is turned off.
+
+    Attributes:
+        count_estimate_index: The index whose estimate is used, or None for the table.
+    """
+    show_full_result_count = False
+    count_estimate_index = None
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return EstimatedCountPaginator(queryset, per_page, orphans, allow_empty_first_page,
+                                       unfiltered=self.get_queryset(request),
+                                       index=self.count_estimate_index)
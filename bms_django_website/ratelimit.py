@@ -0,0 +1,285 @@
+"""
+Rate limiting for the write and authentication endpoints.
+
+This module implements a token-bucket rate limiter that is applied per client IP,
+per authenticated user and, optionally, per submitted form field from a client IP
+(for example the username on the login form). Buckets live either in process memory
+('local' mode) or in a Django cache shared by all workers ('cache' mode).
+
+A request takes a token from every bucket it is counted against, or from none of
+them if any is empty. The field buckets have their own, tighter limit, named
+'<scope>:<field>' in RATE_LIMITS: a client may try many usernames, but only a few
+passwords per username. They are scoped to the client IP, so that nobody can lock an
+account out by sending failed logins for its username, and the field value is hashed
+into the key, so any submitted value makes a valid cache key.
+
+The limiter only inspects request metadata and the parsed POST body, so it runs
+before any database work done by the wrapped view.
+
+Settings:
+    RATE_LIMIT_ENABLED: Turns the limiter on or off.
+    RATE_LIMIT_BACKEND: 'local' for in-process buckets, 'cache' for shared buckets.
+    RATE_LIMIT_CACHE: The cache alias used in 'cache' mode.
+    RATE_LIMITS: Mapping of scope name, or '<scope>:<field>', to a (requests, seconds) tuple.
+    RATE_LIMIT_IP_HEADER: Optional META key of a header listing the forwarding chain,
+        such as 'HTTP_X_FORWARDED_FOR', set when the site runs behind proxies.
+    RATE_LIMIT_TRUSTED_PROXIES: The number of trusted proxies appending to that
+        header, 1 by default. The client address is the entry added by the outermost
+        one, counting from the right; the entries to its left are client supplied.
+
+Functions:
+    rate_limit: Decorator that throttles a view under a named scope.
+    get_metrics: Returns the number of rejected requests per scope and key kind.
+    reset: Clears all in-process buckets and metrics.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+logger = logging.getLogger(__name__)
+
+# Requests allowed per window, keyed by scope, when RATE_LIMITS does not override them.
+DEFAULT_RATE_LIMITS = {
+    'login': (10, 60),
+    'register': (5, 60),
+    'password_reset': (5, 300),
+    'post_create': (10, 60),
+    # Per client IP and submitted value of the field.
+    'login:username': (5, 300),
+    'password_reset:email': (3, 900),
+}
+
+# Prune idle local buckets once the table grows past this many keys, at most once
+# per LOCAL_PRUNE_INTERVAL seconds.
+LOCAL_MAX_KEYS = 10000
+LOCAL_PRUNE_INTERVAL = 60
+
+
+def _take(state, buckets, now):
+    """
+    Take one token from every bucket, or from none if one of them is empty.
+
+    Args:
+        state: Callable returning the (tokens, last_refill) state of a key, or None.
+        buckets: The (key, capacity, refill_rate) tuples of the buckets, checked in
+            order; the rest are not read once one is empty. Capacity is the maximum
+            number of tokens and refill_rate the tokens added per second.
+        now: The current time.
+
+    Returns:
+        tuple: (None, 0, {key: (tokens, capacity, refill_rate)}) if the request is
+        allowed, otherwise the key of the empty bucket, the seconds until it holds a
+        token, and None.
+    """
+    states = {}
+    for key, capacity, refill_rate in buckets:
+        tokens, stamp = state(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - stamp) * refill_rate)
+        if tokens < 1:
+            return key, (1 - tokens) / refill_rate, None
+        states[key] = (tokens - 1, capacity, refill_rate)
+    return None, 0, states
+
+
+class LocalBucketStore:
+    """
+    Thread-safe token buckets kept in the memory of the current process.
+
+    Attributes:
+        buckets (dict): Maps a bucket key to a (tokens, last_refill, full_at) tuple.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self._lock = threading.Lock()
+        self._pruned_at = None
+
+    def consume(self, buckets, now):
+        """
+        Take one token from every bucket, or from none.
+
+        Args:
+            buckets: The (key, capacity, refill_rate) tuples of the buckets.
+            now: The current monotonic time.
+
+        Returns:
+            tuple: The key of the empty bucket and the seconds until it holds a token,
+            or (None, 0) if the request is allowed.
+        """
+        with self._lock:
+            key, wait, states = _take(self._state, buckets, now)
+            if states is None:
+                return key, wait
+            for key, (tokens, capacity, refill_rate) in states.items():
+                self.buckets[key] = (tokens, now, now + (capacity - tokens) / refill_rate)
+            if len(self.buckets) > LOCAL_MAX_KEYS and (
+                    self._pruned_at is None or now - self._pruned_at >= LOCAL_PRUNE_INTERVAL):
+                self._prune(now)
+        return None, 0
+
+    def _state(self, key):
+        """Return the (tokens, last_refill) state of a bucket, or None if it is full."""
+        bucket = self.buckets.get(key)
+        return bucket[:2] if bucket is not None else None
+
+    def _prune(self, now):
+        """Drop buckets that have refilled completely and so hold no state worth keeping."""
+        self.buckets = {key: bucket for key, bucket in self.buckets.items() if bucket[2] > now}
+        self._pruned_at = now
+
+    def clear(self):
+        """Remove every bucket."""
+        with self._lock:
+            self.buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Token buckets kept in a Django cache so that all workers share the same limits.
+
+    The read-modify-write on the cache entry is not atomic, so concurrent requests for
+    the same key may occasionally both be admitted. That is acceptable for throttling.
+    """
+
+    def consume(self, buckets, now):
+        """
+        Take one token from every cached bucket, or from none.
+
+        Args:
+            buckets: The (key, capacity, refill_rate) tuples of the buckets.
+            now: The current wall-clock time.
+
+        Returns:
+            tuple: The key of the empty bucket and the seconds until it holds a token,
+            or (None, 0) if the request is allowed.
+        """
+        cache = caches[getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+        key, wait, states = _take(lambda key: cache.get(f"ratelimit:{key}"), buckets, now)
+        if states is None:
+            return key, wait
+        timeout = max(int(capacity / refill_rate) + 1 for _, capacity, refill_rate in states.values())
+        cache.set_many({f"ratelimit:{key}": (tokens, now) for key, (tokens, _, _) in states.items()},
+                       timeout=timeout)
+        return None, 0
+
+
+_local_store = LocalBucketStore()
+_cache_store = CacheBucketStore()
+_rejections = Counter()
+_rejections_lock = threading.Lock()
+
+
+def _get_limit(name):
+    """Return the (requests, seconds) limit configured for a scope or a '<scope>:<field>' name."""
+    limits = getattr(settings, 'RATE_LIMITS', {})
+    return limits.get(name, DEFAULT_RATE_LIMITS[name])
+
+
+def _client_ip(request):
+    """
+    Return the address of the client that sent the request.
+
+    Behind proxies, it is the entry of RATE_LIMIT_IP_HEADER appended by the outermost
+    trusted proxy. The entries left of it can be forged by the client.
+    """
+    header = getattr(settings, 'RATE_LIMIT_IP_HEADER', None)
+    if header and request.META.get(header):
+        entries = [entry.strip() for entry in request.META[header].split(',')]
+        proxies = max(1, getattr(settings, 'RATE_LIMIT_TRUSTED_PROXIES', 1))
+        return entries[-min(proxies, len(entries))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _bucket_keys(request, scope, field):
+    """
+    Yield the (kind, key, limit name) tuples that a request is counted against.
+
+    The IP key comes first, so a flood from one address is rejected before the
+    session is loaded to identify the user. Field keys hold the IP and a hash of the
+    submitted value, and use the '<scope>:<field>' limit.
+    """
+    ip = _client_ip(request)
+    yield 'ip', f"{scope}:ip:{ip}", scope
+    if field:
+        value = request.POST.get(field, '').strip().lower()
+        if value:
+            digest = hashlib.sha256(f"{ip}\0{value}".encode()).hexdigest()[:32]
+            yield field, f"{scope}:{field}:{digest}", f"{scope}:{field}"
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        yield 'user', f"{scope}:user:{user.pk}", scope
+
+
+def _too_many_requests(retry_after):
+    """Build the 429 response sent to throttled clients."""
+    response = HttpResponse("Too many requests. Please try again later.",
+                            status=429, content_type='text/plain')
+    response['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+
+def rate_limit(scope, field=None, methods=('POST',)):
+    """
+    Throttle a view with a token bucket per client IP, per user and per form field and IP.
+
+    Args:
+        scope: The name of the limit in RATE_LIMITS.
+        field: An optional POST field (such as 'username') to rate limit on as well,
+            per client IP, under the '<scope>:<field>' limit.
+        methods: The HTTP methods that are counted. Other methods pass through.
+
+    Returns:
+        callable: A decorator for function views or for a class-based view's dispatch.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if request.method in methods and getattr(settings, 'RATE_LIMIT_ENABLED', True):
+                if getattr(settings, 'RATE_LIMIT_BACKEND', 'local') == 'cache':
+                    store, now = _cache_store, time.time()
+                else:
+                    store, now = _local_store, time.monotonic()
+                kinds = {}
+
+                def buckets():
+                    for kind, key, name in _bucket_keys(request, scope, field):
+                        kinds[key] = kind
+                        requests, seconds = _get_limit(name)
+                        yield key, requests, requests / seconds
+
+                key, wait = store.consume(buckets(), now)
+                if key is not None:
+                    with _rejections_lock:
+                        _rejections[(scope, kinds[key])] += 1
+                    logger.warning("Rate limit exceeded for %s by %s", scope, key)
+                    return _too_many_requests(wait)
+            return view_func(request, *args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def get_metrics():
+    """
+    Return the number of rejected requests in this process.
+
+    Returns:
+        dict: Maps (scope, key kind) tuples to rejection counts.
+    """
+    with _rejections_lock:
+        return dict(_rejections)
+
+
+def reset():
+    """Clear the in-process buckets and rejection metrics."""
+    _local_store.clear()
+    with _rejections_lock:
+        _rejections.clear()
@@ -0,0 +1,353 @@
+"""
+Replay of captured request logs.
+
+Requests read from a JSONL log (see bms_django_website/requestlog.py) are sent again,
+either in process through the Django test client or over HTTP to a running server, at
+the original pace, faster, or as fast as possible, from several threads. The latency of
+every request is grouped by route and summarised in a report that can be compared with
+the durations recorded in the log or with the report of an earlier replay.
+
+Lines that are not requests (for example the backlog entries in requests.jsonl, which
+have no method or path) are skipped and counted.
+
+Classes:
+    ReplayRequest: One request read from the log.
+    InProcessTarget: Sends requests through the Django test client.
+    HttpTarget: Sends requests to a live server.
+
+Functions:
+    load_requests: Reads the requests to replay from a JSONL file.
+    replay: Sends requests to a target and returns the measurements.
+    build_report: Groups measurements by route and computes latency percentiles.
+    compare_reports: Marks the routes whose latency regressed against a baseline.
+"""
+
+import json
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+from django.test import Client
+from django.urls import Resolver404, resolve
+from django.utils.module_loading import import_string
+
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+@dataclass
+class ReplayRequest:
+    """
+    One request read from the log.
+
+    Attributes:
+        offset: Seconds between the first request of the log and this one.
+        method: The HTTP method.
+        path: The path, with its query string.
+        user: The username the request was made as, or None for anonymous requests.
+        status: The status code recorded in the log, or None.
+        duration_ms: The latency recorded in the log, or None.
+    """
+    offset: float
+    method: str
+    path: str
+    user: str = None
+    status: int = None
+    duration_ms: float = None
+
+
+def _timestamp(value):
+    """Return a log timestamp (epoch seconds or ISO 8601) as epoch seconds, or None."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def load_requests(path, methods=SAFE_METHODS):
+    """
+    Read the requests to replay from a JSONL file.
+
+    Args:
+        path: The path of the log.
+        methods: The HTTP methods to keep; other requests are skipped.
+
+    Returns:
+        tuple: The list of ReplayRequest in log order and the number of skipped lines.
+    """
+    entries = []
+    skipped = 0
+    with open(path, encoding='utf-8') as log:
+        for line in log:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if not isinstance(record, dict):
+                skipped += 1
+                continue
+            method = str(record.get('method') or 'GET').upper()
+            request_path = record.get('path')
+            if not isinstance(request_path, str) or not request_path.startswith('/') or method not in methods:
+                skipped += 1
+                continue
+            entries.append((
+                _timestamp(record.get('ts', record.get('timestamp'))),
+                ReplayRequest(
+                    offset=0.0,
+                    method=method,
+                    path=request_path,
+                    user=record.get('user') or None,
+                    status=record.get('status'),
+                    duration_ms=record.get('duration_ms'),
+                ),
+            ))
+
+    stamps = [stamp for stamp, _ in entries if stamp is not None]
+    first = min(stamps) if stamps else None
+    requests = []
+    for stamp, request in entries:
+        if first is not None and stamp is not None:
+            request.offset = stamp - first
+        requests.append(request)
+    return requests, skipped
+
+
+def _session_cookie(username, cache):
+    """
+    Return the value of a session cookie logged in as a user, creating the session once.
+
+    Args:
+        username: The username to log in as.
+        cache: A dictionary of session keys by username, shared by the caller.
+
+    Returns:
+        str: The session key, or None if the user does not exist.
+    """
+    if username not in cache:
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            cache[username] = None
+        else:
+            session = import_string(settings.SESSION_ENGINE + '.SessionStore')()
+            session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.save()
+            cache[username] = session.session_key
+    return cache[username]
+
+
+class InProcessTarget:
+    """
+    Send requests through the Django test client, in the current process.
+
+    Every thread uses its own client. Requests made as a user carry a session cookie
+    created for that user, so the views see the user as logged in.
+    """
+
+    def __init__(self, host='localhost'):
+        self.host = host
+        self._local = threading.local()
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    def send(self, request):
+        """Send a request and return its status code."""
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client(HTTP_HOST=self.host, raise_request_exception=False)
+        client.cookies.clear()
+        if request.user:
+            with self._sessions_lock:
+                session_key = _session_cookie(request.user, self._sessions)
+            if session_key:
+                client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        return client.generic(request.method, request.path).status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects as responses instead of following them."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpTarget:
+    """
+    Send requests over HTTP to a running server sharing this project's database.
+
+    Redirects are not followed, so the status codes match the ones in the log. Requests
+    made as a user carry a session cookie created in the database for that user.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._opener = urllib.request.build_opener(_NoRedirect)
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    def send(self, request):
+        """Send a request and return its status code, or 0 if the connection failed."""
+        http_request = urllib.request.Request(self.base_url + request.path, method=request.method)
+        if request.user:
+            with self._sessions_lock:
+                session_key = _session_cookie(request.user, self._sessions)
+            if session_key:
+                http_request.add_header('Cookie', f"{settings.SESSION_COOKIE_NAME}={session_key}")
+        try:
+            with self._opener.open(http_request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+        except (urllib.error.URLError, OSError):
+            return 0
+
+
+def replay(requests, target, speed=0, concurrency=1):
+    """
+    Send requests to a target and measure them.
+
+    Args:
+        requests: The ReplayRequest objects, in log order.
+        target: An object with a send(request) method returning a status code.
+        speed: 1 replays at the original pace, 10 ten times faster, 0 as fast as possible.
+        concurrency: The number of threads sending requests. With 1, requests are sent
+            from the calling thread.
+
+    Returns:
+        list: (request, status code, latency in milliseconds) tuples.
+    """
+    start = time.perf_counter()
+
+    def send(request):
+        if speed:
+            delay = start + request.offset / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        began = time.perf_counter()
+        status = target.send(request)
+        return request, status, (time.perf_counter() - began) * 1000
+
+    if concurrency <= 1:
+        return [send(request) for request in requests]
+
+    def send_in_thread(request):
+        try:
+            return send(request)
+        finally:
+            close_old_connections()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='replay') as executor:
+        return list(executor.map(send_in_thread, requests))
+
+
+def _route(path):
+    """Return the name of the URL pattern a path resolves to, or 'unresolved'."""
+    try:
+        match = resolve(path.split('?', 1)[0])
+    except Resolver404:
+        return 'unresolved'
+    return match.view_name or match.route
+
+
+def _percentile(values, percent):
+    """Return the nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _summary(latencies):
+    """Return the count, percentiles and maximum of a list of latencies."""
+    return {
+        'count': len(latencies),
+        'p50_ms': round(_percentile(latencies, 50), 3),
+        'p95_ms': round(_percentile(latencies, 95), 3),
+        'p99_ms': round(_percentile(latencies, 99), 3),
+        'max_ms': round(max(latencies), 3),
+    }
+
+
+def build_report(results):
+    """
+    Group measurements by route and compute their latency percentiles.
+
+    Args:
+        results: (request, status code, latency) tuples returned by replay().
+
+    Returns:
+        dict: Maps a route name to its summary: count, errors (5xx or no response),
+        status_changes (status differs from the log), p50/p95/p99/max in milliseconds
+        and, when the log recorded durations, logged_p50_ms and logged_p95_ms.
+    """
+    routes = {}
+    for request, status, latency in results:
+        route = routes.setdefault(_route(request.path), {'latencies': [], 'logged': [],
+                                                         'errors': 0, 'status_changes': 0})
+        route['latencies'].append(latency)
+        if request.duration_ms is not None:
+            route['logged'].append(float(request.duration_ms))
+        if status == 0 or status >= 500:
+            route['errors'] += 1
+        if request.status is not None and request.status != status:
+            route['status_changes'] += 1
+
+    report = {}
+    for name, route in sorted(routes.items()):
+        summary = _summary(route['latencies'])
+        summary['errors'] = route['errors']
+        summary['status_changes'] = route['status_changes']
+        if route['logged']:
+            summary['logged_p50_ms'] = round(_percentile(route['logged'], 50), 3)
+            summary['logged_p95_ms'] = round(_percentile(route['logged'], 95), 3)
+        report[name] = summary
+    return report
+
+
+def compare_reports(report, baseline=None, threshold=0.2):
+    """
+    Mark the routes whose p95 latency regressed.
+
+    Each route is compared with the same route of the baseline report if one is given,
+    else with the durations recorded in the log. The 'baseline_p95_ms', 'change' and
+    'regressed' keys are added to the summaries of the report.
+
+    Args:
+        report: A report returned by build_report().
+        baseline: An earlier report, or None.
+        threshold: The relative slowdown of the p95 latency counted as a regression.
+
+    Returns:
+        list: The names of the regressed routes.
+    """
+    regressed = []
+    for name, summary in report.items():
+        if baseline is not None:
+            reference = baseline.get(name, {}).get('p95_ms')
+        else:
+            reference = summary.get('logged_p95_ms')
+        if not reference:
+            summary.update(baseline_p95_ms=None, change=None, regressed=False)
+            continue
+        change = summary['p95_ms'] / reference - 1
+        summary.update(baseline_p95_ms=reference, change=round(change, 3), regressed=change > threshold)
+        if change > threshold:
+            regressed.append(name)
+    return regressed
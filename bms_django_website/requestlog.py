@@ -0,0 +1,90 @@
+"""
+Capture of request logs for replay.
+
+When REQUEST_LOG_PATH is set, RequestLogMiddleware appends one JSON line per request
+to that file, in the format read by `manage.py replay_requests`:
+
+    {"ts": 1767225600.123, "method": "GET", "path": "/blog/?page=2",
+     "user": "alice", "status": 200, "duration_ms": 12.4}
+
+Request bodies, headers and cookies are never written. Paths carrying secrets, such
+as the password reset links, are written as their URL pattern without the query
+string. When the setting is empty the middleware removes itself from the stack at
+startup and costs nothing.
+
+Settings:
+    REQUEST_LOG_PATH: The file the log is appended to, or None to disable capture.
+    REQUEST_LOG_REDACTED_URL_NAMES: The URL names whose paths are redacted; defaults
+        to DEFAULT_REDACTED_URL_NAMES.
+
+Classes:
+    RequestLogMiddleware: Appends a line per request to REQUEST_LOG_PATH.
+
+Functions:
+    logged_path: Returns the path of a request with the secrets of sensitive routes removed.
+"""
+
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+
+DEFAULT_REDACTED_URL_NAMES = ['password_reset_confirm']
+
+
+def logged_path(request, redacted_url_names):
+    """
+    Return the path of a request as it is written to the log.
+
+    Args:
+        request (HttpRequest): The request, after it was resolved.
+        redacted_url_names (collection): The URL names whose paths are redacted.
+
+    Returns:
+        str: The full path, or the URL pattern for a redacted route, such as
+        '/password-reset-confirm/<uidb64>/<token>/'.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and match.url_name in redacted_url_names:
+        return '/' + match.route
+    return request.get_full_path()
+
+
+class RequestLogMiddleware:
+    """
+    Append the method, path, user, status and duration of every request to a JSONL file.
+
+    Place it near the top of MIDDLEWARE, so the duration covers the other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.path = getattr(settings, 'REQUEST_LOG_PATH', None)
+        if not self.path:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.redacted_url_names = frozenset(
+            getattr(settings, 'REQUEST_LOG_REDACTED_URL_NAMES', DEFAULT_REDACTED_URL_NAMES))
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        started = time.time()
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        user = getattr(request, 'user', None)
+        entry = {
+            'ts': round(started, 3),
+            'method': request.method,
+            'path': logged_path(request, self.redacted_url_names),
+            'user': user.get_username() if user is not None and user.is_authenticated else None,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 3),
+        }
+        line = json.dumps(entry) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as log:
+            log.write(line)
+        return response
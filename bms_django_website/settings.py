@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+from importlib.util import find_spec
 import os
 
 
@@ -47,6 +48,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'bms_django_website.requestlog.RequestLogMiddleware',
+    'django.middleware.gzip.GZipMiddleware',
+    'bms_django_website.pagecache.PageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -87,6 +91,17 @@ DATABASES = {
 }
 
 
+# Cache
+# Feeds and rate limit buckets are stored here. Use a shared backend (Redis, Memcached)
+# when running several worker processes, so invalidations reach every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -106,6 +121,27 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# Argon2 (needs the argon2-cffi package) or scrypt is used for new hashes. Existing
+# PBKDF2 hashes still verify and are rehashed with the preferred hasher on login.
+# Measure candidate parameters with `python manage.py benchmark_hashers`.
+
+PASSWORD_HASHERS = [
+    'users.hashers.TunedScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+if find_spec('argon2') is not None:
+    PASSWORD_HASHERS.insert(0, 'users.hashers.TunedArgon2PasswordHasher')
+
+PASSWORD_HASHER_PARAMS = {
+    # Argon2id with 19 MiB of memory, two passes and one lane.
+    'argon2': {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1},
+    # scrypt with N=2**14 and r=8, which uses 16 MiB of memory per hash.
+    'scrypt': {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1},
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -125,6 +161,19 @@ STATIC_URL = '/static/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Uploads larger than UPLOAD_MAX_SIZE bytes stop being stored as soon as they cross the
+# limit. Profile pictures are also rejected above AVATAR_MAX_PIXELS, read from the image
+# header before decoding, and shrunk to fit in AVATAR_SIZE x AVATAR_SIZE pixels.
+# Measure the memory used per upload with `python manage.py benchmark_avatar_upload`.
+FILE_UPLOAD_HANDLERS = [
+    'users.uploadhandlers.SizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+UPLOAD_MAX_SIZE = 5 * 1024 * 1024
+AVATAR_MAX_PIXELS = 24_000_000
+AVATAR_SIZE = 300
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -136,9 +185,67 @@ CRISPY_ALLOWED_TEMPLATE_PACK = 'bootstrap4'
 LOGIN_REDIRECT_URL = 'blog-home'
 LOGIN_URL = 'login'
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+# Emails are queued in the database and delivered by `manage.py send_queued_mail`.
+# For local testing run a debugging SMTP server (`python -m aiosmtpd -n -l localhost:1025`)
+# and set EMAIL_HOST=localhost EMAIL_PORT=1025 EMAIL_USE_TLS=0.
+EMAIL_BACKEND = 'users.mail.OutboxEmailBackend'
+OUTBOX_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', '1') == '1'
 EMAIL_HOST_USER = os.environ.get('EMAIL_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_PASS')
+
+# Token-bucket throttling of the write and authentication endpoints.
+# Use RATE_LIMIT_BACKEND = 'cache' with a shared cache to apply limits across workers.
+RATE_LIMIT_ENABLED = True
+RATE_LIMIT_BACKEND = 'local'
+RATE_LIMIT_CACHE = 'default'
+RATE_LIMITS = {
+    'login': (10, 60),
+    'register': (5, 60),
+    'password_reset': (5, 300),
+    'post_create': (10, 60),
+    # Attempts per client IP and submitted username or email.
+    'login:username': (5, 300),
+    'password_reset:email': (3, 900),
+}
+
+# Pages served to anonymous visitors without cookies are cached already compressed
+# (Brotli needs the optional brotli package). Saving a post invalidates them all.
+# Compare the CPU cost per request with `python manage.py benchmark_compression`.
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_TIMEOUT = 60
+PAGE_CACHE_URL_NAMES = [
+    'blog-home',
+    'user-posts',
+    'blog-about',
+    'post-archive',
+    'post-archive-month',
+    'post-most-viewed',
+]
+PAGE_CACHE_GZIP_LEVEL = 9
+PAGE_CACHE_BROTLI_QUALITY = 11
+
+# Set REQUEST_LOG_PATH to append one JSON line per request to that file, for
+# `manage.py replay_requests`. Capture is off when it is empty.
+REQUEST_LOG_PATH = os.environ.get('REQUEST_LOG_PATH')
+# Routes whose path arguments are secrets; their paths are logged as the URL pattern.
+REQUEST_LOG_REDACTED_URL_NAMES = ['password_reset_confirm']
+
+# `manage.py build_static_site` writes a static snapshot of the public pages here.
+STATIC_SITE_ROOT = BASE_DIR / 'static_site'
+
+# Posts dated in the future are published by a scheduler that invalidates the cached
+# feeds and pages when they become visible. Either set POST_SCHEDULER_THREAD to run it
+# in a thread of each web worker, or run `python manage.py run_scheduler` once.
+# A post scheduled in another process is noticed within the poll interval (seconds).
+POST_SCHEDULER_THREAD = os.environ.get('POST_SCHEDULER_THREAD', '0') == '1'
+POST_SCHEDULER_POLL_INTERVAL = 60
+
+# `manage.py test` hashes passwords with MD5 and gives every test process, including
+# the workers of --parallel, its own temporary MEDIA_ROOT.
+TEST_RUNNER = 'bms_django_website.testrunner.FastTestRunner'
+
+# Post views are buffered per worker and written in batches at most this often (seconds).
+VIEW_COUNT_FLUSH_INTERVAL = 10
@@ -0,0 +1,91 @@
+"""
+Test runner with settings that keep the suite fast and parallel-safe.
+
+Every test process, including each worker of `manage.py test --parallel`, runs with:
+
+- A fast MD5 password hasher instead of Argon2 or scrypt, which cost tens of
+  milliseconds and megabytes of memory per hash by design.
+- Its own temporary MEDIA_ROOT, seeded with the default avatar, so uploads and
+  avatar resizing never touch the real media directory or another process's files.
+  The directory is removed when the process exits.
+
+Tests of the password hashers themselves can restore the configured hashers with
+override_settings(PASSWORD_HASHERS=CONFIGURED_PASSWORD_HASHERS).
+
+Classes:
+    FastTestRunner: DiscoverRunner applying the test settings.
+    FastParallelTestSuite: ParallelTestSuite applying them in every worker.
+"""
+
+import os
+import shutil
+import tempfile
+from multiprocessing.util import Finalize
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner, ParallelTestSuite, _init_worker
+from django.test.utils import override_settings
+
+
+CONFIGURED_PASSWORD_HASHERS = list(settings.PASSWORD_HASHERS)
+CONFIGURED_MEDIA_ROOT = settings.MEDIA_ROOT
+
+TEST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def _make_media_root():
+    """
+    Create a temporary media directory holding the default avatar.
+
+    Returns:
+        str: The path of the directory.
+    """
+    media_root = tempfile.mkdtemp(prefix='bms-test-media-')
+    default_avatar = os.path.join(CONFIGURED_MEDIA_ROOT, 'default.png')
+    if os.path.exists(default_avatar):
+        shutil.copy(default_avatar, media_root)
+    return media_root
+
+
+def _enable_test_settings():
+    """
+    Apply the test settings to the current process.
+
+    Returns:
+        tuple: The override_settings object and the temporary media directory.
+    """
+    media_root = _make_media_root()
+    override = override_settings(PASSWORD_HASHERS=TEST_PASSWORD_HASHERS, MEDIA_ROOT=media_root)
+    override.enable()
+    return override, media_root
+
+
+def _init_test_worker(*args, **kwargs):
+    """Set up a worker process of the parallel suite, then give it its own media directory."""
+    _init_worker(*args, **kwargs)
+    _override, media_root = _enable_test_settings()
+    # Pool workers run multiprocessing finalizers, not atexit handlers, when they exit.
+    Finalize(None, shutil.rmtree, args=(media_root, True), exitpriority=0)
+
+
+class FastParallelTestSuite(ParallelTestSuite):
+    """ParallelTestSuite whose workers each use the test settings and their own media directory."""
+    init_worker = _init_test_worker
+
+
+class FastTestRunner(DiscoverRunner):
+    """
+    DiscoverRunner that runs the tests with a fast password hasher and a temporary MEDIA_ROOT.
+
+    Select it with the TEST_RUNNER setting.
+    """
+    parallel_test_suite = FastParallelTestSuite
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings, self._media_root = _enable_test_settings()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        shutil.rmtree(self._media_root, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -20,17 +20,22 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from users import views as user_views
+from .ratelimit import rate_limit
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('blog/', include("blog.urls")),
     path('register/', user_views.register, name='register'),
     path('profile/', user_views.profile, name='profile'),
-    path('login/', auth_views.LoginView.as_view(template_name='users/login.html'), name='login'),
+    path('login/',
+         rate_limit('login', field='username')(
+             auth_views.LoginView.as_view(template_name='users/login.html')),
+         name='login'),
     path('logout/', auth_views.LogoutView.as_view(template_name='users/logout.html'), name='logout'),
     path('password-reset/',
-         auth_views.PasswordResetView.as_view(
-             template_name='users/password_reset.html'),
+         rate_limit('password_reset', field='email')(
+             auth_views.PasswordResetView.as_view(
+                 template_name='users/password_reset.html')),
          name='password_reset'),
     path('password-reset/done/',
          auth_views.PasswordResetDoneView.as_view(
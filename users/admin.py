@@ -1,10 +1,135 @@
 """
 Admin configuration for the users app.
 
-This module registers the Profile model with the Django admin interface.
+This module registers the Profile and QueuedEmail models with the Django admin interface,
+and extends the User admin so that users are deleted in small chunks, from the changelist
+action as well as from the change form. The Profile changelist joins the users in the
+same query and never counts the whole table.
 """
 
-from django.contrib import admin
-from .models import Profile
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.utils import model_ngettext, unquote
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_protect
 
-admin.site.register(Profile)
+from blog.models import ArchivedPost, Post
+from bms_django_website.pagination import EstimatedCountAdminMixin
+from .deletion import delete_users
+from .models import Profile, QueuedEmail
+
+
+@admin.action(permissions=['delete'], description="Delete selected users in chunks")
+def delete_users_in_chunks(modeladmin, request, queryset):
+    """
+    Admin action deleting the selected users and their posts a chunk at a time.
+
+    Like the built-in delete action, it first renders a confirmation page, which
+    posts back with post=yes. The page shows the number of posts instead of listing
+    every related object. Avatar files are removed in the background after the users
+    are gone.
+    """
+    users = list(queryset)
+    deletable_objects, model_count, perms_needed, _ = modeladmin.get_deleted_objects(users, request)
+    if request.POST.get('post'):
+        if perms_needed:
+            raise PermissionDenied
+        for user in users:
+            modeladmin.log_deletion(request, user, str(user))
+        user_count, post_count, _ = delete_users(queryset)
+        modeladmin.message_user(request, f"Deleted {user_count} user(s) and {post_count} post(s).",
+                                messages.SUCCESS)
+        # Return None to display the change list again.
+        return None
+
+    context = {
+        **modeladmin.admin_site.each_context(request),
+        'title': "Are you sure?",
+        'subtitle': None,
+        'objects_name': str(model_ngettext(queryset)),
+        'deletable_objects': deletable_objects,
+        'model_count': model_count.items(),
+        'perms_lacking': perms_needed,
+        'queryset': users,
+        'opts': modeladmin.model._meta,
+        'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        'media': modeladmin.media,
+    }
+    request.current_app = modeladmin.admin_site.name
+    return TemplateResponse(request, 'admin/auth/user/delete_users_in_chunks_confirmation.html', context)
+
+
+class ChunkedDeleteUserAdmin(UserAdmin):
+    """
+    User admin deleting users and their posts a chunk at a time on every path.
+
+    The action, the built-in delete action and the delete button of the change form
+    all go through delete_users, so none of them runs the whole cascade in one
+    transaction, and their confirmation pages show the number of posts instead of
+    collecting and listing every one of them.
+    """
+    actions = [delete_users_in_chunks]
+
+    def get_deleted_objects(self, objs, request):
+        """
+        Return the users and the number of their posts, without running the collector.
+
+        Returns:
+            tuple: The users to list, the number of objects per model, the names of
+            the models the user may not delete, and the protected objects (none).
+        """
+        users = list(objs)
+        post_count = (Post.all_objects.filter(author__in=users).count()
+                      + ArchivedPost.objects.filter(author__in=users).count())
+        model_count = {self.opts.verbose_name_plural: len(users), 'posts': post_count}
+        perms_needed = set()
+        if post_count and not request.user.has_perm('blog.delete_post'):
+            perms_needed.add('posts')
+        return [str(user) for user in users], model_count, perms_needed, []
+
+    def delete_model(self, request, obj):
+        delete_users(User.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_users(queryset)
+
+    @method_decorator(csrf_protect)
+    def delete_view(self, request, object_id, extra_context=None):
+        """
+        Delete a user from the change form, a chunk of posts at a time.
+
+        ModelAdmin.delete_view wraps the deletion in a transaction, which would turn the
+        chunk transactions of delete_model into savepoints of a single one. The
+        confirmed deletion is handled here instead; the confirmation page is left to
+        ModelAdmin.
+        """
+        obj = self.get_object(request, unquote(object_id)) if request.method == 'POST' else None
+        if obj is None:
+            return super().delete_view(request, object_id, extra_context)
+        if not self.has_delete_permission(request, obj):
+            raise PermissionDenied
+        if self.get_deleted_objects([obj], request)[2]:
+            raise PermissionDenied
+        obj_display, obj_id = str(obj), obj.pk
+        self.log_deletion(request, obj, obj_display)
+        self.delete_model(request, obj)
+        return self.response_delete(request, obj_display, obj_id)
+
+
+class ProfileAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
+    list_display = ('user', 'image')
+    list_select_related = ('user',)
+    ordering = ('-id',)
+    # Username prefix search.
+    search_fields = ('^user__username',)
+    raw_id_fields = ('user',)
+
+
+admin.site.unregister(User)
+admin.site.register(User, ChunkedDeleteUserAdmin)
+admin.site.register(Profile, ProfileAdmin)
+admin.site.register(QueuedEmail)
@@ -0,0 +1,81 @@
+"""
+Chunked deletion of users for the users app.
+
+Deleting a User lets Django cascade to the profile and to every post of the user in a
+single transaction, which can hold SQLite's write lock for a long time. The functions
+in this module delete the posts of each user in small chunks, one short transaction
+per chunk, before deleting the user itself, and remove the avatar files afterwards on
+a background thread.
+
+Functions:
+    delete_users: Deletes users chunk by chunk, reporting progress.
+"""
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from blog.maintenance import run_in_batches
+from blog.models import ArchivedPost, Post
+from .media import delete_media_files_in_background
+from .models import Profile
+
+
+def _delete_in_chunks(queryset, chunk_size, pause):
+    """
+    Delete the rows of a queryset in chunks, one transaction per chunk.
+
+    Args:
+        queryset: The rows to delete.
+        chunk_size: The maximum number of rows deleted per transaction.
+        pause: Seconds to sleep between chunks so other writers can get the lock.
+
+    Returns:
+        generator: Yields the number of rows deleted by each chunk.
+    """
+    def select_chunk(size):
+        return list(queryset.values_list('pk', flat=True)[:size])
+
+    def delete_chunk(pks):
+        queryset.model._base_manager.filter(pk__in=pks).delete()
+
+    return run_in_batches(select_chunk, delete_chunk, chunk_size, pause)
+
+
+def delete_users(users, chunk_size=500, pause=0.05, progress=None):
+    """
+    Delete users and everything they own without long-running transactions.
+
+    Args:
+        users: A queryset of the users to delete.
+        chunk_size: The maximum number of posts deleted per transaction.
+        pause: Seconds to sleep between chunks.
+        progress: Optional callable taking (username, posts_deleted) after every chunk
+            and (username, None) once the user itself is deleted.
+
+    Returns:
+        tuple: The number of users deleted, the number of posts deleted, and a Future
+        resolving once the orphaned avatar files have been removed.
+    """
+    user_count = post_count = 0
+    avatars = []
+    for user_id, username in users.order_by('pk').values_list('pk', 'username'):
+        deleted_posts = 0
+        for queryset in (Post.all_objects.filter(author_id=user_id),
+                         ArchivedPost.objects.filter(author_id=user_id)):
+            for deleted in _delete_in_chunks(queryset, chunk_size, pause):
+                deleted_posts += deleted
+                if progress:
+                    progress(username, deleted_posts)
+
+        avatar = Profile.objects.filter(user_id=user_id).values_list('image', flat=True).first()
+        with transaction.atomic():
+            User.objects.filter(pk=user_id).delete()
+        if avatar and not Profile.objects.filter(image=avatar).exists():
+            avatars.append(avatar)
+
+        user_count += 1
+        post_count += deleted_posts
+        if progress:
+            progress(username, None)
+
+    return user_count, post_count, delete_media_files_in_background(avatars)
@@ -0,0 +1,40 @@
+"""
+Bulk factories of users for tests and benchmarks.
+
+The password is hashed once and shared by every user, and the users and their
+profiles are written with bulk_create, so thousands of accounts take a fraction of a
+second instead of one password hash and several queries each.
+
+Functions:
+    make_users: Creates users with their profiles.
+"""
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+
+from .models import Profile
+
+
+def make_users(count, username='user{i}', password='testpassword', batch_size=500, **fields):
+    """
+    Create users and their profiles in bulk.
+
+    Args:
+        count: The number of users.
+        username: Format string of the usernames, given the index i. The email
+            address is the username at example.com.
+        password: The password of every user.
+        batch_size: The number of rows per INSERT.
+        **fields: Other field values shared by every user.
+
+    Returns:
+        list: The User objects, in index order.
+    """
+    hashed = make_password(password)
+    users = User.objects.bulk_create([
+        User(username=username.format(i=i), email=f"{username.format(i=i)}@example.com",
+             password=hashed, **fields)
+        for i in range(count)
+    ], batch_size=batch_size)
+    Profile.objects.bulk_create([Profile(user=user) for user in users], batch_size=batch_size)
+    return users
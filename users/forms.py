@@ -7,6 +7,7 @@ This module defines the following forms:
 - ProfileUpdateForm: Extends Django's ModelForm for Profile, allowing updates to the profile image.
 
 Classes:
+    AvatarImageField: Image field that checks the size of an upload before decoding it.
     UserRegisterForm: Form for user registration.
     UserUpdateForm: Form for updating user information.
     ProfileUpdateForm: Form for updating user profile information.
@@ -14,11 +15,71 @@ Classes:
 
 
 from django import forms
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
+from django.core.exceptions import ValidationError
+from django.template.defaultfilters import filesizeformat
+from .images import check_image_size, read_image_size
 from .models import Profile
 
 
+class AvatarImageField(forms.ImageField):
+    """
+    Image field that rejects large uploads before Pillow decodes them.
+
+    The number of bytes is checked first, then the dimensions read from the image
+    header, and only then does ImageField verify the whole file.
+    """
+    default_error_messages = {
+        'file_too_large': "The file is %(size)s; files up to %(max_size)s are accepted.",
+        'image_too_large': "The image is %(width)s x %(height)s pixels; "
+                           "images up to %(max_pixels)s pixels are accepted.",
+    }
+
+    def __init__(self, *, max_size=None, max_pixels=None, **kwargs):
+        """
+        Args:
+            max_size: The largest accepted file, in bytes. Defaults to UPLOAD_MAX_SIZE.
+            max_pixels: The largest accepted width times height. Defaults to AVATAR_MAX_PIXELS.
+        """
+        super().__init__(**kwargs)
+        self.max_size = max_size
+        self.max_pixels = max_pixels
+
+    def to_python(self, data):
+        """Check the size and dimensions of an upload before ImageField decodes it."""
+        if data in self.empty_values or not hasattr(data, 'seek'):
+            return super().to_python(data)
+
+        max_size = self.max_size if self.max_size is not None else settings.UPLOAD_MAX_SIZE
+        max_pixels = self.max_pixels if self.max_pixels is not None else settings.AVATAR_MAX_PIXELS
+        if data.size is not None and data.size > max_size:
+            raise ValidationError(
+                self.error_messages['file_too_large'],
+                code='file_too_large',
+                params={'size': filesizeformat(data.size), 'max_size': filesizeformat(max_size)},
+            )
+
+        data.seek(0)
+        try:
+            _format, width, height = read_image_size(data)
+        except ValueError as exc:
+            raise ValidationError(self.error_messages['invalid_image'], code='invalid_image') from exc
+        finally:
+            data.seek(0)
+
+        try:
+            check_image_size(width, height, max_pixels)
+        except ValueError as exc:
+            raise ValidationError(
+                self.error_messages['image_too_large'],
+                code='image_too_large',
+                params={'width': width, 'height': height, 'max_pixels': max_pixels},
+            ) from exc
+        return super().to_python(data)
+
+
 class UserRegisterForm(UserCreationForm):
     email = forms.EmailField()
 
@@ -39,3 +100,4 @@ class ProfileUpdateForm(forms.ModelForm):
     class Meta:
         model = Profile
         fields = ['image']
+        field_classes = {'image': AvatarImageField}
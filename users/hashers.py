@@ -0,0 +1,57 @@
+"""
+Password hashers for the users app.
+
+This module defines Argon2 and scrypt hashers whose cost parameters are read from the
+PASSWORD_HASHER_PARAMS setting, so they can be tuned from measurements made with the
+benchmark_hashers management command. Both keep Django's algorithm names, so hashes
+created with other parameters are still verified and are transparently rehashed with
+the current parameters on the user's next successful login.
+
+Classes:
+    TunedArgon2PasswordHasher: Argon2id hasher with configurable time, memory and parallelism.
+    TunedScryptPasswordHasher: scrypt hasher with configurable work factor, block size and parallelism.
+"""
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, ScryptPasswordHasher
+
+
+def _params(algorithm):
+    """Return the tuned parameters configured for algorithm."""
+    return getattr(settings, 'PASSWORD_HASHER_PARAMS', {}).get(algorithm, {})
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id hasher using the parameters in PASSWORD_HASHER_PARAMS['argon2'].
+
+    Attributes:
+        time_cost (int): The number of passes over memory.
+        memory_cost (int): The memory used per hash, in KiB.
+        parallelism (int): The number of lanes.
+    """
+
+    def __init__(self):
+        params = _params(self.algorithm)
+        self.time_cost = params.get('time_cost', self.time_cost)
+        self.memory_cost = params.get('memory_cost', self.memory_cost)
+        self.parallelism = params.get('parallelism', self.parallelism)
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    scrypt hasher using the parameters in PASSWORD_HASHER_PARAMS['scrypt'].
+
+    Attributes:
+        work_factor (int): The CPU/memory cost N, a power of two.
+        block_size (int): The block size r.
+        parallelism (int): The parallelization factor p.
+    """
+
+    def __init__(self):
+        params = _params(self.algorithm)
+        self.work_factor = params.get('work_factor', self.work_factor)
+        self.block_size = params.get('block_size', self.block_size)
+        self.parallelism = params.get('parallelism', self.parallelism)
+        # hashlib refuses to use more than 32 MiB unless maxmem is raised explicitly.
+        self.maxmem = max(self.maxmem, 256 * self.work_factor * self.block_size * self.parallelism)
@@ -0,0 +1,81 @@
+"""
+Bounded image handling for profile pictures.
+
+Pillow only reads the header of a file when it is opened, and allocates the pixel
+buffer when the image is decoded. The functions in this module look at the header
+first, so oversized uploads are rejected before any pixels are decoded, and let the
+JPEG decoder scale down while decoding, so a large photo never needs a full-size buffer.
+
+Functions:
+    read_image_size: Returns the format and dimensions of an image from its header.
+    check_image_size: Raises ValueError if an image is larger than the configured limits.
+    resize_avatar: Shrinks an image file in place so it fits in a square.
+"""
+
+import warnings
+
+from PIL import Image
+
+
+def read_image_size(file):
+    """
+    Read the format and dimensions of an image without decoding it.
+
+    Args:
+        file: A path or a binary file object positioned at the start of the image.
+
+    Returns:
+        tuple: The Pillow format name, the width and the height.
+
+    Raises:
+        ValueError: If the data is not an image Pillow can read.
+    """
+    try:
+        with warnings.catch_warnings():
+            # The caller applies its own, lower limit.
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(file) as img:
+                return img.format, img.width, img.height
+    except (OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise ValueError("Not a readable image.") from exc
+
+
+def check_image_size(width, height, max_pixels):
+    """
+    Check the dimensions of an image against a pixel budget.
+
+    Args:
+        width: The width of the image in pixels.
+        height: The height of the image in pixels.
+        max_pixels: The largest accepted width times height.
+
+    Raises:
+        ValueError: If the image has more pixels than max_pixels.
+    """
+    if width * height > max_pixels:
+        raise ValueError(f"{width}x{height} is more than {max_pixels} pixels.")
+
+
+def resize_avatar(path, size):
+    """
+    Shrink an image file in place so it fits in a size x size square.
+
+    JPEG files are decoded at a reduced scale (1/2, 1/4 or 1/8) picked with draft(),
+    so the decoder only allocates a buffer a little larger than the result.
+
+    Args:
+        path: The path of the image file.
+        size: The largest width and height of the result, in pixels.
+
+    Returns:
+        bool: True if the file was rewritten, False if it already fitted.
+    """
+    with Image.open(path) as img:
+        if img.width <= size and img.height <= size:
+            return False
+        if img.format == 'JPEG':
+            # Keep at least twice the target size so the final resampling stays smooth.
+            img.draft(img.mode, (size * 2, size * 2))
+        img.thumbnail((size, size))
+        img.save(path)
+    return True
@@ -0,0 +1,225 @@
+"""
+Asynchronous email delivery for the users app.
+
+Password reset emails are not sent during the request. The OutboxEmailBackend stores
+each message as a QueuedEmail row, and the send_queued_mail management command later
+delivers due messages in batches over a single reused connection to the mail host.
+
+Classes:
+    OutboxEmailBackend: Email backend that writes messages to the outbox table.
+    MailHostUnavailable: Raised when the connection to the mail host is lost.
+
+Functions:
+    claim_queued_emails: Takes a batch of due messages from the outbox for one worker.
+    deliver_queued_emails: Sends one batch of due messages over an open connection.
+    get_delivery_connection: Returns a connection to the backend that really sends mail.
+"""
+
+import smtplib
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+from .models import QueuedEmail
+
+
+# Seconds to wait before the first retry; doubled after every further failure.
+RETRY_BACKOFF_SECONDS = 60
+
+# Seconds a claimed message is hidden from other workers. If the worker dies before
+# sending it, the message becomes due again after this delay.
+CLAIM_LEASE_SECONDS = 300
+
+# Errors meaning the mail host cannot be reached, rather than that it refused a
+# message. They say nothing about the messages, so they do not count as attempts.
+CONNECTION_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    socket.gaierror,
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    smtplib.SMTPHeloError,
+    smtplib.SMTPAuthenticationError,
+)
+
+
+class MailHostUnavailable(Exception):
+    """Raised when the connection to the mail host fails; the unsent claims are released."""
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """
+    Email backend that queues messages in the database instead of sending them.
+
+    Attachments are not supported, since the outbox only stores text and HTML bodies.
+    """
+
+    def send_messages(self, email_messages):
+        """
+        Store the messages in the outbox.
+
+        Args:
+            email_messages: The EmailMessage instances to queue.
+
+        Returns:
+            int: The number of messages queued.
+        """
+        rows = []
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            if message.attachments:
+                if self.fail_silently:
+                    continue
+                raise ValueError("The email outbox does not support attachments.")
+            html_body = ''
+            for content, mimetype in getattr(message, 'alternatives', []):
+                if mimetype == 'text/html':
+                    html_body = content
+            rows.append(QueuedEmail(
+                subject=message.subject,
+                body=message.body,
+                html_body=html_body,
+                from_email=message.from_email,
+                to=list(message.to),
+                cc=list(message.cc),
+                bcc=list(message.bcc),
+            ))
+        QueuedEmail.objects.bulk_create(rows)
+        return len(rows)
+
+
+def _build_message(queued, connection):
+    """Rebuild an EmailMessage from a queued row."""
+    message = EmailMultiAlternatives(
+        subject=queued.subject,
+        body=queued.body,
+        from_email=queued.from_email,
+        to=queued.to,
+        cc=queued.cc,
+        bcc=queued.bcc,
+        connection=connection,
+    )
+    if queued.html_body:
+        message.attach_alternative(queued.html_body, 'text/html')
+    return message
+
+
+def due_emails(now=None):
+    """Return the queued messages that are due for delivery."""
+    return QueuedEmail.objects.filter(status=QueuedEmail.QUEUED, next_attempt_at__lte=now or timezone.now())
+
+
+def claim_queued_emails(batch_size=50, lease=CLAIM_LEASE_SECONDS):
+    """
+    Take a batch of due messages from the outbox, so no other worker sends them.
+
+    A message is claimed by moving its next attempt past the lease, with an UPDATE that
+    only matches if no other worker moved it first. On databases that support it the
+    candidates are also read with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent
+    workers pick different rows instead of competing for the same ones.
+
+    Args:
+        batch_size: The maximum number of messages to claim.
+        lease: The number of seconds the messages are hidden from other workers.
+
+    Returns:
+        list: The claimed QueuedEmail objects.
+    """
+    now = timezone.now()
+    leased_until = now + timedelta(seconds=lease)
+    claimed = []
+    with transaction.atomic():
+        candidates = list(due_emails(now).select_for_update(skip_locked=True)
+                          .order_by('next_attempt_at')[:batch_size])
+        for queued in candidates:
+            taken = QueuedEmail.objects.filter(
+                pk=queued.pk, status=QueuedEmail.QUEUED, next_attempt_at=queued.next_attempt_at,
+            ).update(next_attempt_at=leased_until)
+            if taken:
+                queued.next_attempt_at = leased_until
+                claimed.append(queued)
+    return claimed
+
+
+def deliver_queued_emails(connection, batch_size=50, max_attempts=5):
+    """
+    Claim and send one batch of due messages from the outbox.
+
+    The caller owns the connection, so it stays open across batches. Each message is
+    marked as sent as soon as it is, so a worker that dies mid-batch does not send it
+    again. If the mail host refuses a message, the connection is reopened for the
+    next one, and the message is retried later with exponential backoff until
+    max_attempts. If the mail host cannot be reached, the batch stops and the unsent
+    messages are put back in the queue without counting an attempt.
+
+    Args:
+        connection: An email backend instance, usually opened by the caller.
+        batch_size: The maximum number of messages to send.
+        max_attempts: The number of attempts after which a message is marked failed.
+
+    Returns:
+        int: The number of messages taken from the queue.
+
+    Raises:
+        MailHostUnavailable: If the connection to the mail host failed.
+    """
+    batch = claim_queued_emails(batch_size)
+    for index, queued in enumerate(batch):
+        try:
+            connection.send_messages([_build_message(queued, connection)])
+        except CONNECTION_ERRORS as error:
+            _release(batch[index:], error)
+            raise MailHostUnavailable(repr(error)) from error
+        except Exception as error:
+            queued.attempts += 1
+            queued.last_error = repr(error)
+            if queued.attempts >= max_attempts:
+                queued.status = QueuedEmail.FAILED
+            else:
+                delay = RETRY_BACKOFF_SECONDS * 2 ** (queued.attempts - 1)
+                queued.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+            queued.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+            try:
+                _reopen(connection)
+            except CONNECTION_ERRORS as error:
+                _release(batch[index + 1:], error)
+                raise MailHostUnavailable(repr(error)) from error
+        else:
+            QueuedEmail.objects.filter(pk=queued.pk).update(
+                status=QueuedEmail.SENT, sent_at=timezone.now(), last_error='')
+    return len(batch)
+
+
+def _reopen(connection):
+    """Replace a connection that failed with a fresh one, for the rest of the batch."""
+    connection.close()
+    connection.open()
+
+
+def _release(claimed, error):
+    """
+    Put claimed messages back in the queue, due now, without counting an attempt.
+
+    Messages whose lease expired and were claimed by another worker are left alone.
+    """
+    now = timezone.now()
+    for queued in claimed:
+        QueuedEmail.objects.filter(
+            pk=queued.pk, status=QueuedEmail.QUEUED, next_attempt_at=queued.next_attempt_at,
+        ).update(next_attempt_at=now, last_error=repr(error))
+
+
+def get_delivery_connection():
+    """
+    Return a connection to the backend that actually delivers queued mail.
+
+    Returns:
+        BaseEmailBackend: An unopened instance of OUTBOX_DELIVERY_BACKEND.
+    """
+    return get_connection(settings.OUTBOX_DELIVERY_BACKEND)
@@ -0,0 +1,115 @@
+"""
+Management command that measures the peak memory used to process one avatar upload.
+
+For every image size and format, a test image is written to a temporary directory and
+processed in a fresh child process, so each measurement starts from the same baseline.
+The 'decode' strategy loads the whole image before shrinking it; the 'avatar' strategy
+is what the profile form and Profile.save do: check the header, then shrink with
+reduced JPEG decoding. The growth of the peak resident set size of the child is reported.
+
+Usage:
+    python manage.py benchmark_avatar_upload
+    python manage.py benchmark_avatar_upload --megapixels 2 12 48 --formats JPEG
+"""
+
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from users.images import check_image_size, read_image_size, resize_avatar
+
+
+def _peak_rss_kib():
+    """Return the peak resident set size of the current process in KiB."""
+    try:
+        # On Linux, ru_maxrss survives exec and would start at the parent's peak.
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KiB.
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _process(strategy, path, size, max_pixels):
+    """
+    Process one image in the current process and measure it.
+
+    Args:
+        strategy: 'decode' or 'avatar'.
+        path: The path of the image file, which may be rewritten.
+        size: The avatar size in pixels.
+        max_pixels: The pixel limit applied by the 'avatar' strategy.
+
+    Returns:
+        tuple: The outcome, the growth of the peak RSS in KiB and the elapsed seconds.
+    """
+    baseline = _peak_rss_kib()
+    start = time.perf_counter()
+    if strategy == 'decode':
+        with Image.open(path) as img:
+            img.load()
+            img.thumbnail((size, size), reducing_gap=None)
+            img.save(path)
+        outcome = 'resized'
+    else:
+        try:
+            _format, width, height = read_image_size(path)
+            check_image_size(width, height, max_pixels)
+        except ValueError:
+            outcome = 'rejected'
+        else:
+            outcome = 'resized' if resize_avatar(path, size) else 'kept'
+    return outcome, _peak_rss_kib() - baseline, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = "Measure the peak memory used to process avatar uploads of different sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megapixels', type=float, nargs='+', default=[1, 12, 24, 48],
+                            help="Image sizes to measure, in megapixels.")
+        parser.add_argument('--formats', nargs='+', default=['JPEG', 'PNG'],
+                            help="Pillow formats to measure.")
+        parser.add_argument('--strategies', nargs='+', default=['decode', 'avatar'],
+                            choices=['decode', 'avatar'], help="Processing strategies to compare.")
+
+    def handle(self, *args, **options):
+        size = settings.AVATAR_SIZE
+        max_pixels = settings.AVATAR_MAX_PIXELS
+        context = multiprocessing.get_context('spawn')
+
+        self.stdout.write(f"{'format':<6} {'size':>11} {'file':>10} {'strategy':<8} "
+                          f"{'outcome':<9} {'peak RSS':>10} {'ms':>8}")
+        with tempfile.TemporaryDirectory() as directory:
+            for image_format in options['formats']:
+                for megapixels in options['megapixels']:
+                    width = int(math.sqrt(megapixels * 1_000_000 * 4 / 3))
+                    height = width * 3 // 4
+                    source = os.path.join(directory, f'source.{image_format.lower()}')
+                    Image.radial_gradient('L').resize((width, height)).convert('RGB').save(
+                        source, image_format)
+                    file_size = os.path.getsize(source)
+
+                    for strategy in options['strategies']:
+                        path = os.path.join(directory, f'{strategy}.{image_format.lower()}')
+                        with open(source, 'rb') as src, open(path, 'wb') as dst:
+                            dst.write(src.read())
+                        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                            outcome, peak, seconds = executor.submit(
+                                _process, strategy, path, size, max_pixels).result()
+                        self.stdout.write(
+                            f"{image_format:<6} {f'{width}x{height}':>11} {file_size / 1024 ** 2:>8.1f}MB "
+                            f"{strategy:<8} {outcome:<9} {peak / 1024:>8.1f}MB {seconds * 1000:>8.1f}")
@@ -0,0 +1,72 @@
+"""
+Management command that measures password hashing throughput.
+
+For every configured hasher, a password is hashed once and then verified repeatedly
+on a single core, which is what a login costs. The result is reported as logins per
+second per core, along with the time needed to hash a new password at registration.
+
+Usage:
+    python manage.py benchmark_hashers
+    python manage.py benchmark_hashers --seconds 5 --param argon2.memory_cost=65536
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = "Measure logins per second per core for each configured password hasher."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=2.0,
+                            help="CPU seconds spent verifying passwords per hasher.")
+        parser.add_argument('--param', action='append', default=[], metavar='ALGORITHM.NAME=VALUE',
+                            help="Override a tuned hasher parameter, e.g. argon2.time_cost=3.")
+
+    def handle(self, *args, **options):
+        params = {algorithm: dict(values)
+                  for algorithm, values in getattr(settings, 'PASSWORD_HASHER_PARAMS', {}).items()}
+        for override in options['param']:
+            try:
+                name, value = override.split('=', 1)
+                algorithm, key = name.split('.', 1)
+                params.setdefault(algorithm, {})[key] = int(value)
+            except ValueError:
+                raise CommandError(f"Invalid --param {override!r}, expected ALGORITHM.NAME=VALUE.")
+
+        with override_settings(PASSWORD_HASHER_PARAMS=params):
+            self.stdout.write(f"{'hasher':<40} {'hash ms':>10} {'logins/s/core':>15}")
+            for path in settings.PASSWORD_HASHERS:
+                hasher = import_string(path)()
+                hash_ms, logins_per_second = self.measure(hasher, options['seconds'])
+                self.stdout.write(f"{type(hasher).__name__:<40} {hash_ms:>10.1f} {logins_per_second:>15.1f}")
+
+    def measure(self, hasher, seconds):
+        """
+        Time one hash and as many verifications as fit in the given CPU time.
+
+        Args:
+            hasher: The password hasher instance to measure.
+            seconds: The CPU time budget for the verification loop.
+
+        Returns:
+            tuple: The milliseconds taken to hash a password and the verifications per CPU second.
+        """
+        password = 'correct horse battery staple'
+        start = time.process_time()
+        encoded = hasher.encode(password, hasher.salt())
+        hash_ms = (time.process_time() - start) * 1000
+
+        verified = 0
+        start = time.process_time()
+        while True:
+            hasher.verify(password, encoded)
+            verified += 1
+            elapsed = time.process_time() - start
+            if elapsed >= seconds:
+                break
+        return hash_ms, verified / elapsed
@@ -0,0 +1,41 @@
+"""
+Management command that deletes users and their posts in small chunks.
+
+Usage:
+    python manage.py delete_users alice bob --chunk-size 500
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from users.deletion import delete_users
+
+
+class Command(BaseCommand):
+    help = "Delete users, their posts and their avatar files without long-running transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='+', help="Usernames of the users to delete.")
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help="Number of posts deleted per transaction.")
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help="Seconds to wait between chunks.")
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(username__in=options['usernames'])
+        missing = set(options['usernames']) - set(users.values_list('username', flat=True))
+        if missing:
+            raise CommandError(f"Unknown user(s): {', '.join(sorted(missing))}")
+
+        user_count, post_count, cleanup = delete_users(
+            users, options['chunk_size'], options['pause'], progress=self.report)
+        files, freed = cleanup.result()
+        self.stdout.write(f"Deleted {user_count} user(s), {post_count} post(s) "
+                          f"and {files} avatar file(s) ({freed} bytes).")
+
+    def report(self, username, posts_deleted):
+        """Print the progress of the deletion of one user."""
+        if posts_deleted is None:
+            self.stdout.write(f"Deleted user {username}.")
+        else:
+            self.stdout.write(f"{username}: deleted {posts_deleted} post(s)...")
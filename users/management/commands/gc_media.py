@@ -0,0 +1,91 @@
+"""
+Management command that deletes media files no profile refers to any more.
+
+Every avatar upload stores a new file and leaves the previous one behind. This command
+streams the referenced file names from the database, walks MEDIA_ROOT with os.scandir
+and deletes the unreferenced files in parallel.
+
+Usage:
+    python manage.py gc_media --dry-run
+    python manage.py gc_media --workers 16 --min-age 3600
+"""
+
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.media import PROTECTED_FILES, delete_media_files
+from users.models import Profile
+
+
+def scan_media(root):
+    """
+    Walk a directory tree with os.scandir.
+
+    Args:
+        root: The directory to walk.
+
+    Yields:
+        os.DirEntry: Every regular file below root.
+    """
+    pending = [root]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+class Command(BaseCommand):
+    help = "Delete files in MEDIA_ROOT that are not referenced by any profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report the files that would be deleted.")
+        parser.add_argument('--workers', type=int, default=8,
+                            help="Number of threads deleting files.")
+        parser.add_argument('--min-age', type=float, default=3600,
+                            help="Skip files modified less than this many seconds ago, "
+                                 "so uploads that are still being saved are kept.")
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        referenced = set(PROTECTED_FILES)
+        for name in Profile.objects.values_list('image', flat=True).iterator(chunk_size=2000):
+            referenced.add(name)
+
+        root = str(settings.MEDIA_ROOT)
+        cutoff = time.time() - options['min_age']
+        scanned = 0
+        orphans = []
+        orphan_bytes = 0
+        for entry in scan_media(root):
+            scanned += 1
+            name = os.path.relpath(entry.path, root).replace(os.sep, '/')
+            if name in referenced:
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                continue
+            orphans.append(name)
+            orphan_bytes += stat.st_size
+        scan_seconds = time.monotonic() - start
+
+        self.stdout.write(f"Scanned {scanned} file(s) against {len(referenced)} reference(s) "
+                          f"in {scan_seconds:.2f}s ({scanned / max(scan_seconds, 1e-6):.0f} files/s).")
+
+        if options['dry_run']:
+            for name in orphans:
+                self.stdout.write(f"Would delete {name}")
+            self.stdout.write(f"Would delete {len(orphans)} file(s), {orphan_bytes} bytes.")
+            return
+
+        delete_start = time.monotonic()
+        deleted, freed = delete_media_files(orphans, workers=options['workers'])
+        delete_seconds = time.monotonic() - delete_start
+        self.stdout.write(f"Deleted {deleted} file(s), {freed} bytes, in {delete_seconds:.2f}s "
+                          f"({deleted / max(delete_seconds, 1e-6):.0f} files/s).")
@@ -0,0 +1,75 @@
+"""
+Management command that delivers the emails waiting in the outbox.
+
+Usage:
+    python manage.py send_queued_mail            # run as a worker, polling the queue
+    python manage.py send_queued_mail --once     # drain the queue and exit
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.mail import (
+    CONNECTION_ERRORS,
+    MailHostUnavailable,
+    deliver_queued_emails,
+    due_emails,
+    get_delivery_connection,
+)
+
+
+class Command(BaseCommand):
+    help = "Send queued emails in batches over a reused connection to the mail host."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help="Number of messages sent per batch.")
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help="Attempts after which a message is marked as failed.")
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help="Seconds to wait between polls when the queue is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the queue once and exit instead of polling.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            sent = self.drain(batch_size, options['max_attempts'])
+            if sent:
+                self.stdout.write(f"Processed {sent} queued email(s).")
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size, max_attempts):
+        """
+        Deliver due messages batch by batch until the queue has no more due messages.
+
+        The connection is only opened when there is something to send, and it is opened
+        once here so that every message of every batch of the drain goes over it. If the
+        mail host cannot be reached, the drain stops and is tried again on the next poll.
+
+        Args:
+            batch_size: The number of messages sent per batch.
+            max_attempts: The number of attempts after which a message is marked failed.
+
+        Returns:
+            int: The number of messages processed.
+        """
+        if not due_emails().exists():
+            return 0
+        total = 0
+        connection = get_delivery_connection()
+        try:
+            connection.open()
+            while True:
+                processed = deliver_queued_emails(connection, batch_size, max_attempts)
+                total += processed
+                if processed < batch_size:
+                    break
+        except (MailHostUnavailable, *CONNECTION_ERRORS) as error:
+            self.stderr.write(f"Mail host unavailable, will retry: {error}")
+        finally:
+            connection.close()
+        return total
@@ -0,0 +1,68 @@
+"""
+Removal of media files for the users app.
+
+Files are removed through the default storage by a small thread pool, so callers such
+as the admin or the user deletion job never wait on the filesystem one file at a time.
+
+Functions:
+    delete_media_files: Deletes files in parallel and returns how many were removed.
+    delete_media_files_in_background: Schedules delete_media_files on a background thread.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+
+
+logger = logging.getLogger(__name__)
+
+# Files that are shared by every profile and must never be deleted.
+PROTECTED_FILES = {'default.png'}
+
+_background = ThreadPoolExecutor(max_workers=1, thread_name_prefix='media-cleanup')
+
+
+def _delete(name):
+    """Delete one file, returning its size in bytes, or None if it could not be removed."""
+    try:
+        size = default_storage.size(name)
+        default_storage.delete(name)
+    except OSError:
+        logger.warning("Could not delete media file %s", name, exc_info=True)
+        return None
+    return size
+
+
+def delete_media_files(names, workers=8):
+    """
+    Delete media files in parallel.
+
+    Args:
+        names: The storage names of the files, relative to MEDIA_ROOT.
+        workers: The number of threads deleting files.
+
+    Returns:
+        tuple: The number of files deleted and the number of bytes freed.
+    """
+    names = [name for name in names if name and name not in PROTECTED_FILES]
+    deleted = freed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for size in executor.map(_delete, names):
+            if size is not None:
+                deleted += 1
+                freed += size
+    return deleted, freed
+
+
+def delete_media_files_in_background(names):
+    """
+    Delete media files on a background thread.
+
+    Args:
+        names: The storage names of the files, relative to MEDIA_ROOT.
+
+    Returns:
+        Future: Resolves to the result of delete_media_files.
+    """
+    return _background.submit(delete_media_files, list(names))
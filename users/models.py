@@ -1,11 +1,13 @@
 """
 Models for the users app.
 
-This module defines the following model:
+This module defines the following models:
 - Profile: Extends Django's Model for user profiles, including user information and profile image.
+- QueuedEmail: An outgoing email waiting in the outbox for the delivery worker.
 
 Classes:
     Profile: Model representing user profiles, linked to the built-in User model.
+    QueuedEmail: Model representing an email stored for asynchronous delivery.
 
 Methods:
     __str__: Human-readable representation of the Profile instance.
@@ -13,9 +15,11 @@ Methods:
 """
 
 
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
-from PIL import Image
+from django.utils import timezone
+from .images import resize_avatar
 
 
 class Profile(models.Model):
@@ -33,14 +37,29 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     image = models.ImageField(default='default.png', upload_to='profile_pics')
 
+    # The image stored in the database, or the default for new profiles.
+    _saved_image = 'default.png'
+
     def __str__(self):
         """Return a human-readable representation of the profile."""
         return f"{self.user.username} profile"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Load a profile, remembering the image it was loaded with."""
+        instance = super().from_db(db, field_names, values)
+        if 'image' in field_names:
+            instance._saved_image = values[field_names.index('image')]
+        return instance
+
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         """
         Override the save method to resize and save the profile image if needed.
 
+        The image is only opened when it changed since the profile was loaded, so the
+        saves made on every login do not read the file. The default image is assumed
+        to fit already.
+
         Args:
             force_insert: A boolean indicating whether to force an insert.
             force_update: A boolean indicating whether to force an update.
@@ -52,9 +71,61 @@ class Profile(models.Model):
         """
         super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
 
-        img = Image.open(self.image.path)
+        if self.image.name != self._saved_image:
+            resize_avatar(self.image.path, settings.AVATAR_SIZE)
+            self._saved_image = self.image.name
+
+
+class QueuedEmail(models.Model):
+    """
+    Model representing an email stored in the outbox for asynchronous delivery.
+
+    Messages are written by users.mail.OutboxEmailBackend during the request and sent
+    later, in batches, by the send_queued_mail management command.
 
-        if img.height > 300 or img.width > 300:
-            output_size = (300, 300)
-            img.thumbnail(output_size)
-            img.save(self.image.path)
+    Fields:
+        subject: The subject line.
+        body: The plain text body.
+        html_body: The optional HTML alternative of the body.
+        from_email: The sender address.
+        to: The list of recipient addresses.
+        cc: The list of carbon copy addresses.
+        bcc: The list of blind carbon copy addresses.
+        status: Whether the message is queued, sent or has failed for good.
+        attempts: The number of delivery attempts made so far.
+        next_attempt_at: The earliest time of the next delivery attempt.
+        last_error: The error raised by the last failed attempt.
+        created_at: The time the message was queued.
+        sent_at: The time the message was delivered.
+    """
+    QUEUED = 'queued'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    subject = models.TextField()
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list)
+    bcc = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='queuedemail_due_idx'),
+        ]
+
+    def __str__(self):
+        """Return a human-readable representation of the queued email."""
+        return f"{self.subject} to {', '.join(self.to)} ({self.status})"
@@ -7,56 +7,76 @@ Classes:
     UserProfileTestCase: Test case for user profile creation and deletion.
     UserRegistrationTestCase: Test case for user registration views and form validations.
     UserFormsTestCase: Test case for user and profile form validations.
+    RateLimitTestCase: Test case for throttling of the registration and login views.
+    EmailOutboxTestCase: Test case for queued password reset emails and their delivery.
+    PasswordHashingTestCase: Test case for the tuned password hashers and rehashing on login.
+    UserDeletionTestCase: Test case for chunked deletion of users, their posts and avatars.
+    MediaGarbageCollectionTestCase: Test case for the gc_media management command.
+    AvatarUploadTestCase: Test case for the size limits and resizing of uploaded avatars.
+    FactoryTestCase: Test case for the bulk user factory and the image checks it avoids.
 
 """
 
 
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import Profile
+from .models import Profile, QueuedEmail
 from .forms import UserRegisterForm, UserUpdateForm, ProfileUpdateForm
+from .factories import make_users
+from .deletion import delete_users
+from .mail import claim_queued_emails, due_emails
+from .uploadhandlers import OversizedUpload
+from django.contrib.auth.hashers import identify_hasher, make_password
 from django.contrib.messages import get_messages
+from django.core import mail
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends import locmem
+from django.core.management import CommandError, call_command
+import os
+import smtplib
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+import warnings
+from unittest import mock
+from PIL import Image
+from blog.factories import make_posts
+from blog.models import Post
+from bms_django_website.testrunner import CONFIGURED_PASSWORD_HASHERS
+from bms_django_website import ratelimit
 
 
 class UserProfileTestCase(TestCase):
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """
         Set up test data for user and profile.
 
-        Creates a test user and profile for testing user profile creation.
+        Creates a test user and profile once for the class; every test runs in a
+        transaction that is rolled back, so no clean-up is needed.
 
         """
-        self.username = 'testuser'
-        self.email = 'testuser@example.com'
-        self.password = 'testpassword'
+        cls.username = 'testuser'
+        cls.email = 'testuser@example.com'
+        cls.password = 'testpassword'
 
         # Check if the test user exists before creating
-        self.user, created = User.objects.get_or_create(
-            username=self.username,
-            email=self.email,
-            password=self.password
+        cls.user, created = User.objects.get_or_create(
+            username=cls.username,
+            email=cls.email,
+            password=cls.password
         )
 
         # Check if the test profile exists before creating
-        if not hasattr(self.user, 'profile'):
-            self.profile = Profile.objects.create(user=self.user)
+        if not hasattr(cls.user, 'profile'):
+            cls.profile = Profile.objects.create(user=cls.user)
         else:
-            self.profile = self.user.profile
-
-    def tearDown(self):
-        """
-        Clean up test user and profile.
-
-        Deletes the test user and profile after each test.
-
-        """
-        if hasattr(self, 'user') and self.user is not None:
-            self.user.delete()
-
-        if hasattr(self, 'profile') and self.profile is not None:
-            self.profile.delete()
+            cls.profile = cls.user.profile
 
     def test_user_profile_creation(self):
         """
@@ -120,21 +140,22 @@ class UserRegistrationTestCase(TestCase):
 
 
 class UserFormsTestCase(TestCase):
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """
         Set up test data for user form tests.
 
         Creates a test user for testing user and profile forms.
 
         """
-        self.username = 'testuser'
-        self.email = 'testuser@example.com'
-        self.password = 'testpassword'
-
-        self.user = User.objects.create_user(
-            username=self.username,
-            email=self.email,
-            password=self.password
+        cls.username = 'testuser'
+        cls.email = 'testuser@example.com'
+        cls.password = 'testpassword'
+
+        cls.user = User.objects.create_user(
+            username=cls.username,
+            email=cls.email,
+            password=cls.password
         )
 
     def test_user_update_form(self):
@@ -160,3 +181,565 @@ class UserFormsTestCase(TestCase):
         form = ProfileUpdateForm(data=form_data, files=file_data, instance=self.user.profile)
         self.assertFalse(form.is_valid())  # Expecting form to be invalid
         self.assertIn('Upload a valid image.', form.errors['image'][0])
+
+
+@override_settings(RATE_LIMITS={'register': (2, 60), 'login': (2, 60)})
+class RateLimitTestCase(TestCase):
+    def setUp(self):
+        """
+        Start every test with empty rate limit buckets.
+
+        """
+        ratelimit.reset()
+
+    def tearDown(self):
+        """
+        Clear the buckets filled by the test.
+
+        """
+        ratelimit.reset()
+
+    def test_register_is_throttled_per_ip(self):
+        """
+        Test that registration attempts beyond the limit are rejected.
+
+        Submits three registrations from one address with a limit of two and checks the third is refused.
+
+        """
+        for i in range(2):
+            data = {'username': f'user{i}', 'email': f'user{i}@example.com',
+                    'password1': 'newpassword123', 'password2': 'newpassword123'}
+            response = self.client.post(reverse('register'), data)
+            self.assertEqual(response.status_code, 302)
+
+        data = {'username': 'user2', 'email': 'user2@example.com',
+                'password1': 'newpassword123', 'password2': 'newpassword123'}
+        response = self.client.post(reverse('register'), data)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertFalse(User.objects.filter(username='user2').exists())
+        self.assertEqual(ratelimit.get_metrics(), {('register', 'ip'): 1})
+
+    @override_settings(RATE_LIMITS={'login': (10, 60), 'login:username': (2, 60)})
+    def test_login_attempts_per_username_are_limited_per_address(self):
+        """
+        Test that an address gets a few attempts per username, while other usernames
+        and other addresses can still log in.
+
+        """
+        data = {'username': 'victim', 'password': 'wrong'}
+        for _ in range(2):
+            response = self.client.post(reverse('login'), data, REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(reverse('login'), data, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(ratelimit.get_metrics(), {('login', 'username'): 1})
+        response = self.client.post(reverse('login'), {'username': 'other', 'password': 'wrong'},
+                                    REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse('login'), data, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(RATE_LIMIT_BACKEND='cache')
+    def test_submitted_values_are_hashed_into_cache_keys(self):
+        """
+        Test that any submitted username makes a valid cache key.
+
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            response = self.client.post(reverse('login'), {'username': 'a b\x01' + 'x' * 300, 'password': 'wrong'})
+        self.assertEqual(response.status_code, 200)
+        cache.clear()
+
+    def test_rejected_requests_do_not_spend_tokens(self):
+        """
+        Test that a request refused by one bucket takes no token from the others.
+
+        """
+        store = ratelimit.LocalBucketStore()
+        self.assertEqual(store.consume([('ip:a', 1, 1 / 60), ('user:1', 1, 1 / 60)], now=0), (None, 0))
+        key, wait = store.consume([('ip:b', 1, 1 / 60), ('user:1', 1, 1 / 60)], now=0)
+        self.assertEqual(key, 'user:1')
+        self.assertGreater(wait, 0)
+        self.assertEqual(store.consume([('ip:b', 1, 1 / 60)], now=0), (None, 0))
+
+    @override_settings(RATE_LIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_forwarded_address_is_taken_from_the_trusted_proxy(self):
+        """
+        Test that the client address is the one appended by the proxy, not a forged one.
+
+        """
+        for forged in ('1.1.1.1', '2.2.2.2', '3.3.3.3'):
+            response = self.client.post(reverse('login'), {'username': f'user-{forged}', 'password': 'wrong'},
+                                        HTTP_X_FORWARDED_FOR=f'{forged}, 10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+
+    def test_get_requests_are_not_throttled(self):
+        """
+        Test that displaying the registration form does not consume tokens.
+
+        """
+        for _ in range(5):
+            response = self.client.get(reverse('register'))
+            self.assertEqual(response.status_code, 200)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """Email backend whose mail host rejects every message, used to exercise retries."""
+
+    def send_messages(self, email_messages):
+        raise smtplib.SMTPDataError(554, b"message rejected")
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """In-memory email backend whose mail host goes away after the first message."""
+
+    def send_messages(self, email_messages):
+        if mail.outbox:
+            raise ConnectionRefusedError("mail host unavailable")
+        return super().send_messages(email_messages)
+
+
+class CountingEmailBackend(locmem.EmailBackend):
+    """In-memory email backend that counts how often a connection is opened."""
+    opened = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connection = None
+
+    def open(self):
+        if self.connection is not None:
+            return False
+        type(self).opened += 1
+        self.connection = object()
+        return True
+
+    def close(self):
+        self.connection = None
+
+
+@override_settings(EMAIL_BACKEND='users.mail.OutboxEmailBackend',
+                   OUTBOX_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class EmailOutboxTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Set up a user that can request a password reset.
+
+        """
+        cls.user = User.objects.create_user(username='testuser', email='testuser@example.com',
+                                            password='testpassword')
+
+    def setUp(self):
+        """
+        Start every test with empty rate limit buckets.
+
+        """
+        ratelimit.reset()
+
+    def request_reset(self):
+        """
+        Submit the password reset form for the test user.
+
+        """
+        response = self.client.post(reverse('password_reset'), {'email': 'testuser@example.com'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_password_reset_is_queued(self):
+        """
+        Test that the password reset view queues the email instead of sending it.
+
+        """
+        self.request_reset()
+
+        self.assertEqual(len(mail.outbox), 0)
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.to, ['testuser@example.com'])
+        self.assertEqual(queued.status, QueuedEmail.QUEUED)
+
+    def test_send_queued_mail_delivers_batch(self):
+        """
+        Test that the worker command delivers queued emails and marks them as sent.
+
+        """
+        self.request_reset()
+        self.request_reset()
+
+        call_command('send_queued_mail', '--once', '--batch-size', '1', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn('password', mail.outbox[0].body)
+        self.assertEqual(QueuedEmail.objects.filter(status=QueuedEmail.SENT).count(), 2)
+
+    @override_settings(OUTBOX_DELIVERY_BACKEND='users.tests.FailingEmailBackend')
+    def test_failed_delivery_is_retried_then_abandoned(self):
+        """
+        Test that failed deliveries are rescheduled and finally marked as failed.
+
+        """
+        self.request_reset()
+
+        call_command('send_queued_mail', '--once', '--max-attempts', '2', stdout=StringIO())
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.status, QueuedEmail.QUEUED)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIn('message rejected', queued.last_error)
+
+        QueuedEmail.objects.update(next_attempt_at=queued.created_at)
+        call_command('send_queued_mail', '--once', '--max-attempts', '2', stdout=StringIO())
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, QueuedEmail.FAILED)
+
+    @override_settings(OUTBOX_DELIVERY_BACKEND='users.tests.CountingEmailBackend')
+    @override_settings(RATE_LIMITS={'password_reset:email': (10, 60)})
+    def test_drain_opens_one_connection(self):
+        """
+        Test that all the batches of a drain are sent over a single connection.
+
+        """
+        for _ in range(5):
+            self.request_reset()
+        CountingEmailBackend.opened = 0
+
+        call_command('send_queued_mail', '--once', '--batch-size', '2', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(CountingEmailBackend.opened, 1)
+
+        call_command('send_queued_mail', '--once', stdout=StringIO())
+        self.assertEqual(CountingEmailBackend.opened, 1)
+
+    @override_settings(OUTBOX_DELIVERY_BACKEND='users.tests.FlakyEmailBackend')
+    @override_settings(RATE_LIMITS={'password_reset:email': (10, 60)})
+    def test_unreachable_mail_host_does_not_count_attempts(self):
+        """
+        Test that messages sent before the mail host went away are marked as sent, and
+        that the others are put back in the queue without counting an attempt.
+
+        """
+        for _ in range(3):
+            self.request_reset()
+
+        err = StringIO()
+        call_command('send_queued_mail', '--once', stdout=StringIO(), stderr=err)
+
+        self.assertIn('Mail host unavailable', err.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(QueuedEmail.objects.filter(status=QueuedEmail.SENT).count(), 1)
+        queued = QueuedEmail.objects.filter(status=QueuedEmail.QUEUED)
+        self.assertEqual(queued.count(), 2)
+        self.assertFalse(queued.exclude(attempts=0).exists())
+        self.assertEqual(due_emails().count(), 2)
+
+    def test_claimed_emails_are_not_sent_twice(self):
+        """
+        Test that a message claimed by one worker is not handed to another.
+
+        """
+        self.request_reset()
+        self.request_reset()
+
+        first = claim_queued_emails(batch_size=1)
+        second = claim_queued_emails(batch_size=10)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(first[0].pk, second[0].pk)
+        self.assertEqual(claim_queued_emails(batch_size=10), [])
+
+
+@override_settings(PASSWORD_HASHERS=CONFIGURED_PASSWORD_HASHERS)
+class PasswordHashingTestCase(TestCase):
+    def test_new_passwords_use_preferred_hasher(self):
+        """
+        Test that new passwords are hashed with the first configured hasher and its tuned parameters.
+
+        """
+        user = User.objects.create_user(username='testuser', password='testpassword')
+        hasher = identify_hasher(user.password)
+        self.assertTrue(settings.PASSWORD_HASHERS[0].endswith(type(hasher).__name__))
+        self.assertFalse(hasher.must_update(user.password))
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        """
+        Test that a PBKDF2 hash is replaced by the preferred hasher after a successful login.
+
+        """
+        user = User.objects.create_user(username='testuser')
+        user.password = make_password('testpassword', hasher='pbkdf2_sha256')
+        user.save()
+
+        self.assertTrue(self.client.login(username='testuser', password='testpassword'))
+
+        user.refresh_from_db()
+        self.assertFalse(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password('testpassword'))
+
+
+class UserDeletionTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Set up a user with posts and another user with one post.
+
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+        cls.other = User.objects.create_user(username='otheruser', password='otherpassword')
+        make_posts(cls.user, 5, content='Content')
+        Post.objects.create(title='Other Post', content='Content', author=cls.other)
+
+    def setUp(self):
+        """
+        Give the user an uploaded avatar in a temporary media directory.
+
+        """
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        shutil.copy(os.path.join(settings.MEDIA_ROOT, 'default.png'), self.media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        os.makedirs(os.path.join(self.media_root, 'profile_pics'))
+        self.avatar = os.path.join(self.media_root, 'profile_pics', 'testuser.jpg')
+        with open(self.avatar, 'wb') as avatar:
+            avatar.write(b'avatar')
+        Profile.objects.filter(user=self.user).update(image='profile_pics/testuser.jpg')
+
+    def test_delete_users_command(self):
+        """
+        Test that the command deletes the user, their posts in chunks and their avatar.
+
+        """
+        out = StringIO()
+        call_command('delete_users', 'testuser', '--chunk-size', '2', '--pause', '0', stdout=out)
+
+        self.assertIn('testuser: deleted 4 post(s)...', out.getvalue())
+        self.assertIn('Deleted 1 user(s), 5 post(s) and 1 avatar file(s)', out.getvalue())
+        self.assertFalse(User.objects.filter(username='testuser').exists())
+        self.assertFalse(Post.all_objects.filter(author=self.user).exists())
+        self.assertTrue(Post.objects.filter(title='Other Post').exists())
+        self.assertFalse(os.path.exists(self.avatar))
+
+    def test_admin_action_asks_for_confirmation(self):
+        """
+        Test that the admin action shows a confirmation page before deleting the users.
+
+        """
+        User.objects.create_superuser(username='admin', password='adminpassword')
+        self.client.login(username='admin', password='adminpassword')
+        url = reverse('admin:auth_user_changelist')
+        data = {'action': 'delete_users_in_chunks', '_selected_action': [self.user.pk]}
+
+        response = self.client.post(url, data)
+        self.assertContains(response, 'Are you sure?')
+        self.assertContains(response, 'Posts: 5')
+        self.assertTrue(User.objects.filter(username='testuser').exists())
+
+        response = self.client.post(url, {**data, 'post': 'yes'}, follow=True)
+        self.assertContains(response, 'Deleted 1 user(s) and 5 post(s).')
+        self.assertFalse(User.objects.filter(username='testuser').exists())
+        self.assertFalse(Post.all_objects.filter(author=self.user).exists())
+
+    def test_admin_change_form_deletes_in_chunks(self):
+        """
+        Test that the change form confirms the deletion with the number of posts, and
+        deletes them chunk by chunk.
+
+        """
+        User.objects.create_superuser(username='admin', password='adminpassword')
+        self.client.login(username='admin', password='adminpassword')
+        response = self.client.get(reverse('admin:auth_user_delete', args=[self.user.pk]))
+        self.assertContains(response, 'Posts: 5')
+        self.assertNotContains(response, 'Post 0')
+
+        with mock.patch('users.admin.delete_users', wraps=delete_users) as chunked:
+            response = self.client.post(reverse('admin:auth_user_delete', args=[self.user.pk]), {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        chunked.assert_called_once()
+        self.assertFalse(User.objects.filter(username='testuser').exists())
+        self.assertFalse(Post.all_objects.filter(author=self.user).exists())
+        self.assertTrue(Post.objects.filter(title='Other Post').exists())
+
+    def test_delete_users_command_unknown_user(self):
+        """
+        Test that the command refuses to run when a username does not exist.
+
+        """
+        with self.assertRaises(CommandError):
+            call_command('delete_users', 'testuser', 'nobody', stdout=StringIO())
+        self.assertTrue(User.objects.filter(username='testuser').exists())
+
+
+class MediaGarbageCollectionTestCase(TestCase):
+    def setUp(self):
+        """
+        Set up a media directory holding a referenced avatar and two orphaned ones.
+
+        """
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        shutil.copy(os.path.join(settings.MEDIA_ROOT, 'default.png'), self.media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        os.makedirs(os.path.join(self.media_root, 'profile_pics'))
+        for name in ('testuser.jpg', 'testuser_old1.jpg', 'testuser_old2.jpg'):
+            with open(os.path.join(self.media_root, 'profile_pics', name), 'wb') as avatar:
+                avatar.write(b'avatar')
+        Profile.objects.filter(user=self.user).update(image='profile_pics/testuser.jpg')
+
+    def remaining(self):
+        """
+        Return the files left in the avatar directory.
+
+        """
+        return sorted(os.listdir(os.path.join(self.media_root, 'profile_pics')))
+
+    def test_gc_media_dry_run(self):
+        """
+        Test that a dry run lists the orphaned files without deleting them.
+
+        """
+        out = StringIO()
+        call_command('gc_media', '--dry-run', '--min-age', '0', stdout=out)
+        self.assertIn('Would delete profile_pics/testuser_old1.jpg', out.getvalue())
+        self.assertIn('Would delete 2 file(s), 12 bytes.', out.getvalue())
+        self.assertEqual(len(self.remaining()), 3)
+
+    def test_gc_media_deletes_orphans(self):
+        """
+        Test that only unreferenced files are deleted, and that recent files are kept.
+
+        """
+        call_command('gc_media', stdout=StringIO())
+        self.assertEqual(len(self.remaining()), 3)
+
+        out = StringIO()
+        call_command('gc_media', '--min-age', '0', stdout=out)
+        self.assertIn('Deleted 2 file(s), 12 bytes', out.getvalue())
+        self.assertEqual(self.remaining(), ['testuser.jpg'])
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, 'default.png')))
+
+
+class AvatarUploadTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Set up a user.
+
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpassword')
+
+    def setUp(self):
+        """
+        Give every test its own temporary media directory.
+
+        """
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        shutil.copy(os.path.join(settings.MEDIA_ROOT, 'default.png'), self.media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def image_file(self, size, image_format='JPEG', name='avatar.jpg'):
+        """
+        Return an uploaded file holding a generated image.
+
+        """
+        content = BytesIO()
+        Image.new('RGB', size, 'blue').save(content, image_format)
+        return SimpleUploadedFile(name, content.getvalue(), content_type='image/jpeg')
+
+    @override_settings(UPLOAD_MAX_SIZE=100)
+    def test_form_rejects_large_file(self):
+        """
+        Test that the number of bytes is checked before the image is read.
+
+        """
+        form = ProfileUpdateForm(data={}, files={'image': self.image_file((400, 400))},
+                                 instance=self.user.profile)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code, 'file_too_large')
+
+    @override_settings(AVATAR_MAX_PIXELS=100 * 100)
+    def test_form_rejects_large_dimensions(self):
+        """
+        Test that the dimensions read from the header are checked.
+
+        """
+        form = ProfileUpdateForm(data={}, files={'image': self.image_file((200, 100))},
+                                 instance=self.user.profile)
+        self.assertFalse(form.is_valid())
+        self.assertIn('200 x 100 pixels', form.errors['image'][0])
+
+        form = ProfileUpdateForm(data={}, files={'image': self.image_file((100, 100))},
+                                 instance=self.user.profile)
+        self.assertTrue(form.is_valid())
+
+    def test_upload_is_resized(self):
+        """
+        Test that an uploaded avatar is shrunk to fit in AVATAR_SIZE.
+
+        """
+        self.client.login(username='testuser', password='testpassword')
+        response = self.client.post(reverse('profile'), {
+            'username': 'testuser', 'email': 'test@example.com',
+            'image': self.image_file((1200, 900)),
+        })
+        self.assertRedirects(response, reverse('profile'))
+        self.user.profile.refresh_from_db()
+        with Image.open(self.user.profile.image.path) as img:
+            self.assertEqual(img.size, (300, 225))
+
+    @override_settings(UPLOAD_MAX_SIZE=1024)
+    def test_oversized_upload_is_not_stored(self):
+        """
+        Test that the upload handler drops an oversized file and the form reports its size.
+
+        """
+        self.client.login(username='testuser', password='testpassword')
+        upload = SimpleUploadedFile('avatar.jpg', os.urandom(4096), content_type='image/jpeg')
+        response = self.client.post(reverse('profile'), {
+            'username': 'testuser', 'email': 'test@example.com', 'image': upload,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['p_form'].errors.as_data()['image'][0].code, 'file_too_large')
+        self.assertContains(response, '4.0\xa0KB')
+        self.assertIsInstance(response.wsgi_request.FILES['image'], OversizedUpload)
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.image.name, 'default.png')
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'profile_pics')))
+
+
+class FactoryTestCase(TestCase):
+    def test_make_users(self):
+        """
+        Test that bulk-created users have profiles and can log in.
+
+        """
+        users = make_users(20, username='bulk{i}')
+        self.assertEqual(len(users), 20)
+        self.assertEqual(Profile.objects.filter(user__username__startswith='bulk').count(), 20)
+        self.assertTrue(self.client.login(username='bulk7', password='testpassword'))
+        self.assertEqual(users[7].email, 'bulk7@example.com')
+
+    def test_profile_save_skips_unchanged_image(self):
+        """
+        Test that saving a profile only opens its image when the image changed.
+
+        """
+        user = make_users(1)[0]
+        Profile.objects.filter(user=user).update(image='profile_pics/missing.jpg')
+        profile = Profile.objects.get(user=user)
+        profile.save()
+
+        profile.image = 'profile_pics/other.jpg'
+        with self.assertRaises(FileNotFoundError):
+            profile.save()
@@ -0,0 +1,60 @@
+"""
+Upload handlers for the users app.
+
+Classes:
+    OversizedUpload: Stands in for an uploaded file that went over the size limit.
+    SizeLimitUploadHandler: Stops storing an uploaded file once it is larger than UPLOAD_MAX_SIZE.
+"""
+
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class OversizedUpload(UploadedFile):
+    """
+    An uploaded file that was larger than the limit.
+
+    None of its content is kept; only the name and the number of bytes received, so
+    form validation can report the size to the user.
+    """
+
+    def __init__(self, name, content_type, size, charset=None, content_type_extra=None):
+        super().__init__(BytesIO(), name, content_type, size, charset, content_type_extra)
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """
+    Upload handler that stops storing a file once it is larger than UPLOAD_MAX_SIZE.
+
+    It must come first in FILE_UPLOAD_HANDLERS. Chunks are passed on to the next
+    handlers until the limit is reached; after that they are dropped as they arrive,
+    and the file is replaced by an OversizedUpload, so an oversized upload costs no
+    more memory or disk space than the limit.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = settings.UPLOAD_MAX_SIZE
+        self.received = 0
+
+    def new_file(self, *args, **kwargs):
+        """Reset the byte count for a new file."""
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        """Count the bytes of the file and drop them once it is over the limit."""
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        """Return an OversizedUpload if the file was over the limit, else let the next handler finish it."""
+        if self.received > self.max_size:
+            return OversizedUpload(self.file_name, self.content_type, self.received,
+                                   self.charset, self.content_type_extra)
+        return None
@@ -13,9 +13,13 @@ Functions:
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from bms_django_website.pagecache import invalidate_page_cache
+from bms_django_website.ratelimit import rate_limit
+from blog.signals import invalidate_posts_on_commit
 from .forms import UserRegisterForm, UserUpdateForm, ProfileUpdateForm
 
 
+@rate_limit('register')
 def register(request):
     """
     View for handling user registration.
@@ -61,6 +65,8 @@ def profile(request):
     """
 
     if request.method == 'POST':
+        # Validating the form renames request.user already.
+        old_username = request.user.username
         user_update_form = UserUpdateForm(request.POST, instance=request.user)
         profile_update_form = ProfileUpdateForm(request.POST,
                                                 request.FILES,
@@ -68,6 +74,13 @@ def profile(request):
         if user_update_form.is_valid() and profile_update_form.is_valid():
             user_update_form.save()
             profile_update_form.save()
+            if user_update_form.has_changed():
+                # Post lists and feeds show the author's name, and a feed is cached
+                # under the name it was requested with.
+                invalidate_posts_on_commit({old_username, request.user.username})
+            elif profile_update_form.has_changed():
+                # Post lists show the author's picture.
+                invalidate_page_cache()
             messages.success(request, f"Your account has been updated.")
             return redirect('profile')
 